@@ -0,0 +1,109 @@
+# ablation.py
+
+# Компоненты блока \merge, которые можно убрать или заменить:
+#   noimage  -- \fig не вызывает \includegraphics (пустой float)
+#   draft    -- graphicx с опцией draft: рамка нужного размера вместо изображения
+#   nofloat  -- изображение выводится без окружения figure[H]
+#   nolipsum -- пакет lipsum не загружается (только для документов без команды \lipsum)
+#   noheader -- без заголовка блока \textbf{#1}
+ABLATIONS = ["noimage", "draft", "nofloat", "nolipsum", "noheader"]
+
+# Набор, после которого от блока остаются только фрагменты
+BARE_ABLATIONS = ["noimage", "nofloat", "nolipsum", "noheader"]
+
+
+def parse_ablations(text):
+    """
+    Разбирает список отключаемых компонентов.
+
+    Args:
+        text: компоненты через запятую или '+' (пустая строка или 'none' -- ничего не отключать)
+
+    Returns:
+        list: компоненты в порядке ABLATIONS
+    """
+    names = [name.strip().lower() for name in text.replace("+", ",").split(",")]
+    names = [name for name in names if name and name != "none"]
+    for name in names:
+        if name not in ABLATIONS:
+            raise ValueError(
+                f"Неизвестный компонент: {name} (допустимые: {', '.join(ABLATIONS)})"
+            )
+    return [name for name in ABLATIONS if name in names]
+
+
+def ablation_label(ablations):
+    """
+    Возвращает подпись набора компонентов для CSV: 'none' или 'noimage+nofloat'.
+
+    Args:
+        ablations: список компонентов
+
+    Returns:
+        str: подпись
+    """
+    return "+".join(ablations) if ablations else "none"
+
+
+def package_preamble(ablations=()):
+    """
+    Возвращает общие для всех генераторов строки \\usepackage.
+
+    Args:
+        ablations: отключаемые компоненты (см. ABLATIONS)
+
+    Returns:
+        str: строки преамбулы
+    """
+    graphicx = r"\usepackage[draft]{graphicx}" if "draft" in ablations else r"\usepackage{graphicx}"
+    lines = [graphicx, r"\usepackage{geometry}", r"\usepackage{float}"]
+    if "nolipsum" not in ablations:
+        lines.append(r"\usepackage[language=english]{lipsum}")
+    lines.extend([r"\usepackage{etoolbox}", r"\usepackage{l3benchmark}"])
+    return "".join(line + "\n" for line in lines)
+
+
+def fig_command(ablations=()):
+    """
+    Возвращает определение \\fig с учетом отключенных компонентов.
+
+    Args:
+        ablations: отключаемые компоненты (см. ABLATIONS)
+
+    Returns:
+        str: строка \\newcommand{\\fig}
+    """
+    body = "" if "noimage" in ablations else r"\includegraphics{#1}"
+    if "nofloat" not in ablations:
+        body = r"\begin{figure}[H]" + body + r"\end{figure}"
+    return r"\newcommand{\fig}[1]{" + body + "}\n"
+
+
+# Перекрестные ссылки для многопроходной сборки: каждый блок попадает в оглавление,
+# получает метку и ссылается на предыдущий блок
+CROSS_REFS_PREAMBLE = r"""\newcounter{block}
+\newcommand{\blockmark}[1]{\refstepcounter{block}\label{block:\theblock}\addcontentsline{toc}{section}{#1}\ifnum\value{block}>1 (see block~\ref{block:\the\numexpr\value{block}-1\relax} on page~\pageref{block:\the\numexpr\value{block}-1\relax})\fi}
+\AtBeginDocument{\tableofcontents}
+"""
+
+
+def merge_command(definition, ablations=(), cross_refs=False):
+    """
+    Убирает заголовок блока из определения \\merge, если отключен noheader,
+    и добавляет перекрестные ссылки.
+
+    Args:
+        definition: определение \\merge, начинающееся с \\par\\textbf{#1}
+        ablations: отключаемые компоненты (см. ABLATIONS)
+        cross_refs: добавить \\tableofcontents, \\label и \\ref (определения
+            вставляются перед \\merge)
+
+    Returns:
+        str: определение \\merge
+    """
+    if "noheader" in ablations:
+        definition = definition.replace(r"\par\textbf{#1}", "", 1)
+    if cross_refs:
+        marked = definition.replace(r"]{\par", r"]{\par\blockmark{#1}", 1)
+        definition = CROSS_REFS_PREAMBLE + marked
+    return definition
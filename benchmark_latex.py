@@ -7,11 +7,143 @@ import time
 import re
 import argparse
 import shutil
+import shlex
+import hashlib
+import random
+import threading
+import resource
+from array import array
+from collections import Counter
 from pathlib import Path
-from statistics import mean
-
-
-def run_generate_document(n, images_dir, base_output_dir, doc_type, yes=False):
+from statistics import mean, median
+from ablation import (
+    ABLATIONS,
+    BARE_ABLATIONS,
+    parse_ablations,
+    ablation_label,
+    package_preamble,
+)
+
+# Типы документов, текст которых задается командой \lipsum, а не корпусом
+LIPSUM_COMMAND_TYPES = ["flat", "modular"]
+
+# Типы документов, поддерживающие --content (математика, кириллица)
+CONTENT_DOC_TYPES = [
+    "flat_inner",
+    "modular_inner",
+    "modular_inner_last",
+    "modular_inner_index",
+    "modular_inner_lua_table",
+    "modular_inner_lua_seek",
+    "modular_precatch",
+    "modular_docstrip",
+    "modular_prebuilt",
+    "modular_inner_sharded",
+    "macrodef",
+    "macrodef_sharded",
+    "modular_inner_nested",
+    "macrodef_nested",
+]
+
+# Максимальное число проходов в режиме --passes auto (как max_repeat в latexmk)
+MAX_AUTO_PASSES = 5
+
+# Слово текста, которое можно править в режиме --edit-loop (не имя команды \\word)
+TEXT_WORD_RE = re.compile(rb"(?<![\\A-Za-z])[A-Za-z]+")
+
+# Опции движка: draftmode (без записи PDF), batchmode (вместо nonstopmode),
+# synctex, recorder (список открытых файлов в main.fls),
+# compress<0-9> (\pdfcompresslevel) и objcompress<0-3> (\pdfobjcompresslevel)
+ENGINE_FLAGS = ["draftmode", "batchmode", "synctex", "recorder"]
+ENGINE_OPTION_RE = re.compile(
+    r"(draftmode|batchmode|synctex|recorder|compress[0-9]|objcompress[0-3])"
+)
+
+# Документы калибровки (--calibrate): пустой документ измеряет запуск движка
+# и загрузку формата, документ из одной преамбулы -- еще и загрузку пакетов
+CALIBRATION_DOCUMENTS = {
+    "empty": r"""\documentclass{article}
+\begin{document}
+\end{document}
+""",
+    "preamble": r"""\documentclass[a4paper]{report}
+"""
+    + package_preamble()
+    + r"""
+\ExplSyntaxOn
+\AfterEndDocument { \benchmark_toc: }
+\use:n
+  {
+    \benchmark_tic:
+  }
+\ExplSyntaxOff
+\begin{document}
+\end{document}
+""",
+}
+
+# Параметр CSV со средним временем каждого документа калибровки
+CALIBRATION_PARAMS = {"empty": "startup_time", "preamble": "preamble_time"}
+
+# Файлы пакетов, версии которых записываются в отпечаток окружения, и выражения
+# для их даты: \ProvidesPackage{...}[дата версия] или \def\ExplFileDate{дата}
+PACKAGE_VERSION_FILES = {
+    "catchfilebetweentags_version": "catchfilebetweentags.sty",
+    "l3kernel_version": "expl3-code.tex",
+}
+PACKAGE_VERSION_RE = re.compile(
+    r"\\Provides(?:Package|File)\{[^}]*\}\s*\[([^\]]*)\]|\\def\\ExplFileDate\{([^}]*)\}"
+)
+
+# Устойчивая статистика времени (столбцы time_<имя> и benchmark_<имя>) и доля
+# значений, отбрасываемых с каждой стороны для усеченного среднего
+ROBUST_STATS = ["median", "p5", "p95", "p99", "mad", "trimmed_mean", "outliers"]
+TRIM_FRACTION = 0.2
+
+# Счетчики ввода-вывода из /proc/<pid>/io, которые записываются в метрики io_*
+PROC_IO_FIELDS = ["rchar", "syscr", "read_bytes"]
+
+# Статистика памяти TeX в конце лога ("Here is how much of TeX's memory you used"):
+# регулярное выражение -> имена счетчиков. Группы после счетчиков -- их пределы,
+# которые записываются в параметры <имя>_capacity (строки без пределов их не содержат).
+# multiletter control sequences -- заполнение хеш-таблицы (hash_size+hash_extra),
+# s в stack positions -- save size.
+MEMORY_STATS = [
+    (r"(\d+) strings out of (\d+)", ["tex_strings"]),
+    (r"(\d+) string characters out of (\d+)", ["tex_string_chars"]),
+    (r"(\d+) words of memory out of (\d+)", ["tex_memory_words"]),
+    # LuaTeX выделяет память узлов и токенов динамически
+    (r"(\d+),(\d+) words of node,token memory allocated", ["tex_node_memory", "tex_token_memory"]),
+    (r"(\d+) multiletter control sequences out of (\d+)\+(\d+)", ["tex_cs"]),
+    (r"(\d+) words of font info for (\d+) fonts?, out of (\d+) for (\d+)", ["tex_font_words", "tex_fonts"]),
+    (r"(\d+) hyphenation exceptions out of (\d+)", ["tex_hyph_exceptions"]),
+    (
+        r"(\d+)i,(\d+)n,(\d+)p,(\d+)b,(\d+)s stack positions out of "
+        r"(\d+)i,(\d+)n,(\d+)p,(\d+)b,(\d+)s",
+        ["tex_stack_input", "tex_stack_nest", "tex_stack_param", "tex_stack_buffer", "tex_stack_save"],
+    ),
+]
+
+def run_generate_document(
+    n,
+    images_dir,
+    base_output_dir,
+    doc_type,
+    yes=False,
+    shards=None,
+    reuse=1,
+    access_pattern="sequential",
+    seed=0,
+    fragment_size="1p",
+    size_distribution="fixed",
+    fragments_per_block=1,
+    corpus="lipsum",
+    corpus_seed=0,
+    content="text",
+    nesting_depth=2,
+    ablations=(),
+    cross_refs=False,
+):
     """
     Генерирует документ указанного типа с N блоками.
 
@@ -19,8 +151,26 @@ def run_generate_document(n, images_dir, base_output_dir, doc_type, yes=False):
         n: количество блоков
         images_dir: путь к папке с изображениями
         base_output_dir: базовая выходная директория
-        doc_type: тип документа ('flat', 'flat_inner', 'modular', 'modular_inner', 'modular_inner_last', 'macrodef')
+        doc_type: тип документа ('flat', 'flat_inner', 'modular', 'modular_inner', 'modular_inner_last',
+            'modular_inner_index', 'modular_inner_lua_table', 'modular_inner_lua_seek',
+            'modular_precatch', 'modular_docstrip', 'modular_prebuilt', 'modular_inner_sharded', 'macrodef',
+            'macrodef_sharded', 'modular_inner_nested', 'macrodef_nested', 'prop', 'tlconst', 'pgfkeys', 'prop_debug', 'files_input',
+            'files_inputifexists', 'files_include', 'files_subfiles')
         yes: автоматическое подтверждение
+        shards: количество шардов для типов *_sharded
+        reuse: сколько раз используется каждый фрагмент (для типов modular*)
+        access_pattern: порядок обращения блоков к тегам (для типов modular*, кроме modular_inner_last)
+        seed: зерно для порядков random и zipf (и для случайных размеров фрагментов)
+        fragment_size: средний размер фрагмента '<число>p' или '<число>b' (для типов modular* и macrodef*)
+        size_distribution: распределение размеров фрагментов ('fixed', 'uniform', 'exp')
+        fragments_per_block: сколько пар des/data выводит каждый блок (для типов modular* и macrodef*)
+        corpus: источник текста ('lipsum' или 'synthetic'; типы flat и modular всегда используют \\lipsum)
+        corpus_seed: зерно синтетического корпуса
+        content: режим содержимого фрагментов (для типов flat_inner, modular* и macrodef*)
+        nesting_depth: глубина вложенных фрагментов для типов *_nested
+        ablations: отключаемые компоненты блока (см. ABLATIONS в ablation.py;
+            nolipsum игнорируется для типов flat и modular)
+        cross_refs: добавить оглавление и перекрестные ссылки между блоками
 
     Returns:
         Path: путь к сгенерированной директории
@@ -95,6 +245,21 @@ def run_generate_document(n, images_dir, base_output_dir, doc_type, yes=False):
             "--inner",
             "--last-tag",
         ]
+    elif doc_type == "modular_inner_index":
+        output_subdir = f"modular_inner_index_{n}"
+        generator_script = "generate_modular_version.py"
+        cmd = [
+            sys.executable,
+            generator_script,
+            "-i",
+            str(images_dir),
+            "-n",
+            str(n),
+            "-o",
+            str(Path(base_output_dir) / output_subdir),
+            "--inner",
+            "--index",
+        ]
     elif doc_type == "macrodef":
         output_subdir = f"macrodef_{n}"
         generator_script = "generate_macro_version.py"
@@ -108,11 +273,211 @@ def run_generate_document(n, images_dir, base_output_dir, doc_type, yes=False):
             "-o",
             str(Path(base_output_dir) / output_subdir),
         ]
+    elif doc_type in ["modular_inner_lua_table", "modular_inner_lua_seek"]:
+        output_subdir = f"{doc_type}_{n}"
+        generator_script = "generate_modular_version.py"
+        cmd = [
+            sys.executable,
+            generator_script,
+            "-i",
+            str(images_dir),
+            "-n",
+            str(n),
+            "-o",
+            str(Path(base_output_dir) / output_subdir),
+            "--inner",
+            "--lua",
+            doc_type[len("modular_inner_lua_") :],
+        ]
+    elif doc_type == "modular_precatch":
+        output_subdir = f"modular_precatch_{n}"
+        generator_script = "generate_modular_version.py"
+        cmd = [
+            sys.executable,
+            generator_script,
+            "-i",
+            str(images_dir),
+            "-n",
+            str(n),
+            "-o",
+            str(Path(base_output_dir) / output_subdir),
+            "--inner",
+            "--precatch",
+        ]
+    elif doc_type == "modular_docstrip":
+        output_subdir = f"modular_docstrip_{n}"
+        generator_script = "generate_modular_version.py"
+        cmd = [
+            sys.executable,
+            generator_script,
+            "-i",
+            str(images_dir),
+            "-n",
+            str(n),
+            "-o",
+            str(Path(base_output_dir) / output_subdir),
+            "--inner",
+            "--docstrip",
+        ]
+    elif doc_type == "modular_prebuilt":
+        # Модульный исходник сохраняется в main_modular.tex, а main.tex
+        # собирается из него inline_fragments.py перед каждой компиляцией
+        output_subdir = f"modular_prebuilt_{n}"
+        generator_script = "generate_modular_version.py"
+        cmd = [
+            sys.executable,
+            generator_script,
+            "-i",
+            str(images_dir),
+            "-n",
+            str(n),
+            "-o",
+            str(Path(base_output_dir) / output_subdir),
+            "-t",
+            str(Path(base_output_dir) / output_subdir / "main_modular.tex"),
+            "--inner",
+        ]
+    elif doc_type == "modular_inner_sharded":
+        output_subdir = f"modular_inner_sharded_{shards}_{n}"
+        generator_script = "generate_modular_version.py"
+        cmd = [
+            sys.executable,
+            generator_script,
+            "-i",
+            str(images_dir),
+            "-n",
+            str(n),
+            "-o",
+            str(Path(base_output_dir) / output_subdir),
+            "--inner",
+            "--shards",
+            str(shards),
+        ]
+    elif doc_type == "modular_inner_nested":
+        output_subdir = f"modular_inner_nested_{nesting_depth}_{n}"
+        generator_script = "generate_modular_version.py"
+        cmd = [
+            sys.executable,
+            generator_script,
+            "-i",
+            str(images_dir),
+            "-n",
+            str(n),
+            "-o",
+            str(Path(base_output_dir) / output_subdir),
+            "--inner",
+            "--nesting-depth",
+            str(nesting_depth),
+        ]
+    elif doc_type == "macrodef_nested":
+        output_subdir = f"macrodef_nested_{nesting_depth}_{n}"
+        generator_script = "generate_macro_version.py"
+        cmd = [
+            sys.executable,
+            generator_script,
+            "-i",
+            str(images_dir),
+            "-n",
+            str(n),
+            "-o",
+            str(Path(base_output_dir) / output_subdir),
+            "--nesting-depth",
+            str(nesting_depth),
+        ]
+    elif doc_type == "macrodef_sharded":
+        output_subdir = f"macrodef_sharded_{shards}_{n}"
+        generator_script = "generate_macro_version.py"
+        cmd = [
+            sys.executable,
+            generator_script,
+            "-i",
+            str(images_dir),
+            "-n",
+            str(n),
+            "-o",
+            str(Path(base_output_dir) / output_subdir),
+            "--shards",
+            str(shards),
+        ]
+    elif doc_type in [
+        "files_input",
+        "files_inputifexists",
+        "files_include",
+        "files_subfiles",
+    ]:
+        output_subdir = f"{doc_type}_{n}"
+        generator_script = "generate_files_version.py"
+        cmd = [
+            sys.executable,
+            generator_script,
+            "-i",
+            str(images_dir),
+            "-n",
+            str(n),
+            "-o",
+            str(Path(base_output_dir) / output_subdir),
+            "--include-mode",
+            doc_type[len("files_") :],
+        ]
+    elif doc_type in ["prop", "tlconst", "pgfkeys", "prop_debug"]:
+        output_subdir = f"{doc_type}_{n}"
+        generator_script = "generate_storage_version.py"
+        cmd = [
+            sys.executable,
+            generator_script,
+            "-i",
+            str(images_dir),
+            "-n",
+            str(n),
+            "-o",
+            str(Path(base_output_dir) / output_subdir),
+            "--backend",
+            doc_type,
+        ]
     else:
         raise ValueError(f"Неизвестный тип документа: {doc_type}")
 
     output_dir = Path(base_output_dir) / output_subdir
 
+    # Повторное использование фрагментов поддерживает только модульный генератор
+    if reuse > 1 and generator_script == "generate_modular_version.py":
+        cmd.extend(["--reuse", str(reuse)])
+
+    # Порядок обращения к тегам; modular_inner_last всегда использует последний тег
+    if (
+        access_pattern != "sequential"
+        and generator_script == "generate_modular_version.py"
+        and doc_type != "modular_inner_last"
+    ):
+        cmd.extend(["--access-pattern", access_pattern])
+
+    # Размер фрагментов поддерживают модульный генератор и генератор макросов
+    sized = generator_script in ["generate_modular_version.py", "generate_macro_version.py"]
+    if sized and (fragment_size != "1p" or size_distribution != "fixed"):
+        cmd.extend(["--fragment-size", fragment_size, "--size-distribution", size_distribution])
+    if "--access-pattern" in cmd or (sized and size_distribution != "fixed"):
+        cmd.extend(["--seed", str(seed)])
+    if fragments_per_block > 1 and sized:
+        cmd.extend(["--fragments-per-block", str(fragments_per_block)])
+
+    # Синтетический корпус; flat и modular без --inner используют команду \lipsum
+    if corpus != "lipsum" and doc_type not in LIPSUM_COMMAND_TYPES:
+        cmd.extend(["--corpus", corpus, "--corpus-seed", str(corpus_seed)])
+
+    # Режим содержимого поддерживают плоский, модульный генераторы и генератор макросов
+    if content != "text" and doc_type in CONTENT_DOC_TYPES:
+        cmd.extend(["--content", content])
+        if "--corpus-seed" not in cmd:
+            cmd.extend(["--corpus-seed", str(corpus_seed)])
+
+    # Отключаемые компоненты блока; flat и modular без --inner не обходятся без пакета lipsum
+    if doc_type in LIPSUM_COMMAND_TYPES:
+        ablations = [a for a in ablations if a != "nolipsum"]
+    if ablations:
+        cmd.extend(["--ablate", ",".join(ablations)])
+    if cross_refs:
+        cmd.append("--cross-refs")
+
     # Удаляем старую директорию если существует
     if output_dir.exists():
         shutil.rmtree(output_dir)
@@ -138,149 +503,1166 @@ def run_generate_document(n, images_dir, base_output_dir, doc_type, yes=False):
     return output_dir
 
 
-def run_pdflatex_k_times(output_dir, k, latex_cmd="pdflatex"):
+def tag_files_size(output_dir):
     """
-    Запускает pdflatex K раз и собирает данные о времени.
+    Возвращает суммарный размер файлов с фрагментами (des.tex, data.tex или их шардов
+    и shared.tex с подфрагментами) в байтах.
 
     Args:
-        output_dir: директория с .tex файлом
-        k: количество запусков
-        latex_cmd: команда LaTeX (pdflatex, lualatex, xelatex)
+        output_dir: директория сгенерированного документа
 
     Returns:
-        tuple: (список time результатов, список benchmark результатов)
+        int: размер в байтах
     """
-    main_tex = output_dir / "main.tex"
+    total = 0
+    for pattern in ["des.tex", "des_*.tex", "data.tex", "data_*.tex", "shared.tex"]:
+        for file in Path(output_dir).glob(pattern):
+            total += file.stat().st_size
+    return total
 
-    if not main_tex.exists():
-        print(f"Файл {main_tex} не найден")
-        return [], []
 
-    time_results = []
-    benchmark_results = []
+def docstrip_batches(output_dir):
+    """
+    Возвращает число пакетов, которыми docstrip обрабатывает драйвер extract.ins.
 
-    print(f"Запуск компиляции {k} раз...")
+    docstrip открывает не больше \\maxoutfiles выходных файлов сразу и для каждого
+    пакета заново читает исходные файлы, поэтому это и число их прочтений.
 
-    for i in range(1, k + 1):
-        print(f"\nЗапуск {i}/{k}...")
+    Args:
+        output_dir: директория сгенерированного документа
 
-        # Формируем команду pdflatex
-        pdflatex_cmd = [
-            "time",
-            "-p",
-            latex_cmd,
-            "-interaction=nonstopmode",
+    Returns:
+        int: количество пакетов или None, если драйвера нет
+    """
+    ins_file = Path(output_dir) / "extract.ins"
+    if not ins_file.exists():
+        return None
+    content = ins_file.read_text(encoding="utf-8")
+    num_files = content.count("\\file{")
+    match = re.search(r"\\maxoutfiles\{(\d+)\}", content)
+    max_outfiles = int(match.group(1)) if match else 16
+    return (num_files + max_outfiles - 1) // max_outfiles
+
+
+def get_prebuild_command(doc_type, output_dir):
+    """
+    Возвращает команду предварительной сборки main.tex для типа документа.
+
+    Args:
+        doc_type: тип документа
+        output_dir: директория сгенерированного документа
+
+    Returns:
+        list: команда или None, если предварительная сборка не нужна
+    """
+    if doc_type == "modular_prebuilt":
+        return [
+            sys.executable,
+            "inline_fragments.py",
+            str(output_dir / "main_modular.tex"),
+            "-o",
+            str(output_dir / "main.tex"),
+            "-q",
+        ]
+    if doc_type == "modular_docstrip":
+        # docstrip пишет извлеченные файлы в -output-directory; исходники читаются
+        # заново для каждого пакета выходных файлов (см. docstrip_batches),
+        # поэтому время предварительной сборки растет квадратично по N
+        return [
+            "tex",
+            "-interaction=batchmode",
             "-output-directory",
             str(output_dir),
-            str(main_tex),
+            str(output_dir / "extract.ins"),
         ]
+    return None
 
-        try:
-            # Запускаем команду и захватываем вывод
-            process = subprocess.run(
-                " ".join(pdflatex_cmd),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=300,  # 5 минут таймаут на компиляцию
-                shell=True,
-                executable="/bin/bash",
+
+def run_prebuild(prebuild_cmd):
+    """
+    Выполняет команду предварительной сборки и замеряет ее время.
+
+    Args:
+        prebuild_cmd: команда (список аргументов)
+
+    Returns:
+        float: время (real) в секундах или None при ошибке
+    """
+    try:
+        process = subprocess.run(
+            "time -p " + " ".join(prebuild_cmd),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=300,
+            shell=True,
+            executable="/bin/bash",
+        )
+    except subprocess.TimeoutExpired:
+        print(f"  Таймаут предварительной сборки (более 5 минут)")
+        return None
+
+    if process.returncode != 0:
+        print(f"  Ошибка предварительной сборки (код {process.returncode})")
+        print(f"  stderr: {process.stderr}")
+        return None
+
+    real_time_match = re.search(r"real\s+(\d+\.?\d+)", process.stderr)
+    if not real_time_match:
+        print(f"  Не найдено 'time (real)' время предварительной сборки")
+        return None
+
+    return float(real_time_match.group(1))
+
+
+def parse_engine_options(text):
+    """
+    Разбирает набор опций движка.
+
+    Args:
+        text: опции через '+' (например, 'draftmode+compress0'); 'default' -- без опций
+
+    Returns:
+        list: опции в каноническом порядке (флаги, затем уровни сжатия)
+    """
+    names = [name.strip().lower() for name in text.split("+")]
+    names = [name for name in names if name and name != "default"]
+    for name in names:
+        if not ENGINE_OPTION_RE.fullmatch(name):
+            raise ValueError(
+                f"Неизвестная опция движка: {name} (допустимые: default, "
+                f"{', '.join(ENGINE_FLAGS)}, compress0-9, objcompress0-3)"
             )
+    for prefix in ["compress", "objcompress"]:
+        if len([name for name in names if name.rstrip("0123456789") == prefix]) > 1:
+            raise ValueError(f"Уровень {prefix} указан несколько раз: {text}")
 
-            # Используем замер времени из Python
-            time_output = process.stderr
-            real_time_match = re.search(r"real\s+(\d+\.?\d+)", time_output)
+    flags = [name for name in ENGINE_FLAGS if name in names]
+    levels = sorted(set(names) - set(flags), key=lambda name: name.startswith("obj"))
+    return flags + levels
 
-            if real_time_match:
-                time_real = float(real_time_match.group(1))
-                time_results.append(time_real)
-                print(f"  time (real): {time_real:.2f} сек")
-            else:
-                print(f"Не найдено 'time (real)' время")
-                time_results.append(None)
 
-            # Парсим лог-файл для benchmark времени
-            log_file = output_dir / "main.log"
-            if log_file.exists():
-                with open(log_file, "r", encoding="utf-8", errors="ignore") as f:
-                    log_content = f.read()
+def engine_options_label(engine_options):
+    """
+    Возвращает подпись набора опций движка для CSV: 'default' или 'draftmode+synctex'.
 
-                # Ищем строку с (l3benchmark) + TOC:
-                benchmark_match = re.search(
-                    r"\(l3benchmark\) \+ TOC:\s+(\d+\.?\d+)\s+s", log_content
-                )
+    Args:
+        engine_options: список опций (результат parse_engine_options)
 
-                if benchmark_match:
-                    benchmark_time = float(benchmark_match.group(1))
-                    benchmark_results.append(benchmark_time)
-                    print(f"  l3benchmark: {benchmark_time:.2f} сек")
-                else:
-                    print(f"  Не найдено l3benchmark время в лог-файле")
-                    benchmark_results.append(None)
-            else:
-                print(f"  Лог-файл не найден: {log_file}")
-                benchmark_results.append(None)
+    Returns:
+        str: подпись
+    """
+    return "+".join(engine_options) if engine_options else "default"
 
-        except subprocess.TimeoutExpired:
-            print(f"  Таймаут компиляции (более 5 минут)")
-            time_results.append(None)
-            benchmark_results.append(None)
-        except Exception as e:
-            print(f"  Ошибка при выполнении pdflatex: {e}")
-            time_results.append(None)
-            benchmark_results.append(None)
 
-    return time_results, benchmark_results
+def latex_command(latex_cmd, output_dir, main_tex, engine_options=()):
+    """
+    Формирует команду компиляции с учетом опций движка.
 
+    Уровни сжатия задаются кодом TeX перед \\input основного файла,
+    поэтому имя задания фиксируется опцией -jobname=main.
 
-def calculate_statistics(values):
+    Args:
+        latex_cmd: команда LaTeX (pdflatex, lualatex, xelatex)
+        output_dir: директория для результатов компиляции
+        main_tex: основной .tex файл
+        engine_options: список опций (результат parse_engine_options)
+
+    Returns:
+        list: команда (список аргументов)
     """
-    Вычисляет статистику для списка значений.
+    xetex = "xelatex" in latex_cmd
+    luatex = "lualatex" in latex_cmd
+    interaction = "batchmode" if "batchmode" in engine_options else "nonstopmode"
+    cmd = [latex_cmd, f"-interaction={interaction}"]
+
+    if "draftmode" in engine_options:
+        # xelatex не пишет PDF при -no-pdf (только .xdv)
+        cmd.append("-no-pdf" if xetex else "-draftmode")
+    if "synctex" in engine_options:
+        cmd.append("-synctex=1")
+    if "recorder" in engine_options:
+        cmd.append("-recorder")
+
+    cmd.extend(["-output-directory", str(output_dir)])
+
+    levels = {}
+    for name in engine_options:
+        match = re.fullmatch(r"(compress|objcompress)(\d)", name)
+        if match:
+            levels[match.group(1)] = match.group(2)
+
+    if not levels:
+        cmd.append(str(main_tex))
+        return cmd
+
+    if xetex:
+        # Сжатие PDF в xelatex выполняет драйвер xdvipdfmx; сжатие объектов не настраивается
+        cmd.insert(1, f"-output-driver=xdvipdfmx -z {levels.get('compress', '9')}")
+        cmd.append(str(main_tex))
+        return cmd
+
+    code = ""
+    for name, level in levels.items():
+        if luatex:
+            code += f"\\pdfvariable {name}level={level} "
+        else:
+            code += f"\\pdf{name}level={level} "
+    cmd.insert(1, "-jobname=main")
+    cmd.append(f"{code}\\input{{{main_tex}}}")
+    return cmd
+
+
+def aux_files_hash(output_dir):
+    """
+    Вычисляет общий хеш всех .aux файлов документа (включая .aux от \\include).
 
     Args:
-        values: список числовых значений
+        output_dir: директория сгенерированного документа
 
     Returns:
-        dict: статистика (среднее, минимум, максимум)
+        str: шестнадцатеричный хеш или None, если .aux файлов нет
     """
-    # Фильтруем None значения
-    filtered_values = [v for v in values if v is not None]
+    files = sorted(Path(output_dir).rglob("*.aux"))
+    if not files:
+        return None
+    digest = hashlib.sha1()
+    for file in files:
+        digest.update(str(file.relative_to(output_dir)).encode("utf-8"))
+        digest.update(file.read_bytes())
+    return digest.hexdigest()
 
-    if not filtered_values:
-        return {"mean": None, "min": None, "max": None, "count": 0}
 
-    return {
-        "mean": mean(filtered_values),
-        "min": min(filtered_values),
-        "max": max(filtered_values),
-        "count": len(filtered_values),
-    }
+def clean_aux_files(output_dir):
+    """
+    Удаляет промежуточные файлы компиляции (кроме логов для отладки),
+    включая .aux файлы, подключенные через \\include.
 
+    Args:
+        output_dir: директория сгенерированного документа
+    """
+    for ext in [".aux", ".out", ".toc", ".synctex.gz", ".fls"]:
+        for file in Path(output_dir).rglob(f"*{ext}"):
+            try:
+                file.unlink()
+            except OSError:
+                pass
 
-def save_results_to_csv(results, output_csv, k, doc_type):
+
+class ProcessSampler(threading.Thread):
     """
-    Сохраняет результаты в CSV файл.
+    Поток, который опрашивает /proc/<pid>/status и /proc/<pid>/stat процесса
+    компиляции с заданным интервалом.
+
+    Компиляция запускается через bash (time -p), поэтому опрашивается первый
+    дочерний процесс bash -- сам движок. Отсчеты хранятся в массивах array:
+    время от запуска (с), RSS (КБ) и процессорное время user+system (с).
+    Собственный ввод-вывод потока (чтение /proc) сохраняется в io, чтобы
+    вычесть его из счетчиков компиляции.
+    """
+
+    def __init__(self, pid, interval):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.target = None
+        self.times = array("d")
+        self.rss = array("q")
+        self.cpu = array("d")
+        self.stopped = threading.Event()
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+        self.io = {}
+
+    def find_target(self):
+        """Возвращает pid движка: первый дочерний процесс bash или сам процесс после exec."""
+        try:
+            with open(f"/proc/{self.pid}/task/{self.pid}/children", "r") as f:
+                children = f.read().split()
+            if children:
+                return int(children[0])
+            with open(f"/proc/{self.pid}/comm", "r") as f:
+                return self.pid if f.read().strip() != "bash" else None
+        except OSError:
+            return None
+
+    def sample(self, elapsed):
+        """Добавляет один отсчет; возвращает False, если процесс уже завершился."""
+        try:
+            with open(f"/proc/{self.target}/status", "r") as f:
+                status = f.read()
+            with open(f"/proc/{self.target}/stat", "r") as f:
+                # Поля после имени процесса в скобках; utime и stime -- 14-е и 15-е
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return False
+        rss_match = re.search(r"VmRSS:\s+(\d+) kB", status)
+        if not rss_match:
+            # Зомби-процесс: память уже освобождена
+            return False
+        self.times.append(elapsed)
+        self.rss.append(int(rss_match.group(1)))
+        self.cpu.append((int(fields[11]) + int(fields[12])) / self.clock_ticks)
+        return True
+
+    def run(self):
+        io_before = read_proc_io("/proc/thread-self/io")
+        start = time.perf_counter()
+        while not self.stopped.is_set():
+            if self.target is None:
+                self.target = self.find_target()
+            if self.target is not None and not self.sample(time.perf_counter() - start):
+                break
+            self.stopped.wait(self.interval)
+        io_after = read_proc_io("/proc/thread-self/io")
+        self.io = {
+            name: io_after[name] - io_before[name]
+            for name in PROC_IO_FIELDS
+            if name in io_before and name in io_after
+        }
+
+    def stop(self):
+        """Останавливает опрос и дожидается завершения потока."""
+        self.stopped.set()
+        self.join()
+
+
+def run_latex_pass(pdflatex_cmd, log_file, sample_interval=0):
+    """
+    Выполняет один проход компиляции и разбирает его лог.
+
+    Счетчики ввода-вывода снимаются непосредственно вокруг запуска движка,
+    без чтения лога самим замером; вывод движка в stdout не читается.
 
     Args:
-        results: список результатов для каждого N
-        output_csv: путь к CSV файлу
-        k: количество запусков
-        doc_type: тип документа
+        pdflatex_cmd: команда компиляции (результат latex_command)
+        log_file: путь к main.log
+        sample_interval: интервал опроса памяти и процессорного времени движка
+            в секундах (0 -- не опрашивать)
+
+    Returns:
+        tuple: (time real в секундах или None, l3benchmark время или None,
+                содержимое лога или None, ProcessSampler или None,
+                словарь приращений счетчиков PROC_IO_FIELDS)
     """
-    # Создаем заголовок CSV
-    headers = ["N", "doc_type"]
+    sampler = None
+    io = {}
+    io_before = read_proc_io()
+    try:
+        # Запускаем команду и захватываем вывод time
+        process = subprocess.Popen(
+            "time -p " + shlex.join(pdflatex_cmd),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            shell=True,
+            executable="/bin/bash",
+        )
+        if sample_interval:
+            sampler = ProcessSampler(process.pid, sample_interval)
+            sampler.start()
+        try:
+            _, stderr = process.communicate(timeout=300)  # 5 минут таймаут на компиляцию
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        finally:
+            if sampler is not None:
+                sampler.stop()
+    except subprocess.TimeoutExpired:
+        print(f"  Таймаут компиляции (более 5 минут)")
+        return None, None, None, sampler, io
+    except Exception as e:
+        print(f"  Ошибка при выполнении pdflatex: {e}")
+        return None, None, None, sampler, io
+
+    # Ввод-вывод прохода без чтения /proc потоком опроса
+    io_after = read_proc_io()
+    own_io = sampler.io if sampler is not None else {}
+    for name in PROC_IO_FIELDS:
+        if name in io_before and name in io_after:
+            io[name] = io_after[name] - io_before[name] - own_io.get(name, 0)
+
+    # Используем замер времени из time -p
+    real_time_match = re.search(r"real\s+(\d+\.?\d+)", stderr)
+    if real_time_match:
+        time_real = float(real_time_match.group(1))
+    else:
+        print(f"Не найдено 'time (real)' время")
+        time_real = None
 
-    # Добавляем столбцы для time результатов
-    for i in range(1, k + 1):
-        headers.append(f"time_run_{i}")
+    # Парсим лог-файл для benchmark времени
+    if not log_file.exists():
+        print(f"  Лог-файл не найден: {log_file}")
+        return time_real, None, None, sampler, io
 
-    # Добавляем столбцы для benchmark результатов
-    for i in range(1, k + 1):
-        headers.append(f"benchmark_run_{i}")
+    with open(log_file, "r", encoding="utf-8", errors="ignore") as f:
+        log_content = f.read()
 
-    # Добавляем статистику
-    headers.extend(
-        [
+    # Ищем строку с (l3benchmark) + TOC:
+    benchmark_match = re.search(r"\(l3benchmark\) \+ TOC:\s+(\d+\.?\d+)\s+s", log_content)
+    if benchmark_match:
+        benchmark_time = float(benchmark_match.group(1))
+    else:
+        print(f"  Не найдено l3benchmark время в лог-файле")
+        benchmark_time = None
+
+    return time_real, benchmark_time, log_content, sampler, io
+
+
+def parse_memory_stats(log_content):
+    """
+    Разбирает статистику памяти TeX в конце лога.
+
+    Args:
+        log_content: содержимое лога
+
+    Returns:
+        tuple: (словарь счетчик -> использовано, словарь счетчик -> предел);
+               пустые словари, если статистики в логе нет
+    """
+    used = {}
+    capacity = {}
+    start = re.search(r"Here is how much of \w+'s memory you used:", log_content or "")
+    if not start:
+        return used, capacity
+
+    stats_text = log_content[start.end() :]
+    for pattern, names in MEMORY_STATS:
+        match = re.search(pattern, stats_text)
+        if not match:
+            continue
+        values = [int(v) for v in match.groups()]
+        limits = values[len(names) :]
+        # Предел хеш-таблицы записан как hash_size+hash_extra
+        if len(names) == 1 and len(limits) > 1:
+            limits = [sum(limits)]
+        for name, value in zip(names, values):
+            used[name] = value
+        for name, limit in zip(names, limits):
+            capacity[name] = limit
+
+    return used, capacity
+
+
+def parse_output_stats(log_content):
+    """
+    Разбирает строку "Output written on main.pdf (P pages, B bytes)" в логе.
+
+    XeTeX не указывает размер файла, а пишет только число страниц
+    ("Output written on main.pdf (P pages)."), тогда pdf_bytes не возвращается.
+
+    Args:
+        log_content: содержимое лога
+
+    Returns:
+        dict: pdf_pages и pdf_bytes (если есть); pdf_pages = 0 для "No pages of output.";
+              пустой словарь, если строки нет (например, в режиме draftmode)
+    """
+    # TeX переносит длинные строки лога (max_print_line), поэтому ищем без переводов строк
+    text = (log_content or "").replace("\n", "")
+    match = re.search(r"Output written on .*?\((\d+) pages?(?:, (\d+) bytes)?\)", text)
+    if match:
+        stats = {"pdf_pages": int(match.group(1))}
+        if match.group(2) is not None:
+            stats["pdf_bytes"] = int(match.group(2))
+        return stats
+    if "No pages of output." in text:
+        return {"pdf_pages": 0, "pdf_bytes": 0}
+    return {}
+
+
+def tex_files_size(output_dir):
+    """
+    Возвращает суммарный размер всех сгенерированных .tex файлов документа в байтах
+    (основной файл, файлы с фрагментами и файлы-фрагменты в подпапках).
+
+    Args:
+        output_dir: директория сгенерированного документа
+
+    Returns:
+        int: размер в байтах
+    """
+    return sum(file.stat().st_size for file in Path(output_dir).rglob("*.tex"))
+
+
+def throughput(values, time_values):
+    """
+    Делит величину на время каждого запуска.
+
+    Args:
+        values: значения по запускам (число или список по запускам)
+        time_values: время (real) по запускам
+
+    Returns:
+        list: величина в секунду по запускам (None, если данных нет)
+    """
+    if not isinstance(values, list):
+        values = [values] * len(time_values)
+    return [
+        v / t if v is not None and t else None for v, t in zip(values, time_values)
+    ]
+
+
+def read_proc_io(path="/proc/self/io"):
+    """
+    Читает счетчики ввода-вывода текущего процесса из /proc/self/io.
+
+    Ядро добавляет счетчики завершившихся дочерних процессов к родителю,
+    когда тот их дожидается, поэтому разность значений до и после
+    запуска компиляции включает ввод-вывод bash, time и самого движка
+    (/proc/<pid>/io движка после его завершения уже недоступен).
+
+    Args:
+        path: файл счетчиков (/proc/thread-self/io -- только текущий поток)
+
+    Returns:
+        dict: счетчик -> значение; пустой словарь, если /proc недоступен
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return {}
+    counters = {}
+    for line in lines:
+        name, _, value = line.partition(":")
+        counters[name.strip()] = int(value)
+    return counters
+
+
+def read_file_value(path, pattern=None):
+    """
+    Читает значение из файла /proc или /sys.
+
+    Args:
+        path: путь к файлу
+        pattern: регулярное выражение с одной группой (None -- весь файл)
+
+    Returns:
+        str: значение или None, если файл недоступен или значение не найдено
+    """
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+    except OSError:
+        return None
+    if pattern is None:
+        return text.strip()
+    match = re.search(pattern, text, re.MULTILINE)
+    return match.group(1).strip() if match else None
+
+
+def package_version(file_name):
+    """
+    Определяет дату и версию пакета по файлу, найденному kpsewhich.
+
+    Args:
+        file_name: имя файла пакета (например, catchfilebetweentags.sty)
+
+    Returns:
+        str: строка версии или None, если kpsewhich или файл недоступны
+    """
+    try:
+        path = subprocess.run(
+            ["kpsewhich", file_name], stdout=subprocess.PIPE, text=True, timeout=30
+        ).stdout.strip()
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if not path:
+        return None
+    match = PACKAGE_VERSION_RE.search(read_file_value(path) or "")
+    if not match:
+        return None
+    return (match.group(1) or match.group(2)).strip()
+
+
+def environment_fingerprint(latex_cmd):
+    """
+    Собирает неизменные во время измерений сведения об окружении.
+
+    Args:
+        latex_cmd: команда LaTeX
+
+    Returns:
+        dict: cpu_model, cpu_count, cpu_governor, tex_version и версии пакетов
+              (см. PACKAGE_VERSION_FILES); недоступные значения -- None
+    """
+    try:
+        version = subprocess.run(
+            [latex_cmd, "--version"], stdout=subprocess.PIPE, text=True, timeout=30
+        ).stdout
+        tex_version = version.splitlines()[0].strip() if version.strip() else None
+    except (OSError, subprocess.TimeoutExpired):
+        tex_version = None
+
+    fingerprint = {
+        "cpu_model": read_file_value("/proc/cpuinfo", r"^model name\s*:\s*(.+)$"),
+        "cpu_count": os.cpu_count(),
+        "cpu_governor": read_file_value(
+            "/sys/devices/system/cpu/cpu0/cpufreq/scaling_governor"
+        ),
+        "tex_version": tex_version,
+    }
+    for name, file_name in PACKAGE_VERSION_FILES.items():
+        fingerprint[name] = package_version(file_name)
+    return fingerprint
+
+
+def environment_sample():
+    """
+    Снимает изменчивые показатели окружения перед запуском.
+
+    Returns:
+        dict: load_1 (средняя загрузка за минуту), cpu_mhz (средняя текущая частота),
+              mem_available_mb; недоступные показатели пропускаются
+    """
+    sample = {}
+    try:
+        sample["load_1"] = round(os.getloadavg()[0], 2)
+    except OSError:
+        pass
+
+    cpuinfo = read_file_value("/proc/cpuinfo") or ""
+    frequencies = [float(v) for v in re.findall(r"^cpu MHz\s*:\s*([\d.]+)", cpuinfo, re.MULTILINE)]
+    if frequencies:
+        sample["cpu_mhz"] = round(mean(frequencies), 1)
+
+    available = read_file_value("/proc/meminfo", r"^MemAvailable:\s*(\d+) kB")
+    if available is not None:
+        sample["mem_available_mb"] = int(available) // 1024
+    return sample
+
+
+def cpu_busy_seconds():
+    """
+    Возвращает суммарное процессорное время всех процессов системы (без простоя)
+    по первой строке /proc/stat.
+
+    Returns:
+        float: секунды или None, если /proc недоступен
+    """
+    line = read_file_value("/proc/stat", r"^cpu\s+(.+)$")
+    if line is None:
+        return None
+    # user nice system idle iowait irq softirq steal ...
+    fields = [int(v) for v in line.split()]
+    busy = fields[0] + fields[1] + fields[2] + sum(fields[5:8])
+    return busy / os.sysconf("SC_CLK_TCK")
+
+
+def own_cpu_seconds():
+    """Процессорное время этого процесса и всех завершившихся дочерних процессов."""
+    total = 0.0
+    for who in [resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN]:
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def parse_fls(fls_file):
+    """
+    Подсчитывает открытия файлов на чтение по выводу -recorder (.fls).
+
+    Args:
+        fls_file: путь к main.fls
+
+    Returns:
+        Counter: абсолютный путь -> число строк INPUT (пустой, если файла нет)
+    """
+    opens = Counter()
+    if not fls_file.exists():
+        return opens
+    pwd = fls_file.parent
+    with open(fls_file, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            kind, _, path = line.rstrip("\n").partition(" ")
+            if kind == "PWD":
+                pwd = Path(path)
+            elif kind == "INPUT":
+                opens[os.path.normpath(pwd / path)] += 1
+    return opens
+
+
+def file_access_stats(opens, output_dir):
+    """
+    Сводит открытия файлов в метрики: все файлы и файлы самого документа.
+
+    Args:
+        opens: результат parse_fls
+        output_dir: директория сгенерированного документа
+
+    Returns:
+        dict: fls_opens, fls_files, fls_local_opens, fls_local_files,
+              fls_local_bytes (размер файлов документа с учетом повторных открытий)
+    """
+    root = os.path.normpath(Path(output_dir).resolve())
+    local = {
+        path: count
+        for path, count in opens.items()
+        if path.startswith(root + os.sep) and os.path.isfile(path)
+    }
+    return {
+        "fls_opens": sum(opens.values()),
+        "fls_files": len(opens),
+        "fls_local_opens": sum(local.values()),
+        "fls_local_files": len(local),
+        "fls_local_bytes": sum(os.path.getsize(path) * count for path, count in local.items()),
+    }
+
+
+def edit_candidates(output_dir):
+    """
+    Возвращает файлы, в которых хранится текст фрагментов документа.
+
+    Args:
+        output_dir: директория сгенерированного документа
+
+    Returns:
+        list: пути к файлам с фрагментами (main.tex для плоских документов)
+    """
+    files = []
+    for pattern in ["des.tex", "des_*.tex", "data.tex", "data_*.tex", "des/*.tex", "data/*.tex"]:
+        files.extend(sorted(Path(output_dir).glob(pattern)))
+    return files or [Path(output_dir) / "main.tex"]
+
+
+def mutate_fragment(output_dir, rng):
+    """
+    Правит текст одного случайного фрагмента, не меняя размер файла.
+
+    В строке текста одна латинская буква (не в имени команды) заменяется другой, а в строке с \\lipsum[k]
+    меняется номер абзаца. Размер файла и смещения строк сохраняются, поэтому
+    индексы смещений (modular_inner_lua_seek) остаются верными.
+
+    Args:
+        output_dir: директория сгенерированного документа
+        rng: генератор случайных чисел (random.Random)
+
+    Returns:
+        Path: измененный файл или None, если править нечего
+    """
+    files = edit_candidates(output_dir)
+    for path in rng.sample(files, len(files)):
+        lines = path.read_bytes().split(b"\n")
+        # В основном файле правится только тело документа
+        body_start = 0
+        if b"\\begin{document}" in lines:
+            body_start = lines.index(b"\\begin{document}") + 1
+        candidates = [
+            idx
+            for idx, line in enumerate(lines[body_start:], start=body_start)
+            if re.search(rb"\\lipsum\[[1-5]\]", line)
+            or (not line.startswith((b"%", b"\\")) and TEXT_WORD_RE.search(line))
+        ]
+        if not candidates:
+            continue
+
+        idx = rng.choice(candidates)
+        line = bytearray(lines[idx])
+        lipsum_refs = [m.start(1) for m in re.finditer(rb"\\lipsum\[([1-5])\]", line)]
+        if lipsum_refs:
+            pos = rng.choice(lipsum_refs)
+            line[pos] = ord("1") + (line[pos] - ord("1") + 1) % 5
+        else:
+            word = rng.choice(list(TEXT_WORD_RE.finditer(line)))
+            pos = rng.randrange(word.start(), word.end())
+            alphabet = b"abcdefghijklmnopqrstuvwxyz"
+            if chr(line[pos]).isupper():
+                alphabet = alphabet.upper()
+            line[pos] = rng.choice([c for c in alphabet if c != line[pos]])
+        lines[idx] = bytes(line)
+        path.write_bytes(b"\n".join(lines))
+        return path
+    return None
+
+
+def set_include_only(main_tex, fragment_file=None):
+    """
+    Ограничивает сборку одним файлом через \\includeonly (для документов с \\include).
+
+    Args:
+        main_tex: основной файл
+        fragment_file: файл фрагмента, подключаемый \\include;
+            None -- убрать \\includeonly
+    """
+    text = main_tex.read_text(encoding="utf-8")
+    if fragment_file is None:
+        line = ""
+    else:
+        name = fragment_file.relative_to(main_tex.parent).with_suffix("").as_posix()
+        line = f"\\includeonly{{{name}}}\n"
+    if "\\includeonly{" in text:
+        text = re.sub(r"\\includeonly\{[^}]*\}\n", lambda _: line, text, count=1)
+    elif line:
+        text = text.replace("\n", "\n" + line, 1)
+    main_tex.write_text(text, encoding="utf-8")
+
+
+def run_pdflatex_k_times(
+    output_dir,
+    k,
+    latex_cmd="pdflatex",
+    prebuild_cmd=None,
+    engine_options=(),
+    passes=1,
+    edit=None,
+    sample_interval=0,
+    timelines=None,
+):
+    """
+    Запускает pdflatex K раз и собирает данные о времени.
+
+    При passes > 1 или passes == "auto" каждый запуск -- полная сборка с нуля
+    (промежуточные файлы удаляются перед запуском) из нескольких проходов:
+    ровно passes проходов или, в режиме "auto", пока хеш .aux файлов не перестанет
+    меняться (не более MAX_AUTO_PASSES). time и benchmark запуска -- сумма по проходам.
+
+    Args:
+        output_dir: директория с .tex файлом
+        k: количество запусков
+        latex_cmd: команда LaTeX (pdflatex, lualatex, xelatex)
+        prebuild_cmd: команда, подготавливающая файлы перед каждой компиляцией;
+            ее время замеряется отдельно и входит в измеренное time
+        engine_options: опции движка (результат parse_engine_options)
+        passes: количество проходов или "auto"
+        edit: функция без аргументов, вызываемая перед каждым запуском (правка
+            документа); промежуточные файлы при этом не удаляются
+        sample_interval: интервал опроса RSS и процессорного времени движка
+            в секундах (0 -- не опрашивать)
+        timelines: список, в который добавляется хронология каждого запуска --
+            кортеж массивов (время, RSS в КБ, процессорное время) всех проходов
+
+    Returns:
+        tuple: (список time результатов, список benchmark результатов,
+                список времен предварительной сборки -- пустой без prebuild_cmd,
+                словарь дополнительных метрик имя -> значения по запускам:
+                passes и pass<P>_time для многопроходной сборки, счетчики
+                памяти TeX tex_* (см. MEMORY_STATS), размер результата
+                pdf_pages/pdf_bytes и открытия файлов fls_* (с опцией recorder)
+                последнего прохода, ввод-вывод io_* всех проходов, пиковый
+                RSS rss_peak_kb по опросу, показатели окружения load_1, cpu_mhz,
+                mem_available_mb и загрузка процессора другими процессами other_cpu)
+    """
+    main_tex = output_dir / "main.tex"
+    log_file = output_dir / "main.log"
+
+    if prebuild_cmd is None and not main_tex.exists():
+        print(f"Файл {main_tex} не найден")
+        return [], [], [], {}
+
+    time_results = []
+    benchmark_results = []
+    prebuild_results = []
+    pass_counts = []
+    pass_times = []
+    log_stats = []
+
+    multipass = passes != 1
+    max_passes = MAX_AUTO_PASSES if passes == "auto" else passes
+
+    print(f"Запуск компиляции {k} раз...")
+
+    for i in range(1, k + 1):
+        print(f"\nЗапуск {i}/{k}...")
+
+        if edit is not None:
+            edit()
+        elif multipass:
+            clean_aux_files(output_dir)
+
+        prebuild_time = 0.0
+        if prebuild_cmd is not None:
+            prebuild_time = run_prebuild(prebuild_cmd)
+            prebuild_results.append(prebuild_time)
+            if prebuild_time is None:
+                time_results.append(None)
+                benchmark_results.append(None)
+                pass_counts.append(None)
+                pass_times.append([])
+                log_stats.append({})
+                if timelines is not None:
+                    timelines.append((array("d"), array("q"), array("d")))
+                continue
+            print(f"  prebuild (real): {prebuild_time:.2f} сек")
+
+        # Формируем команду pdflatex
+        pdflatex_cmd = latex_command(latex_cmd, output_dir, main_tex, engine_options)
+
+        run_times = []
+        run_benchmarks = []
+        aux_hash = aux_files_hash(output_dir)
+        converged = False
+        log_content = None
+        run_io = {}
+        environment = environment_sample()
+        busy_before = cpu_busy_seconds()
+        own_before = own_cpu_seconds()
+        wall_before = time.perf_counter()
+        # Хронология всех проходов: отсчеты прохода сдвигаются на время предыдущих
+        timeline = (array("d"), array("q"), array("d"))
+        offset = 0.0
+
+        for pass_num in range(1, max_passes + 1):
+            time_real, benchmark_time, log_content, sampler, io = run_latex_pass(
+                pdflatex_cmd, log_file, sample_interval
+            )
+            for name, value in io.items():
+                run_io[name] = run_io.get(name, 0) + value
+            if sampler is not None:
+                timeline[0].extend(t + offset for t in sampler.times)
+                timeline[1].extend(sampler.rss)
+                timeline[2].extend(sampler.cpu)
+                offset += time_real or (sampler.times[-1] if sampler.times else 0.0)
+            run_times.append(time_real)
+            run_benchmarks.append(benchmark_time)
+            if multipass and time_real is not None:
+                print(f"  проход {pass_num}: time (real) {time_real:.2f} сек")
+            if time_real is None:
+                break
+
+            # Сборка сошлась, когда проход не изменил .aux файлы
+            new_hash = aux_files_hash(output_dir)
+            converged = new_hash == aux_hash
+            aux_hash = new_hash
+            if passes == "auto" and converged:
+                break
+
+        if passes == "auto" and not converged and None not in run_times:
+            print(f"  Предупреждение: .aux не сошелся за {max_passes} проходов")
+
+        # time включает предварительную сборку, если она есть
+        if None in run_times:
+            time_results.append(None)
+        else:
+            time_real = sum(run_times) + prebuild_time
+            time_results.append(time_real)
+            print(f"  time (real): {time_real:.2f} сек")
+
+        if None in run_benchmarks:
+            benchmark_results.append(None)
+        else:
+            benchmark_time = sum(run_benchmarks)
+            benchmark_results.append(benchmark_time)
+            print(f"  l3benchmark: {benchmark_time:.2f} сек")
+
+        pass_counts.append(len(run_times) if None not in run_times else None)
+        pass_times.append(run_times)
+        # Статистика памяти записывается и для неудачных запусков (TeX capacity exceeded)
+        stats = parse_memory_stats(log_content)[0]
+        stats.update(parse_output_stats(log_content))
+        pdf_file = Path(output_dir) / "main.pdf"
+        if "pdf_pages" in stats and "pdf_bytes" not in stats and pdf_file.exists():
+            stats["pdf_bytes"] = pdf_file.stat().st_size
+
+        # Окружение перед запуском и загрузка процессора другими процессами во время
+        # компиляции (в ядрах): все занятое время системы минус время самого замера
+        stats.update(environment)
+        busy_after = cpu_busy_seconds()
+        wall = time.perf_counter() - wall_before
+        if busy_before is not None and busy_after is not None and wall > 0:
+            other = busy_after - busy_before - (own_cpu_seconds() - own_before)
+            stats["other_cpu"] = round(max(other, 0.0) / wall, 3)
+
+        # Ввод-вывод всех проходов компиляции (без предварительной сборки)
+        for name, value in run_io.items():
+            stats[f"io_{name}"] = value
+
+        if sample_interval:
+            stats["rss_peak_kb"] = max(timeline[1]) if timeline[1] else None
+            if timelines is not None:
+                timelines.append(timeline)
+
+        # Открытия файлов последнего прохода по main.fls
+        if "recorder" in engine_options:
+            stats.update(file_access_stats(parse_fls(output_dir / "main.fls"), output_dir))
+        log_stats.append(stats)
+
+    metrics = {}
+    if multipass:
+        metrics["passes"] = pass_counts
+        for pass_num in range(1, max((len(t) for t in pass_times), default=0) + 1):
+            metrics[f"pass{pass_num}_time"] = [
+                t[pass_num - 1] if pass_num <= len(t) else None for t in pass_times
+            ]
+    for name in dict.fromkeys(name for stats in log_stats for name in stats):
+        metrics[name] = [stats.get(name) for stats in log_stats]
+
+    return time_results, benchmark_results, prebuild_results, metrics
+
+
+def run_calibration(base_dir, k, latex_cmd, engine_option_sets):
+    """
+    Компилирует документы калибровки K раз для каждого набора опций движка.
+
+    Args:
+        base_dir: базовая директория тестов (документы пишутся в calibration/)
+        k: количество запусков
+        latex_cmd: команда LaTeX
+        engine_option_sets: наборы опций движка
+
+    Returns:
+        dict: подпись опций движка -> {документ: список time результатов}
+    """
+    calibration = {}
+    for engine_options in engine_option_sets:
+        label = engine_options_label(engine_options)
+        calibration[label] = {}
+        for name, content in CALIBRATION_DOCUMENTS.items():
+            output_dir = Path(base_dir) / "calibration" / name
+            output_dir.mkdir(parents=True, exist_ok=True)
+            (output_dir / "main.tex").write_text(content, encoding="utf-8")
+
+            print(f"\nКалибровка: {name}, опции: {label}")
+            time_values = run_pdflatex_k_times(
+                output_dir, k, latex_cmd, engine_options=engine_options
+            )[0]
+            calibration[label][name] = time_values
+            clean_aux_files(output_dir)
+    return calibration
+
+
+def save_calibration_to_csv(calibration, output_csv, k):
+    """
+    Сохраняет распределения времени документов калибровки в CSV файл.
+
+    Args:
+        calibration: результат run_calibration
+        output_csv: путь к CSV файлу
+        k: количество запусков
+    """
+    headers = ["engine_options", "document"]
+    headers.extend(f"time_run_{i}" for i in range(1, k + 1))
+    headers.extend(["time_mean", "time_min", "time_max", "time_count"])
+
+    with open(output_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        for label, documents in calibration.items():
+            for name, time_values in documents.items():
+                stats = calculate_statistics(time_values)
+                row = [label, name]
+                row.extend(time_values[i] if i < len(time_values) else None for i in range(k))
+                row.extend([stats["mean"], stats["min"], stats["max"], stats["count"]])
+                writer.writerow(row)
+
+    print(f"\n✓ Калибровка сохранена в {output_csv}")
+
+
+def percentile(sorted_values, q):
+    """
+    Вычисляет перцентиль с линейной интерполяцией между соседними значениями.
+
+    Args:
+        sorted_values: отсортированный непустой список значений
+        q: перцентиль от 0 до 100
+
+    Returns:
+        float: значение перцентиля
+    """
+    pos = (len(sorted_values) - 1) * q / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+def outlier_flags(values):
+    """
+    Отмечает выбросы по правилу Тьюки: значения дальше 1.5 IQR от квартилей.
+
+    Args:
+        values: список числовых значений (None пропускаются)
+
+    Returns:
+        list: 1 для выброса, 0 для обычного значения, None для пропущенного
+    """
+    ordered = sorted(v for v in values if v is not None)
+    if not ordered:
+        return [None] * len(values)
+    q1, q3 = percentile(ordered, 25), percentile(ordered, 75)
+    low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+    return [None if v is None else int(v < low or v > high) for v in values]
+
+
+def calculate_statistics(values):
+    """
+    Вычисляет статистику для списка значений.
+
+    Кроме среднего, минимума и максимума вычисляются устойчивые к выбросам
+    оценки (см. ROBUST_STATS): медиана, перцентили p5/p95/p99, медианное
+    абсолютное отклонение (MAD), среднее без TRIM_FRACTION крайних значений
+    с каждой стороны и число выбросов по правилу Тьюки.
+
+    Args:
+        values: список числовых значений
+
+    Returns:
+        dict: статистика (среднее, минимум, максимум, количество и ROBUST_STATS)
+    """
+    # Фильтруем None значения
+    filtered_values = [v for v in values if v is not None]
+
+    if not filtered_values:
+        stats = {"mean": None, "min": None, "max": None, "count": 0}
+        stats.update((name, None) for name in ROBUST_STATS)
+        return stats
+
+    ordered = sorted(filtered_values)
+    center = median(ordered)
+    cut = int(len(ordered) * TRIM_FRACTION)
+
+    return {
+        "mean": mean(filtered_values),
+        "min": min(filtered_values),
+        "max": max(filtered_values),
+        "count": len(filtered_values),
+        "median": center,
+        "p5": percentile(ordered, 5),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+        "mad": median(abs(v - center) for v in ordered),
+        "trimmed_mean": mean(ordered[cut : len(ordered) - cut]),
+        "outliers": sum(outlier_flags(ordered)),
+    }
+
+
+def save_results_to_csv(results, output_csv, k, doc_type):
+    """
+    Сохраняет результаты в CSV файл.
+
+    Параметры из result["params"] (имя -> значение) записываются столбцами
+    сразу после doc_type. После среднего, минимума и максимума time и benchmark
+    записываются устойчивые оценки ROBUST_STATS. Дополнительные метрики из result["metrics"]
+    (имя -> значения по запускам) добавляются после основных столбцов:
+    <имя>_run_i, <имя>_mean/min/max/count.
+
+    Args:
+        results: список результатов для каждого N
+        output_csv: путь к CSV файлу
+        k: количество запусков
+        doc_type: тип документа
+    """
+    # Параметры эксперимента в порядке первого появления
+    param_names = []
+    for result in results:
+        for name in result.get("params", {}):
+            if name not in param_names:
+                param_names.append(name)
+
+    # Создаем заголовок CSV
+    headers = ["N", "doc_type"] + param_names
+
+    # Добавляем столбцы для time результатов
+    for i in range(1, k + 1):
+        headers.append(f"time_run_{i}")
+
+    # Добавляем столбцы для benchmark результатов
+    for i in range(1, k + 1):
+        headers.append(f"benchmark_run_{i}")
+
+    # Добавляем статистику
+    headers.extend(
+        [
             "time_mean",
             "time_min",
             "time_max",
@@ -291,56 +1673,256 @@ def save_results_to_csv(results, output_csv, k, doc_type):
             "benchmark_count",
         ]
     )
+    for metric in ["time", "benchmark"]:
+        headers.extend(f"{metric}_{name}" for name in ROBUST_STATS)
+
+    # Дополнительные метрики в порядке первого появления
+    metric_names = []
+    for result in results:
+        for name in result.get("metrics", {}):
+            if name not in metric_names:
+                metric_names.append(name)
+
+    for name in metric_names:
+        for i in range(1, k + 1):
+            headers.append(f"{name}_run_{i}")
+        headers.extend([f"{name}_mean", f"{name}_min", f"{name}_max", f"{name}_count"])
+
+    # Создаем данные для CSV
+    rows = []
+    for result in results:
+        n = result["N"]
+        time_vals = result["time_values"]
+        benchmark_vals = result["benchmark_values"]
+        time_stats = result["time_stats"]
+        benchmark_stats = result["benchmark_stats"]
+
+        # Создаем строку с данными
+        row = [n, doc_type]
+        row.extend(result.get("params", {}).get(name) for name in param_names)
+
+        # Добавляем time значения (заполняем None если недостаточно)
+        for i in range(k):
+            if i < len(time_vals):
+                row.append(time_vals[i])
+            else:
+                row.append(None)
+
+        # Добавляем benchmark значения
+        for i in range(k):
+            if i < len(benchmark_vals):
+                row.append(benchmark_vals[i])
+            else:
+                row.append(None)
+
+        # Добавляем статистику
+        row.extend(
+            [
+                time_stats["mean"],
+                time_stats["min"],
+                time_stats["max"],
+                benchmark_stats["mean"],
+                benchmark_stats["min"],
+                benchmark_stats["max"],
+                time_stats["count"],
+                benchmark_stats["count"],
+            ]
+        )
+        for stats in [time_stats, benchmark_stats]:
+            row.extend(stats[name] for name in ROBUST_STATS)
+
+        # Добавляем дополнительные метрики
+        for name in metric_names:
+            values = result.get("metrics", {}).get(name, [])
+            for i in range(k):
+                row.append(values[i] if i < len(values) else None)
+            stats = calculate_statistics(values)
+            row.extend([stats["mean"], stats["min"], stats["max"], stats["count"]])
+
+        rows.append(row)
+
+    # Записываем в CSV
+    with open(output_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        writer.writerows(rows)
+
+    print(f"\n✓ Результаты сохранены в {output_csv}")
+
+
+def ablation_variants(base, doc_type, sweep=False):
+    """
+    Возвращает наборы отключаемых компонентов, которые измеряются для каждого N.
+
+    В режиме перебора к базовому набору по очереди добавляется каждый компонент,
+    а последним -- все компоненты сразу (от блока остаются только фрагменты).
+
+    Args:
+        base: базовый набор компонентов (--ablate)
+        doc_type: тип документа
+        sweep: перебирать компоненты (--ablation-sweep)
+
+    Returns:
+        list: наборы компонентов; первый из них -- базовый
+    """
+    variants = [list(base)]
+    if sweep:
+        for extra in [[name] for name in ABLATIONS] + [BARE_ABLATIONS]:
+            variants.append([name for name in ABLATIONS if name in base or name in extra])
+
+    # Без пакета lipsum типы flat и modular не компилируются
+    if doc_type in LIPSUM_COMMAND_TYPES:
+        variants = [[name for name in v if name != "nolipsum"] for v in variants]
+
+    unique = []
+    for variant in variants:
+        if variant not in unique:
+            unique.append(variant)
+    return unique
+
+
+def ablation_attribution(results, base_label):
+    """
+    Строит таблицу вклада компонентов: на сколько уменьшается время, если убрать компонент.
+
+    Args:
+        results: результаты с параметрами ablation (и fragment_size, engine_options,
+            если они измерялись)
+        base_label: подпись базового набора компонентов
+
+    Returns:
+        list: строки таблицы (словари)
+    """
+    baselines = {}
+    for result in results:
+        params = result["params"]
+        if params["ablation"] == base_label:
+            key = (result["N"], params.get("fragment_size"), params.get("engine_options"))
+            baselines[key] = result
+
+    rows = []
+    for result in results:
+        params = result["params"]
+        key = (result["N"], params.get("fragment_size"), params.get("engine_options"))
+        if params["ablation"] == base_label or key not in baselines:
+            continue
+        row = {
+            "N": result["N"],
+            "fragment_size": params.get("fragment_size"),
+            "engine_options": params.get("engine_options"),
+            "ablation": params["ablation"],
+        }
+        for metric in ["time", "benchmark"]:
+            full = baselines[key][f"{metric}_stats"]["mean"]
+            ablated = result[f"{metric}_stats"]["mean"]
+            cost = full - ablated if full is not None and ablated is not None else None
+            row[f"{metric}_full"] = full
+            row[f"{metric}_ablated"] = ablated
+            row[f"{metric}_cost"] = cost
+            row[f"{metric}_share"] = cost / full * 100 if cost is not None and full else None
+        rows.append(row)
+    return rows
+
+
+def save_attribution_to_csv(rows, output_csv, doc_type):
+    """
+    Сохраняет таблицу вклада компонентов в CSV файл.
+
+    Args:
+        rows: строки ablation_attribution
+        output_csv: путь к CSV файлу
+        doc_type: тип документа
+    """
+    headers = ["N", "doc_type", "fragment_size", "engine_options", "ablation"]
+    for metric in ["time", "benchmark"]:
+        headers.extend([f"{metric}_full", f"{metric}_ablated", f"{metric}_cost", f"{metric}_share"])
+
+    with open(output_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow([row["N"], doc_type] + [row.get(name) for name in headers[2:]])
+
+    print(f"\n✓ Вклад компонентов сохранен в {output_csv}")
+
+
+def file_profile_rows(result, opens, output_dir):
+    """
+    Формирует строки профиля открытий файлов для одной точки сетки.
 
-    # Создаем данные для CSV
+    Args:
+        result: результат для точки (N и params)
+        opens: результат parse_fls последнего запуска
+        output_dir: директория сгенерированного документа
+
+    Returns:
+        list: словари N, fragment_size, ablation, engine_options, file, local, opens, bytes
+    """
+    root = Path(output_dir).resolve()
     rows = []
-    for result in results:
-        n = result["N"]
-        time_vals = result["time_values"]
-        benchmark_vals = result["benchmark_values"]
-        time_stats = result["time_stats"]
-        benchmark_stats = result["benchmark_stats"]
+    for path, count in opens.most_common():
+        local = path.startswith(str(root) + os.sep)
+        rows.append(
+            {
+                "N": result["N"],
+                "fragment_size": result["params"].get("fragment_size"),
+                "ablation": result["params"].get("ablation"),
+                "engine_options": result["params"].get("engine_options"),
+                "file": os.path.relpath(path, root) if local else path,
+                "local": int(local),
+                "opens": count,
+                "bytes": os.path.getsize(path) if os.path.isfile(path) else None,
+            }
+        )
+    return rows
 
-        # Создаем строку с данными
-        row = [n, doc_type]
 
-        # Добавляем time значения (заполняем None если недостаточно)
-        for i in range(k):
-            if i < len(time_vals):
-                row.append(time_vals[i])
-            else:
-                row.append(None)
+def save_file_profile_to_csv(rows, output_csv, doc_type):
+    """
+    Сохраняет профиль открытий файлов (по выводу -recorder) в CSV файл.
 
-        # Добавляем benchmark значения
-        for i in range(k):
-            if i < len(benchmark_vals):
-                row.append(benchmark_vals[i])
-            else:
-                row.append(None)
+    Args:
+        rows: строки file_profile_rows
+        output_csv: путь к CSV файлу
+        doc_type: тип документа
+    """
+    headers = ["N", "doc_type", "fragment_size", "ablation", "engine_options"]
+    headers.extend(["file", "local", "opens", "bytes"])
 
-        # Добавляем статистику
-        row.extend(
-            [
-                time_stats["mean"],
-                time_stats["min"],
-                time_stats["max"],
-                benchmark_stats["mean"],
-                benchmark_stats["min"],
-                benchmark_stats["max"],
-                time_stats["count"],
-                benchmark_stats["count"],
-            ]
-        )
+    with open(output_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow([row["N"], doc_type] + [row.get(name) for name in headers[2:]])
 
-        rows.append(row)
+    print(f"\n✓ Профиль открытий файлов сохранен в {output_csv}")
+
+
+def save_timeline_to_csv(entries, output_csv, doc_type):
+    """
+    Сохраняет хронологию RSS и процессорного времени движка в CSV файл
+    (одна строка на отсчет).
+
+    Args:
+        entries: пары (результат для точки, список хронологий по запускам)
+        output_csv: путь к CSV файлу
+        doc_type: тип документа
+    """
+    headers = ["N", "doc_type", "fragment_size", "ablation", "engine_options"]
+    headers.extend(["run", "t", "rss_kb", "cpu_s"])
 
-    # Записываем в CSV
     with open(output_csv, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
         writer.writerow(headers)
-        writer.writerows(rows)
+        for result, timelines in entries:
+            point = [result["N"], doc_type] + [
+                result["params"].get(name) for name in headers[2:5]
+            ]
+            for run, (times, rss, cpu) in enumerate(timelines, start=1):
+                for t, rss_kb, cpu_s in zip(times, rss, cpu):
+                    writer.writerow(point + [run, round(t, 4), rss_kb, round(cpu_s, 2)])
 
-    print(f"\n✓ Результаты сохранены в {output_csv}")
+    print(f"\n✓ Хронология памяти сохранена в {output_csv}")
 
 
 def main():
@@ -352,6 +1934,28 @@ def main():
   python benchmark_latex.py -t modular -i images -k 5 -o results_modular.csv
   python benchmark_latex.py -t modular_inner -i images -k 3 -o results_inner.csv
   python benchmark_latex.py -t modular_inner_last -i images -k 3 -o results_inner_last.csv
+  python benchmark_latex.py -t modular_inner_index -i images -k 3 -o results_inner_index.csv
+  python benchmark_latex.py -t modular_inner_sharded --shards 20 -i images -k 3 -o results_sharded_20.csv
+  python benchmark_latex.py -t files_input -i images -k 3 -o results_files_input.csv
+  python benchmark_latex.py -t modular_inner_lua_seek --latex-cmd lualatex -i images -k 3 -o results_lua_seek.csv
+  python benchmark_latex.py -t modular_precatch --reuse 5 -i images -k 3 -o results_precatch_r5.csv
+  python benchmark_latex.py -t modular_docstrip -i images -k 3 -o results_docstrip.csv
+  python benchmark_latex.py -t modular_inner --access-pattern zipf --seed 1 -r 5 -i images -o results_zipf.csv
+  python benchmark_latex.py -t modular_inner --n-values 100,500,1000 --fragment-sizes 200b,1000b,5000b -o results_grid.csv
+  python benchmark_latex.py -t all --corpus synthetic --corpus-seed 7 -i images -k 3 -o results_synthetic.csv
+  python benchmark_latex.py -t modular_inner --content mixed -i images -k 3 -o results_mixed.csv
+  python benchmark_latex.py -t modular_inner_nested --nesting-depth 3 -i images -k 3 -o results_nested_3.csv
+  python benchmark_latex.py -t modular_inner --ablation-sweep -i images -k 5 -o results_ablation.csv
+  python benchmark_latex.py -t macrodef --ablate draft -i images -k 3 -o results_macrodef_draft.csv
+  python benchmark_latex.py -t macrodef --engine-options default,draftmode,synctex,batchmode,compress0+objcompress0 -o results_engine.csv
+  python benchmark_latex.py -t modular_inner --engine-options recorder -o results_files.csv
+  python benchmark_latex.py -t modular_inner --passes auto --cross-refs -i images -k 3 -o results_passes.csv
+  python benchmark_latex.py -t modular_inner --edit-loop 20 --n-values 100,1000 -o results_edit.csv
+  python benchmark_latex.py -t files_include --edit-loop 20 --include-only -o results_edit_includeonly.csv
+  python benchmark_latex.py -t macrodef --sample-interval 0.02 --n-values 100,1000 -o results_rss.csv
+  python benchmark_latex.py -t all --calibrate -o results_all.csv
+  python benchmark_latex.py -t modular_inner --exclude-noisy --noise-threshold 0.2 -o results_quiet.csv
+  python benchmark_latex.py -t prop -i images -k 3 -o results_prop.csv
   python benchmark_latex.py -t all -i images -k 3 -o results_all.csv
         """,
     )
@@ -366,11 +1970,35 @@ def main():
             "modular",
             "modular_inner",
             "modular_inner_last",
+            "modular_inner_index",
+            "modular_inner_lua_table",
+            "modular_inner_lua_seek",
+            "modular_precatch",
+            "modular_docstrip",
+            "modular_prebuilt",
+            "modular_inner_sharded",
             "macrodef",
+            "macrodef_sharded",
+            "modular_inner_nested",
+            "macrodef_nested",
+            "prop",
+            "tlconst",
+            "pgfkeys",
+            "prop_debug",
+            "files_input",
+            "files_inputifexists",
+            "files_include",
+            "files_subfiles",
             "all",
         ],
         default="flat",
-        help="тип документа для тестирования (flat, modular, modular_inner, modular_inner_last, macrodef, all) (по умолчанию: flat)",
+        help="тип документа для тестирования (flat, modular, modular_inner, modular_inner_last, modular_inner_index, "
+        "modular_inner_lua_table, modular_inner_lua_seek, modular_precatch, modular_docstrip, "
+        "modular_prebuilt, "
+        "modular_inner_sharded, "
+        "macrodef, macrodef_sharded, modular_inner_nested, macrodef_nested, "
+        "prop, tlconst, pgfkeys, prop_debug, files_input, files_inputifexists, files_include, "
+        "files_subfiles, all) (по умолчанию: flat)",
     )
 
     parser.add_argument(
@@ -425,8 +2053,255 @@ def main():
         help="значения N через запятую (по умолчанию: 10,20,30,50,70,100,200,500,750,1000,1250,1500,1750,2000)",
     )
 
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=10,
+        help="количество шардов для типов modular_inner_sharded и macrodef_sharded; "
+        "значения N меньше него пропускаются (по умолчанию: 10)",
+    )
+
+    parser.add_argument(
+        "-r",
+        "--reuse",
+        type=int,
+        default=1,
+        help="сколько раз используется каждый фрагмент в типах modular* (блоков будет N * R) "
+        "(по умолчанию: 1)",
+    )
+
+    parser.add_argument(
+        "--access-pattern",
+        type=str,
+        choices=["sequential", "reverse", "random", "zipf", "first", "middle", "last"],
+        default="sequential",
+        help="порядок обращения блоков к тегам в типах modular* (по умолчанию: sequential)",
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="зерно генератора для порядков random и zipf (по умолчанию: 0)",
+    )
+
+    parser.add_argument(
+        "--fragment-sizes",
+        type=str,
+        default="1p",
+        help="средние размеры фрагментов через запятую (<число>p абзацев или <число>b байт) "
+        "для типов modular* и macrodef*; каждый размер измеряется для каждого N (по умолчанию: 1p)",
+    )
+
+    parser.add_argument(
+        "--size-distribution",
+        type=str,
+        choices=["fixed", "uniform", "exp"],
+        default="fixed",
+        help="распределение размеров фрагментов вокруг среднего (по умолчанию: fixed)",
+    )
+
+    parser.add_argument(
+        "--fragments-per-block",
+        type=int,
+        default=1,
+        help="сколько пар des/data выводит каждый блок в типах modular* и macrodef*; тегов будет N * F "
+        "(по умолчанию: 1)",
+    )
+
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        choices=["lipsum", "synthetic"],
+        default="lipsum",
+        help="источник текста фрагментов: пять абзацев lipsum по кругу или синтетический "
+        "корпус уникальных абзацев (типы flat и modular всегда используют \\lipsum) "
+        "(по умолчанию: lipsum)",
+    )
+
+    parser.add_argument(
+        "--corpus-seed",
+        type=int,
+        default=0,
+        help="зерно синтетического корпуса (по умолчанию: 0)",
+    )
+
+    parser.add_argument(
+        "--content",
+        type=str,
+        choices=["text", "math", "cyrillic", "mixed"],
+        default="text",
+        help="содержимое фрагментов для типов flat_inner, modular_inner*, macrodef*: "
+        "text, math, cyrillic или mixed (режимы, кроме text, используют синтетический корпус) "
+        "(по умолчанию: text)",
+    )
+
+    parser.add_argument(
+        "--nesting-depth",
+        type=int,
+        default=2,
+        help="глубина вложенных фрагментов для типов modular_inner_nested и macrodef_nested "
+        "(по умолчанию: 2)",
+    )
+
+    parser.add_argument(
+        "--ablate",
+        type=str,
+        default="",
+        help="компоненты блока, отключаемые во всех измерениях, через запятую: "
+        + ", ".join(ABLATIONS)
+        + " (nolipsum не действует на типы flat и modular) (по умолчанию: ничего не отключать)",
+    )
+
+    parser.add_argument(
+        "--ablation-sweep",
+        action="store_true",
+        help="для каждого N дополнительно измерить документ без каждого компонента по очереди "
+        "и без всех сразу; вклад компонентов сохраняется в <output>_attribution.csv",
+    )
+
+    parser.add_argument(
+        "--engine-options",
+        type=str,
+        default="default",
+        help="наборы опций движка через запятую, опции внутри набора через '+': default, "
+        "draftmode, batchmode, synctex, recorder, compress<0-9>, objcompress<0-3>; каждый набор "
+        "измеряется для каждого N (по умолчанию: default)",
+    )
+
+    parser.add_argument(
+        "--passes",
+        type=str,
+        default="1",
+        help="количество проходов компиляции в каждом запуске или auto -- повторять, "
+        f"пока .aux не перестанет меняться (не более {MAX_AUTO_PASSES}); при значении, "
+        "отличном от 1, каждый запуск начинается без .aux (по умолчанию: 1)",
+    )
+
+    parser.add_argument(
+        "--cross-refs",
+        action="store_true",
+        help="добавить в документы оглавление, \\label и \\ref, чтобы сборке "
+        "требовалось несколько проходов",
+    )
+
+    parser.add_argument(
+        "--edit-loop",
+        type=int,
+        default=0,
+        help="режим правок: после одной полной компиляции E раз изменить случайный фрагмент "
+        "и перекомпилировать; в CSV записываются задержки правок вместо -k запусков "
+        "(по умолчанию: 0 -- выключен)",
+    )
+
+    parser.add_argument(
+        "--calibrate",
+        action="store_true",
+        help="перед измерениями K раз скомпилировать пустой документ и документ из одной "
+        "преамбулы для каждого набора опций движка; их среднее время записывается в "
+        "startup_time и preamble_time для вычитания из результатов",
+    )
+
+    parser.add_argument(
+        "--noise-threshold",
+        type=float,
+        default=0.5,
+        help="запуск считается шумным, если другие процессы во время компиляции занимали "
+        "больше указанного числа ядер (столбцы other_cpu и noisy) (по умолчанию: 0.5)",
+    )
+
+    parser.add_argument(
+        "--exclude-noisy",
+        action="store_true",
+        help="не учитывать шумные запуски в статистике (mean/min/max/count)",
+    )
+
+    parser.add_argument(
+        "--sample-interval",
+        type=float,
+        default=0,
+        help="интервал опроса RSS и процессорного времени движка через /proc в секундах; "
+        "хронология сохраняется в <csv>_timeline.csv (по умолчанию: 0 -- выключен)",
+    )
+
+    parser.add_argument(
+        "--include-only",
+        action="store_true",
+        help="в режиме --edit-loop для типа files_include собирать только измененный "
+        "фрагмент через \\includeonly",
+    )
+
     args = parser.parse_args()
 
+    if args.edit_loop < 0:
+        print("Ошибка: Количество правок должно быть >= 0")
+        sys.exit(1)
+
+    if args.sample_interval < 0:
+        print("Ошибка: Интервал опроса должен быть >= 0")
+        sys.exit(1)
+
+    if args.include_only and not (args.edit_loop and args.type == "files_include"):
+        print("Ошибка: --include-only требует --edit-loop и -t files_include")
+        sys.exit(1)
+
+    # В режиме правок запуски -- это правки
+    runs = args.edit_loop or args.runs
+
+    if args.passes != "auto":
+        try:
+            args.passes = int(args.passes)
+        except ValueError:
+            args.passes = 0
+        if args.passes < 1:
+            print("Ошибка: --passes должно быть положительным числом или auto")
+            sys.exit(1)
+
+    try:
+        engine_option_sets = [
+            parse_engine_options(text) for text in args.engine_options.split(",")
+        ]
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+    if "xelatex" in args.latex_cmd and any(
+        name.startswith("objcompress") for options in engine_option_sets for name in options
+    ):
+        print("Ошибка: objcompress не поддерживается xelatex (сжатие выполняет xdvipdfmx)")
+        sys.exit(1)
+    record_engine_options = engine_option_sets != [[]]
+
+    try:
+        base_ablations = parse_ablations(args.ablate)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+    base_ablation_label = ablation_label(base_ablations)
+
+    if args.nesting_depth < 1:
+        print("Ошибка: Глубина вложенности должна быть >= 1")
+        sys.exit(1)
+
+    if args.fragments_per_block < 1:
+        print("Ошибка: Количество фрагментов на блок должно быть >= 1")
+        sys.exit(1)
+
+    fragment_sizes = [size.strip().lower() for size in args.fragment_sizes.split(",")]
+    if not all(re.fullmatch(r"[1-9]\d*[pb]", size) for size in fragment_sizes):
+        print("Ошибка: Неверный формат --fragment-sizes. Используйте <число>p или <число>b через запятую")
+        sys.exit(1)
+    if args.type in LIPSUM_COMMAND_TYPES and not any(size.endswith("p") for size in fragment_sizes):
+        print(f"Ошибка: Тип {args.type} использует \\lipsum и поддерживает только размеры фрагментов <число>p")
+        sys.exit(1)
+
+    if args.reuse < 1:
+        print("Ошибка: Коэффициент повторного использования должен быть >= 1")
+        sys.exit(1)
+
+    if args.shards <= 0:
+        print("Ошибка: Количество шардов должно быть положительным числом")
+        sys.exit(1)
+
     # Проверяем существование директории с изображениями
     if not os.path.exists(args.images_dir):
         print(f"Ошибка: Директория с изображениями '{args.images_dir}' не существует")
@@ -439,18 +2314,62 @@ def main():
         print("Ошибка: Файл generate_flat_version.py не найден в текущей директории")
         sys.exit(1)
 
-    if args.type in ["modular", "modular_inner", "all"] and not os.path.exists(
+    if args.type in [
+        "modular",
+        "modular_inner",
+        "modular_inner_last",
+        "modular_inner_index",
+        "modular_inner_lua_table",
+        "modular_inner_lua_seek",
+        "modular_precatch",
+        "modular_docstrip",
+        "modular_prebuilt",
+        "modular_inner_sharded",
+        "modular_inner_nested",
+        "all",
+    ] and not os.path.exists(
         "generate_modular_version.py"
     ):
         print("Ошибка: Файл generate_modular_version.py не найден в текущей директории")
         sys.exit(1)
 
-    if args.type in ["macrodef", "all"] and not os.path.exists(
-        "generate_macro_version.py"
+    if args.type in ["modular_prebuilt", "all"] and not os.path.exists(
+        "inline_fragments.py"
+    ):
+        print("Ошибка: Файл inline_fragments.py не найден в текущей директории")
+        sys.exit(1)
+
+    if args.type in ["macrodef", "macrodef_sharded", "macrodef_nested", "all"] and not (
+        os.path.exists("generate_macro_version.py")
+        and os.path.exists("generate_modular_version.py")
+    ):
+        print(
+            "Ошибка: Файлы generate_macro_version.py и generate_modular_version.py "
+            "должны находиться в текущей директории"
+        )
+        sys.exit(1)
+
+    if args.type in ["prop", "tlconst", "pgfkeys", "prop_debug", "all"] and not (
+        os.path.exists("generate_storage_version.py")
+        and os.path.exists("generate_macro_version.py")
     ):
-        print("Ошибка: Файл generate_macro_version.py не найден в текущей директории")
+        print(
+            "Ошибка: Файлы generate_storage_version.py и generate_macro_version.py "
+            "должны находиться в текущей директории"
+        )
         sys.exit(1)
 
+    if args.type.startswith("files_") or args.type == "all":
+        if not (
+            os.path.exists("generate_files_version.py")
+            and os.path.exists("generate_macro_version.py")
+        ):
+            print(
+                "Ошибка: Файлы generate_files_version.py и generate_macro_version.py "
+                "должны находиться в текущей директории"
+            )
+            sys.exit(1)
+
     # Проверяем, существует ли директория
     output_csv_dir = os.path.dirname(args.output_csv)
     if not os.path.exists(output_csv_dir):
@@ -463,6 +2382,10 @@ def main():
         print("Ошибка: Неверный формат --n-values. Используйте числа через запятую")
         sys.exit(1)
 
+    if "_lua_" in args.type and "lualatex" not in args.latex_cmd:
+        print(f"Ошибка: Тип {args.type} требует --latex-cmd lualatex")
+        sys.exit(1)
+
     # Определяем типы документов для тестирования
     if args.type == "all":
         doc_types = [
@@ -471,8 +2394,29 @@ def main():
             "modular",
             "modular_inner",
             "modular_inner_last",
+            "modular_inner_index",
+            "modular_inner_lua_table",
+            "modular_inner_lua_seek",
+            "modular_precatch",
+            "modular_docstrip",
+            "modular_prebuilt",
+            "modular_inner_sharded",
             "macrodef",
+            "macrodef_sharded",
+            "modular_inner_nested",
+            "macrodef_nested",
+            "prop",
+            "tlconst",
+            "pgfkeys",
+            "prop_debug",
+            "files_input",
+            "files_inputifexists",
+            "files_include",
+            "files_subfiles",
         ]
+        # Варианты с Lua компилируются только lualatex
+        if "lualatex" not in args.latex_cmd:
+            doc_types = [t for t in doc_types if "_lua_" not in t]
     else:
         doc_types = [args.type]
 
@@ -480,13 +2424,90 @@ def main():
     print(f"{'='*60}")
     print(f"Тип(ы) документа: {', '.join(doc_types)}")
     print(f"Директория с изображениями: {args.images_dir}")
-    print(f"Количество запусков для каждого N: {args.runs}")
+    if args.edit_loop:
+        print(f"Режим правок: {args.edit_loop} правок после полной компиляции")
+    else:
+        print(f"Количество запусков для каждого N: {args.runs}")
     print(f"Команда LaTeX: {args.latex_cmd}")
     print(f"Базовая директория тестов: {args.base_dir}")
     print(f"Значения N: {n_values}")
+    if base_ablations:
+        print(f"Отключенные компоненты: {', '.join(base_ablations)}")
+    if args.ablation_sweep:
+        print(f"Перебор компонентов: {', '.join(ABLATIONS)} и все сразу")
+    if args.passes != 1:
+        print(f"Проходов компиляции: {args.passes}")
+    if args.cross_refs:
+        print(f"Перекрестные ссылки: оглавление, \\label и \\ref")
+    if record_engine_options:
+        print(
+            f"Опции движка: {', '.join(engine_options_label(o) for o in engine_option_sets)}"
+        )
+    if args.sample_interval:
+        print(f"Опрос RSS и процессорного времени: каждые {args.sample_interval} сек")
     print(f"{'='*60}")
 
+    # Отпечаток окружения записывается в каждую строку CSV
+    fingerprint = environment_fingerprint(args.latex_cmd)
+    print(
+        f"Окружение: {fingerprint['cpu_model'] or 'CPU неизвестен'} "
+        f"({fingerprint['cpu_count']} ядер, governor: {fingerprint['cpu_governor'] or 'нет данных'})"
+    )
+    print(f"  {fingerprint['tex_version'] or 'версия TeX неизвестна'}")
+    for name in PACKAGE_VERSION_FILES:
+        print(f"  {name}: {fingerprint[name] or 'нет данных'}")
+
+    # Калибровка: время запуска движка и загрузки преамбулы для каждого набора опций
+    calibration = {}
+    if args.calibrate:
+        print(f"\n{'#'*60}")
+        print(f"КАЛИБРОВКА")
+        print(f"{'#'*60}")
+        calibration = run_calibration(
+            args.base_dir, args.runs, args.latex_cmd, engine_option_sets
+        )
+        save_calibration_to_csv(
+            calibration, args.output_csv.replace(".csv", "_calibration.csv"), args.runs
+        )
+        for label, documents in calibration.items():
+            means = []
+            for name, time_values in documents.items():
+                time_mean = calculate_statistics(time_values)["mean"]
+                means.append(f"{name}={time_mean:.2f}с" if time_mean is not None else f"{name}=нет данных")
+            print(f"Калибровка ({label}): {', '.join(means)}")
+
     for doc_type in doc_types:
+        # Для шардированных типов количество шардов входит в имя типа в CSV,
+        # чтобы результаты с разными K можно было строить на одном графике
+        if doc_type.endswith("_sharded"):
+            doc_label = f"{doc_type}_{args.shards}"
+        else:
+            doc_label = doc_type
+        # Аналогично для коэффициента повторного использования фрагментов
+        if args.reuse > 1 and doc_type.startswith("modular"):
+            doc_label += f"_r{args.reuse}"
+        # И для глубины вложенности фрагментов
+        if doc_type.endswith("_nested"):
+            doc_label += f"_d{args.nesting_depth}"
+        # И для порядка обращения к тегам
+        if args.access_pattern != "sequential" and doc_type.startswith("modular"):
+            if doc_type != "modular_inner_last":
+                doc_label += f"_{args.access_pattern}"
+        # И для отключенных компонентов (в режиме перебора они различаются столбцом ablation)
+        if base_ablations and not args.ablation_sweep:
+            doc_label += f"_{base_ablation_label}"
+        # И для единственного набора опций движка (несколько наборов различаются столбцом)
+        if len(engine_option_sets) == 1 and record_engine_options:
+            doc_label += f"_{engine_options_label(engine_option_sets[0])}"
+        # И для многопроходной сборки
+        if args.cross_refs:
+            doc_label += "_xref"
+        if args.passes != 1:
+            doc_label += f"_p{args.passes}"
+        # Задержки правок несравнимы с полной компиляцией
+        if args.edit_loop:
+            doc_label += "_edit_includeonly" if args.include_only else "_edit"
+
         print(f"\n{'#'*60}")
         print(f"ТЕСТИРОВАНИЕ ТИПА: {doc_type}")
         print(f"{'#'*60}")
@@ -496,25 +2517,134 @@ def main():
         base_dir.mkdir(parents=True, exist_ok=True)
 
         results = []
+        file_rows = []
+        timeline_entries = []
+
+        # Сетка N x размер фрагмента (размер варьируется только там, где он поддерживается)
+        # и наборы отключаемых компонентов и опций движка
+        sized = doc_type.startswith(("modular", "macrodef"))
+        type_sizes = fragment_sizes if sized else ["1p"]
+        # Типы с командой \lipsum задают размер только в абзацах
+        if sized and doc_type in LIPSUM_COMMAND_TYPES:
+            type_sizes = [size for size in fragment_sizes if size.endswith("p")]
+            skipped = [size for size in fragment_sizes if not size.endswith("p")]
+            if skipped:
+                print(f"Пропускаем размеры {', '.join(skipped)} для {doc_type}: размер в байтах требует --inner")
+            if not type_sizes:
+                continue
+        variants = ablation_variants(base_ablations, doc_type, args.ablation_sweep)
+        grid = [
+            (n, size, ablations, engine_options)
+            for n in n_values
+            for size in type_sizes
+            for ablations in variants
+            for engine_options in engine_option_sets
+        ]
+
+        # Документ генерируется один раз для всех наборов опций движка
+        generated = None
+        output_dir = None
+
+        for n, fragment_size, ablations, engine_options in grid:
+            point = f"N={n}, размер фрагментов {fragment_size}" if sized else f"N={n}"
+            if len(variants) > 1 or ablations:
+                point += f", без: {ablation_label(ablations)}"
+            if record_engine_options:
+                point += f", опции: {engine_options_label(engine_options)}"
+
+            # Шардов не может быть больше блоков, а K входит в имя типа в CSV,
+            # поэтому такие N не измеряются вместо молчаливого уменьшения K
+            if doc_type.endswith("_sharded") and n < args.shards:
+                print(f"Пропускаем N={n} для {doc_type}: N меньше количества шардов ({args.shards})")
+                continue
 
-        for n in n_values:
             # Генерируем документ
-            output_dir = run_generate_document(
-                n, args.images_dir, base_dir, doc_type, args.yes
-            )
+            if generated != (n, fragment_size, ablations):
+                generated = (n, fragment_size, ablations)
+                output_dir = run_generate_document(
+                    n,
+                    args.images_dir,
+                    base_dir,
+                    doc_type,
+                    args.yes,
+                    args.shards,
+                    args.reuse,
+                    args.access_pattern,
+                    args.seed,
+                    fragment_size,
+                    args.size_distribution,
+                    args.fragments_per_block,
+                    args.corpus,
+                    args.corpus_seed,
+                    args.content,
+                    args.nesting_depth,
+                    ablations,
+                    args.cross_refs,
+                )
 
             if output_dir is None:
-                print(f"Пропускаем N={n} для {doc_type} из-за ошибки генерации")
+                print(f"Пропускаем {point} для {doc_type} из-за ошибки генерации")
                 continue
 
-            # Запускаем компиляцию K раз
-            time_values, benchmark_values = run_pdflatex_k_times(
-                output_dir, args.runs, args.latex_cmd
+            prebuild_cmd = get_prebuild_command(doc_type, output_dir)
+            edit = None
+            warmup_time = None
+
+            if args.edit_loop:
+                # Полная компиляция, после которой измеряются правки
+                main_tex = output_dir / "main.tex"
+                if args.include_only:
+                    set_include_only(main_tex)
+                print(f"\nПолная компиляция перед правками...")
+                warmup_values = run_pdflatex_k_times(
+                    output_dir, 1, args.latex_cmd, prebuild_cmd, engine_options, args.passes
+                )[0]
+                warmup_time = warmup_values[0] if warmup_values else None
+
+                rng = random.Random(f"{args.seed}:{n}")
+
+                def edit():
+                    path = mutate_fragment(output_dir, rng)
+                    if path is None:
+                        print(f"  Предупреждение: не найден текст для правки")
+                        return
+                    print(f"  правка: {path.relative_to(output_dir)}")
+                    if args.include_only:
+                        set_include_only(main_tex, path)
+
+            # Запускаем компиляцию K раз (в режиме правок -- после каждой правки)
+            timelines = []
+            time_values, benchmark_values, prebuild_values, run_metrics = run_pdflatex_k_times(
+                output_dir,
+                runs,
+                args.latex_cmd,
+                prebuild_cmd,
+                engine_options,
+                args.passes,
+                edit,
+                args.sample_interval,
+                timelines,
             )
 
-            # Вычисляем статистику
-            time_stats = calculate_statistics(time_values)
-            benchmark_stats = calculate_statistics(benchmark_values)
+            # Запуски, во время которых другие процессы заметно загружали процессор
+            noisy = [
+                int(other is not None and other > args.noise_threshold)
+                for other in run_metrics.get("other_cpu", [None] * len(time_values))
+            ]
+            run_metrics["noisy"] = noisy
+
+            # Вычисляем статистику (с --exclude-noisy -- без шумных запусков;
+            # сами значения запусков в CSV сохраняются)
+            if args.exclude_noisy:
+                time_stats = calculate_statistics(
+                    [None if flag else v for v, flag in zip(time_values, noisy)]
+                )
+                benchmark_stats = calculate_statistics(
+                    [None if flag else v for v, flag in zip(benchmark_values, noisy)]
+                )
+            else:
+                time_stats = calculate_statistics(time_values)
+                benchmark_stats = calculate_statistics(benchmark_values)
 
             # Сохраняем результаты
             result = {
@@ -523,17 +2653,130 @@ def main():
                 "benchmark_values": benchmark_values,
                 "time_stats": time_stats,
                 "benchmark_stats": benchmark_stats,
+                "params": {},
+                "metrics": {},
             }
 
+            # Порядок обращения к тегам записывается в каждую строку modular*
+            if doc_type.startswith("modular"):
+                if doc_type == "modular_inner_last":
+                    result["params"]["access_pattern"] = "last"
+                else:
+                    result["params"]["access_pattern"] = args.access_pattern
+                result["params"]["seed"] = args.seed
+
+            if doc_type.endswith("_sharded"):
+                result["params"]["shards"] = args.shards
+            if doc_type.endswith("_nested"):
+                result["params"]["nesting_depth"] = args.nesting_depth
+
+            # Источник текста и режим содержимого
+            if doc_type in LIPSUM_COMMAND_TYPES:
+                result["params"]["corpus"] = "lipsum"
+            elif args.content != "text" and doc_type in CONTENT_DOC_TYPES:
+                result["params"]["corpus"] = "synthetic"
+            else:
+                result["params"]["corpus"] = args.corpus
+            if doc_type in CONTENT_DOC_TYPES:
+                result["params"]["content"] = args.content
+            if result["params"]["corpus"] == "synthetic":
+                result["params"]["corpus_seed"] = args.corpus_seed
+
+            # Размер фрагментов и суммарный объем файлов с ними
+            if sized:
+                result["params"]["fragment_size"] = fragment_size
+                result["params"]["fragments_per_block"] = args.fragments_per_block
+                result["params"]["size_distribution"] = args.size_distribution
+                result["params"]["tag_bytes"] = tag_files_size(output_dir)
+
+            # Отключенные компоненты блока и опции движка
+            if base_ablations or args.ablation_sweep:
+                result["params"]["ablation"] = ablation_label(ablations)
+            if record_engine_options:
+                result["params"]["engine_options"] = engine_options_label(engine_options)
+
+            # Среднее время документов калибровки для вычитания запуска движка
+            for name, calibration_values in calibration.get(
+                engine_options_label(engine_options), {}
+            ).items():
+                result["params"][CALIBRATION_PARAMS[name]] = calculate_statistics(
+                    calibration_values
+                )["mean"]
+
+            # Режим правок: число правок и время полной компиляции перед ними
+            if args.edit_loop:
+                result["params"]["edit_loop"] = args.edit_loop
+                result["params"]["warmup_time"] = warmup_time
+                if args.include_only:
+                    result["params"]["include_only"] = 1
+
+            # Многопроходная сборка: число проходов и время каждого прохода
+            if args.passes != 1:
+                result["params"]["passes"] = args.passes
+            if args.cross_refs:
+                result["params"]["cross_refs"] = 1
+
+            # Отпечаток окружения и порог шума
+            result["params"].update(fingerprint)
+            result["params"]["noise_threshold"] = args.noise_threshold
+            if args.exclude_noisy:
+                result["params"]["exclude_noisy"] = 1
+
+            # Число проходов docstrip по исходным файлам при извлечении тегов
+            if doc_type == "modular_docstrip":
+                result["params"]["docstrip_batches"] = docstrip_batches(output_dir)
+
+            # Для типов с предварительной сборкой сохраняем ее время
+            # и время самой компиляции отдельно (time -- их сумма)
+            if prebuild_values:
+                result["metrics"]["prebuild"] = prebuild_values
+                result["metrics"]["compile"] = [
+                    t - p if t is not None and p is not None else None
+                    for t, p in zip(time_values, prebuild_values)
+                ]
+            result["metrics"].update(run_metrics)
+            result["metrics"]["time_outlier"] = outlier_flags(time_values)
+
+            # Пределы памяти TeX одинаковы для всех запусков, берем их из последнего лога
+            log_file = output_dir / "main.log"
+            if log_file.exists():
+                log_content = log_file.read_text(encoding="utf-8", errors="ignore")
+                for name, limit in parse_memory_stats(log_content)[1].items():
+                    result["params"][f"{name}_capacity"] = limit
+
+            # Открытия файлов последнего запуска (main.fls удаляется вместе с .aux)
+            if "recorder" in engine_options:
+                file_rows.extend(
+                    file_profile_rows(result, parse_fls(output_dir / "main.fls"), output_dir)
+                )
+
+            # Пропускная способность: страницы, блоки и килобайты исходных .tex в секунду
+            result["params"]["input_bytes"] = tex_files_size(output_dir)
+            if "pdf_pages" in result["metrics"]:
+                result["metrics"]["pages_per_s"] = throughput(
+                    result["metrics"]["pdf_pages"], time_values
+                )
+            # При повторном использовании фрагментов modular* выводит N * reuse блоков
+            if args.reuse > 1 and doc_type.startswith("modular"):
+                result["params"]["blocks"] = n * args.reuse
+            else:
+                result["params"]["blocks"] = n
+            result["metrics"]["blocks_per_s"] = throughput(result["params"]["blocks"], time_values)
+            result["metrics"]["input_kb_per_s"] = throughput(
+                result["params"]["input_bytes"] / 1024, time_values
+            )
+
             results.append(result)
+            if args.sample_interval:
+                timeline_entries.append((result, timelines))
 
             # Выводим сводку для этого N
-            print(f"\nСводка для {doc_type}, N={n}:")
+            print(f"\nСводка для {doc_type}, {point}:")
             if time_stats["mean"] is not None:
                 print(
                     f"  time среднее: {time_stats['mean']:.2f} сек "
                     f"(min: {time_stats['min']:.2f}, max: {time_stats['max']:.2f}, "
-                    f"успешных: {time_stats['count']}/{args.runs})"
+                    f"успешных: {time_stats['count']}/{runs})"
                 )
             else:
                 print(f"  time: нет успешных измерений")
@@ -542,18 +2785,112 @@ def main():
                 print(
                     f"  benchmark среднее: {benchmark_stats['mean']:.2f} сек "
                     f"(min: {benchmark_stats['min']:.2f}, max: {benchmark_stats['max']:.2f}, "
-                    f"успешных: {benchmark_stats['count']}/{args.runs})"
+                    f"успешных: {benchmark_stats['count']}/{runs})"
                 )
             else:
                 print(f"  benchmark: нет успешных измерений")
 
+            if time_stats["median"] is not None:
+                print(
+                    f"  time медиана: {time_stats['median']:.2f} сек "
+                    f"(p5-p95: {time_stats['p5']:.2f}-{time_stats['p95']:.2f}, "
+                    f"MAD: {time_stats['mad']:.3f}, усеченное среднее: "
+                    f"{time_stats['trimmed_mean']:.2f}, выбросов: {time_stats['outliers']})"
+                )
+
+            if any(noisy):
+                print(
+                    f"  шумных запусков: {sum(noisy)}/{len(noisy)} "
+                    f"(другие процессы > {args.noise_threshold} ядра"
+                    + (", исключены из статистики)" if args.exclude_noisy else ")")
+                )
+
+            startup_time = result["params"].get("startup_time")
+            if startup_time is not None and time_stats["mean"] is not None:
+                corrected = f"  time без запуска движка: {time_stats['mean'] - startup_time:.2f} сек"
+                preamble_time = result["params"].get("preamble_time")
+                if preamble_time is not None:
+                    corrected += f" (без преамбулы: {time_stats['mean'] - preamble_time:.2f} сек)"
+                print(corrected)
+
+            if args.edit_loop:
+                latencies = sorted(v for v in time_values if v is not None)
+                if latencies:
+                    p90 = latencies[min(len(latencies) - 1, int(0.9 * len(latencies)))]
+                    print(
+                        f"  задержка правки: медиана {median(latencies):.2f} сек, "
+                        f"p90 {p90:.2f} сек (полная компиляция: "
+                        + (f"{warmup_time:.2f} сек)" if warmup_time is not None else "нет данных)")
+                    )
+
+            if prebuild_values:
+                prebuild_stats = calculate_statistics(prebuild_values)
+                if prebuild_stats["mean"] is not None:
+                    print(
+                        f"  prebuild среднее: {prebuild_stats['mean']:.2f} сек "
+                        f"(успешных: {prebuild_stats['count']}/{runs})"
+                    )
+
+            # Размер PDF и пропускная способность; пропавшие страницы -- признак сбоя
+            # (предупреждаем только о запусках, где движок сообщил 0 страниц)
+            pages = result["metrics"].get("pdf_pages", [None] * len(time_values))
+            known_pages = [p for p in pages if p is not None]
+            if known_pages:
+                pdf_bytes = calculate_statistics(result["metrics"].get("pdf_bytes", []))["mean"]
+                pages_per_s = calculate_statistics(result["metrics"]["pages_per_s"])["mean"]
+                blocks_per_s = calculate_statistics(result["metrics"]["blocks_per_s"])["mean"]
+                if pages_per_s is not None:
+                    size = f", {pdf_bytes / 1024:.0f} КБ" if pdf_bytes is not None else ""
+                    print(
+                        f"  PDF: {max(known_pages)} стр.{size}; "
+                        f"{pages_per_s:.1f} стр/с, {blocks_per_s:.1f} блоков/с"
+                    )
+                if len(set(known_pages)) > 1:
+                    print(
+                        f"  Предупреждение: число страниц различается между запусками: "
+                        f"{sorted(set(known_pages))}"
+                    )
+            if "draftmode" not in engine_options:
+                missing = [
+                    i
+                    for i, (t, p) in enumerate(zip(time_values, pages), start=1)
+                    if t is not None and p == 0
+                ]
+                if missing:
+                    print(
+                        f"  Предупреждение: нет страниц PDF в запусках "
+                        f"{', '.join(map(str, missing))}"
+                    )
+
+            # Открытия файлов и чтение
+            opens = calculate_statistics(result["metrics"].get("fls_opens", []))["mean"]
+            if opens is not None:
+                local_opens = calculate_statistics(result["metrics"]["fls_local_opens"])["mean"]
+                local_bytes = calculate_statistics(result["metrics"]["fls_local_bytes"])["mean"]
+                print(
+                    f"  открытия файлов: {opens:.0f} (файлы документа: {local_opens:.0f}, "
+                    f"{local_bytes / 1024:.0f} КБ при входе {result['params']['input_bytes'] / 1024:.0f} КБ)"
+                )
+            syscr = calculate_statistics(result["metrics"].get("io_syscr", []))["mean"]
+            if syscr is not None:
+                read_bytes = calculate_statistics(result["metrics"]["io_read_bytes"])["mean"]
+                print(
+                    f"  ввод-вывод: {syscr:.0f} вызовов чтения, "
+                    f"{read_bytes / 1024:.0f} КБ прочитано с диска"
+                )
+
+            # Заполнение памяти TeX относительно пределов
+            usage = []
+            for name in ["tex_cs", "tex_strings", "tex_memory_words", "tex_stack_save"]:
+                peak = calculate_statistics(result["metrics"].get(name, []))["max"]
+                limit = result["params"].get(f"{name}_capacity")
+                if peak is not None and limit:
+                    usage.append(f"{name[4:]} {peak}/{limit} ({100 * peak / limit:.1f}%)")
+            if usage:
+                print(f"  память TeX (max): {', '.join(usage)}")
+
             # Очищаем промежуточные файлы (кроме логов для отладки)
-            for ext in [".aux", ".out", ".toc"]:
-                for file in output_dir.glob(f"*{ext}"):
-                    try:
-                        file.unlink()
-                    except:
-                        pass
+            clean_aux_files(output_dir)
 
         # Сохраняем результаты для этого типа в CSV
         if results:
@@ -562,7 +2899,27 @@ def main():
             else:
                 csv_filename = args.output_csv
 
-            save_results_to_csv(results, csv_filename, args.runs, doc_type)
+            save_results_to_csv(results, csv_filename, runs, doc_label)
+
+            if file_rows:
+                save_file_profile_to_csv(
+                    file_rows, csv_filename.replace(".csv", "_files.csv"), doc_label
+                )
+
+            if timeline_entries:
+                save_timeline_to_csv(
+                    timeline_entries, csv_filename.replace(".csv", "_timeline.csv"), doc_label
+                )
+
+            if args.ablation_sweep:
+                attribution = ablation_attribution(
+                    results, ablation_label(variants[0])
+                )
+                save_attribution_to_csv(
+                    attribution,
+                    csv_filename.replace(".csv", "_attribution.csv"),
+                    doc_label,
+                )
 
             # Выводим финальную сводку для этого типа
             print(f"\n{'='*60}")
@@ -574,7 +2931,18 @@ def main():
                 time_mean = result["time_stats"]["mean"]
                 benchmark_mean = result["benchmark_stats"]["mean"]
 
-                if time_mean is not None and benchmark_mean is not None:
+                startup_time = result["params"].get("startup_time")
+                if time_mean is not None and startup_time is not None:
+                    print(
+                        f"N={n:4d}: time={time_mean:6.2f}с "
+                        f"(без запуска {time_mean - startup_time:6.2f}с), "
+                        + (
+                            f"benchmark={benchmark_mean:6.2f}с"
+                            if benchmark_mean is not None
+                            else "benchmark=нет данных"
+                        )
+                    )
+                elif time_mean is not None and benchmark_mean is not None:
                     print(
                         f"N={n:4d}: time={time_mean:6.2f}с, benchmark={benchmark_mean:6.2f}с"
                     )
@@ -584,6 +2952,20 @@ def main():
                     print(
                         f"N={n:4d}: time=нет данных, benchmark={benchmark_mean:6.2f}с"
                     )
+
+            if args.ablation_sweep:
+                print(f"\nВклад компонентов (time без компонента меньше полного на):")
+                for row in attribution:
+                    size = f", {row['fragment_size']}" if row["fragment_size"] else ""
+                    if row["engine_options"]:
+                        size += f", {row['engine_options']}"
+                    if row["time_cost"] is not None and row["time_share"] is not None:
+                        print(
+                            f"N={row['N']:4d}{size}: {row['ablation']:<36} "
+                            f"{row['time_cost']:6.2f}с ({row['time_share']:5.1f}%)"
+                        )
+                    else:
+                        print(f"N={row['N']:4d}{size}: {row['ablation']:<36} нет данных")
         else:
             print(f"Нет результатов для типа {doc_type}")
 
@@ -0,0 +1,361 @@
+# convert_tags.py
+import os
+import re
+import sys
+import json
+import mmap
+import hashlib
+import argparse
+from generate_storage_version import STORAGE_BACKENDS
+
+# Теги catchfilebetweentags (синтаксис docstrip)
+TAG_OPEN_RE = re.compile(rb"^%<\*([^>]+)>\s*$")
+TAG_CLOSE_RE = re.compile(rb"^%</([^>]+)>\s*$")
+
+# Вызовы \ExecuteMetaData[файл]{тег} в основном файле
+EXECUTE_METADATA_RE = re.compile(r"\\ExecuteMetaData\[([^\]]+)\]\{([^}]*)\}")
+
+CACHE_FILE = ".convert_tags_cache.json"
+
+
+def file_sha256(path):
+    """
+    Вычисляет SHA-256 содержимого файла, не загружая его целиком в память.
+
+    Args:
+        path: путь к файлу
+
+    Returns:
+        str: шестнадцатеричный хеш
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_lines(path):
+    """
+    Построчно читает файл через mmap (пустые файлы mmap не поддерживает).
+
+    Args:
+        path: путь к файлу
+
+    Yields:
+        bytes: строки файла без символов конца строки
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b""):
+                yield line.rstrip(b"\r\n")
+
+
+def fragment_key(tag_file, tag):
+    """
+    Имя фрагмента, как в Note.md: des.tex + Des1 -> desDes1.
+
+    Args:
+        tag_file: имя файла с тегами
+        tag: имя тега
+
+    Returns:
+        str: ключ фрагмента
+    """
+    stem = os.path.splitext(os.path.basename(tag_file))[0]
+    return f"{stem}{tag}"
+
+
+def converted_path(tag_file, output_dir, fmt):
+    """
+    Путь к сконвертированному файлу: des.tex -> <output_dir>/des_namedef.tex.
+
+    Args:
+        tag_file: исходный файл с тегами
+        output_dir: выходная директория
+        fmt: формат ('namedef' или 'prop')
+
+    Returns:
+        str: путь к выходному файлу
+    """
+    stem = os.path.splitext(os.path.basename(tag_file))[0]
+    return os.path.join(output_dir, f"{stem}_{fmt}.tex")
+
+
+def convert_tag_file(tag_file, output_path, fmt):
+    """
+    Конвертирует файл с тегами %<*Tag>/%</Tag> в блоки \\@namedef или \\fragdef.
+
+    Файл читается потоково, в памяти держатся только открытые в данный момент
+    фрагменты. Вложенные теги поддерживаются: строка попадает во все открытые теги.
+
+    Args:
+        tag_file: исходный файл с тегами
+        output_path: путь к выходному файлу
+        fmt: формат ('namedef' или 'prop')
+
+    Returns:
+        int: количество сконвертированных фрагментов
+    """
+    open_tags = {}
+    count = 0
+
+    with open(output_path, "wb") as out:
+        for line in iter_lines(tag_file):
+            open_match = TAG_OPEN_RE.match(line)
+            if open_match:
+                open_tags[open_match.group(1)] = []
+                continue
+
+            close_match = TAG_CLOSE_RE.match(line)
+            if close_match:
+                tag = close_match.group(1)
+                body_lines = open_tags.pop(tag, None)
+                if body_lines is None:
+                    print(
+                        f"Предупреждение: {tag_file}: закрывающий тег без открывающего: "
+                        f"{tag.decode('utf-8', errors='replace')}"
+                    )
+                    continue
+
+                key = fragment_key(tag_file, tag.decode("utf-8")).encode("utf-8")
+                body = b"".join(l + b"\n" for l in body_lines)
+                if fmt == "namedef":
+                    # В теле \def символ # должен быть удвоен
+                    body = body.replace(b"#", b"##")
+                    out.write(b"\\@namedef{" + key + b"}{%\n" + body + b"}\n\n")
+                else:
+                    out.write(b"\\fragdef{" + key + b"}{%\n" + body + b"}\n\n")
+                count += 1
+                continue
+
+            for body_lines in open_tags.values():
+                body_lines.append(line)
+
+    for tag in open_tags:
+        print(
+            f"Предупреждение: {tag_file}: тег не закрыт: "
+            f"{tag.decode('utf-8', errors='replace')}"
+        )
+
+    return count
+
+
+def rewrite_main_tex(main_tex, output_tex, tag_files, output_dir, fmt):
+    """
+    Переписывает основной файл: убирает catchfilebetweentags, заменяет
+    \\ExecuteMetaData на поиск по имени и подключает сконвертированные файлы.
+
+    Args:
+        main_tex: исходный основной файл
+        output_tex: путь к переписанному основному файлу
+        tag_files: файлы с тегами в порядке первого упоминания
+        output_dir: директория со сконвертированными файлами
+        fmt: формат ('namedef' или 'prop')
+    """
+    main_dir = os.path.dirname(os.path.abspath(output_tex))
+
+    def replace_call(match):
+        key = fragment_key(match.group(1), match.group(2))
+        if fmt == "namedef":
+            # \csname ... \endcsname эквивалентен \@nameuse и не требует \makeatletter
+            return f"\\csname {key}\\endcsname"
+        return f"\\fraguse{{{key}}}"
+
+    inputs = []
+    for tag_file in tag_files:
+        path = os.path.relpath(converted_path(tag_file, output_dir, fmt), main_dir)
+        inputs.append(f"\\input{{{path.replace(os.sep, '/')}}}\n")
+    if fmt == "namedef":
+        inputs = ["\\makeatletter\n"] + inputs + ["\\makeatother\n"]
+
+    with open(main_tex, "r", encoding="utf-8") as src, open(
+        output_tex, "w", encoding="utf-8"
+    ) as dst:
+        for line in src:
+            if line.strip() == r"\usepackage{catchfilebetweentags}":
+                if fmt == "prop":
+                    dst.write(STORAGE_BACKENDS["prop"])
+                continue
+
+            dst.write(EXECUTE_METADATA_RE.sub(replace_call, line))
+
+            if line.strip() == r"\begin{document}":
+                dst.write("% Фрагменты, сконвертированные convert_tags.py\n")
+                dst.writelines(inputs)
+
+
+def find_tag_files(main_tex):
+    """
+    Находит файлы с тегами, на которые ссылается \\ExecuteMetaData в основном файле.
+
+    Args:
+        main_tex: основной файл
+
+    Returns:
+        list: пути к файлам с тегами относительно директории основного файла
+    """
+    tag_files = []
+    main_dir = os.path.dirname(os.path.abspath(main_tex))
+    with open(main_tex, "r", encoding="utf-8") as f:
+        for line in f:
+            for match in EXECUTE_METADATA_RE.finditer(line):
+                path = os.path.join(main_dir, match.group(1))
+                if path not in tag_files:
+                    tag_files.append(path)
+    return tag_files
+
+
+def load_cache(cache_path):
+    """Загружает кэш конвертации (пустой словарь, если кэша нет)."""
+    if not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        print(f"Предупреждение: кэш {cache_path} поврежден и будет пересоздан")
+        return {}
+
+
+def convert_project(main_tex, output_dir, output_tex, fmt, force=False):
+    """
+    Конвертирует проект на catchfilebetweentags в \\@namedef или expl3 prop.
+
+    Файлы с тегами, хеш которых не изменился с прошлого запуска, не конвертируются повторно.
+
+    Args:
+        main_tex: основной файл проекта
+        output_dir: директория для сконвертированных файлов
+        output_tex: путь к переписанному основному файлу
+        fmt: формат ('namedef' или 'prop')
+        force: конвертировать все файлы, игнорируя кэш
+
+    Returns:
+        dict: статистика (converted, cached, fragments)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cache_path = os.path.join(output_dir, CACHE_FILE)
+    cache = {} if force else load_cache(cache_path)
+
+    tag_files = find_tag_files(main_tex)
+    if not tag_files:
+        print(f"Предупреждение: в {main_tex} не найдено вызовов \\ExecuteMetaData[...]")
+
+    stats = {"converted": 0, "cached": 0, "fragments": 0}
+
+    for tag_file in tag_files:
+        if not os.path.exists(tag_file):
+            print(f"Ошибка: файл с тегами {tag_file} не найден")
+            sys.exit(1)
+
+        output_path = converted_path(tag_file, output_dir, fmt)
+        cache_key = f"{os.path.abspath(tag_file)}|{fmt}"
+        sha = file_sha256(tag_file)
+        entry = cache.get(cache_key)
+
+        if entry and entry["sha256"] == sha and os.path.exists(output_path):
+            print(f"  {tag_file}: без изменений (кэш), фрагментов: {entry['fragments']}")
+            stats["cached"] += 1
+            stats["fragments"] += entry["fragments"]
+            continue
+
+        count = convert_tag_file(tag_file, output_path, fmt)
+        cache[cache_key] = {"sha256": sha, "fragments": count}
+        print(f"  {tag_file} -> {output_path}, фрагментов: {count}")
+        stats["converted"] += 1
+        stats["fragments"] += count
+
+    rewrite_main_tex(main_tex, output_tex, tag_files, output_dir, fmt)
+
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2, ensure_ascii=False)
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Конвертация проекта с catchfilebetweentags (%<*Tag>/%</Tag>) в \\@namedef или expl3 prop",
+        epilog="""
+Примеры использования:
+  %(prog)s experiment/modular/modular_100/main.tex
+  %(prog)s main.tex --format prop -o converted
+  %(prog)s main.tex --output-tex main_namedef.tex --force
+        """,
+    )
+
+    parser.add_argument(
+        "main_tex",
+        type=str,
+        help="основной файл проекта с вызовами \\ExecuteMetaData[файл]{тег}",
+    )
+
+    parser.add_argument(
+        "-f",
+        "--format",
+        type=str,
+        choices=["namedef", "prop"],
+        default="namedef",
+        help="формат результата: \\@namedef/\\@nameuse или expl3 prop (по умолчанию: namedef)",
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=str,
+        default=None,
+        help="директория для сконвертированных файлов (по умолчанию: директория основного файла)",
+    )
+
+    parser.add_argument(
+        "-t",
+        "--output-tex",
+        type=str,
+        default=None,
+        help="путь к переписанному основному файлу (по умолчанию: <output_dir>/main_<format>.tex)",
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="конвертировать все файлы заново, игнорируя кэш",
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.main_tex):
+        print(f"Ошибка: Файл '{args.main_tex}' не существует")
+        sys.exit(1)
+
+    output_dir = args.output_dir or os.path.dirname(os.path.abspath(args.main_tex))
+    output_tex = args.output_tex or os.path.join(output_dir, f"main_{args.format}.tex")
+
+    if os.path.abspath(output_tex) == os.path.abspath(args.main_tex):
+        print("Ошибка: Переписанный файл не может совпадать с исходным")
+        sys.exit(1)
+
+    print(f"Конвертация проекта:")
+    print(f"  Основной файл: {args.main_tex}")
+    print(f"  Формат: {args.format}")
+    print(f"  Выходная директория: {output_dir}")
+
+    stats = convert_project(
+        main_tex=args.main_tex,
+        output_dir=output_dir,
+        output_tex=output_tex,
+        fmt=args.format,
+        force=args.force,
+    )
+
+    print(f"\nКонвертация завершена!")
+    print(f"  Переписанный основной файл: {output_tex}")
+    print(f"  Сконвертировано файлов: {stats['converted']}")
+    print(f"  Взято из кэша: {stats['cached']}")
+    print(f"  Всего фрагментов: {stats['fragments']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+# corpus.py
+import re
+import random
+from lipsum import paragraphs as lipsum_paragraphs
+
+# Режимы синтетического текста
+CORPUS_MODES = ["text", "math", "cyrillic", "mixed"]
+
+# Источники абзацев для генераторов
+CORPUS_NAMES = ["lipsum", "synthetic"]
+
+# Пакеты, которые требуются документу для каждого режима содержимого.
+# Кириллица под pdflatex требует T2A и inputenc, под lualatex/xelatex -- fontspec
+# и шрифт с кириллическими глифами (в Latin Modern по умолчанию их нет). CMU Serif
+# загружается по имени файла: xelatex ищет шрифты по семейству через fontconfig,
+# который обычно не видит OTF из TeX Live, а файлы находят и kpathsea, и luaotfload.
+CYRILLIC_PREAMBLE = r"""\usepackage{iftex}
+\ifPDFTeX
+  \usepackage[T2A]{fontenc}
+  \usepackage[utf8]{inputenc}
+\else
+  \usepackage{fontspec}
+  \setmainfont{cmunrm.otf}[BoldFont=cmunbx.otf,ItalicFont=cmunti.otf,BoldItalicFont=cmunbi.otf]
+\fi
+\usepackage[english,russian]{babel}
+"""
+
+MATH_PREAMBLE = r"""\usepackage{amsmath}
+"""
+
+CONTENT_PREAMBLES = {
+    "text": "",
+    "math": MATH_PREAMBLE,
+    "cyrillic": CYRILLIC_PREAMBLE,
+    "mixed": CYRILLIC_PREAMBLE + MATH_PREAMBLE,
+}
+
+# Условный размер синтетического корпуса: индексы берутся по модулю этого числа,
+# как и для списка абзацев lipsum, но повторов на практике не возникает
+SYNTHETIC_SIZE = 10**9
+
+# Слов в строке синтетического абзаца
+WORDS_PER_LINE = 12
+
+# Русские слова для режима cyrillic (словарь, цепь Маркова не строится)
+CYRILLIC_WORDS = """
+анализ блок вариант величина вершина вывод выражение гипотеза граница данные
+действие документ доказательство задача закон замечание запись значение измерение
+изображение интервал источник итог качество класс код компиляция корень критерий
+линия макрос массив матрица метод мера модель модуль момент набор направление
+начало область обработка образец объект ограничение оценка ошибка пакет параметр
+переменная период площадь поиск порядок построение правило предел преобразование
+пример принцип проверка программа проект пространство процесс работа раздел
+размер разность расчет результат решение ряд свойство связь сигнал система скорость
+случай смысл событие состояние сравнение среда статья степень структура сумма
+таблица тег текст теорема точка условие уравнение файл формула фрагмент функция
+часть число элемент этап являться быстро медленно заметно линейно квадратично
+существенно примерно всегда иногда также поэтому однако если когда каждый новый
+основной простой сложный полный малый большой общий отдельный последний первый
+""".split()
+
+# Шаблоны коротких формул без пробелов (слово при обрезке по словам не разрывается)
+MATH_TEMPLATES = [
+    "${a}_{{{i}}}+{b}_{{{j}}}={c}$",
+    "${a}^{{{i}}}\\leq{b}$",
+    "$\\frac{{{a}}}{{{b}+{i}}}$",
+    "$\\sum_{{k=1}}^{{{n}}}{a}_k$",
+    "$\\sqrt{{{a}^2+{b}^2}}$",
+    "$\\int_0^{{{i}}}{a}(t)\\,dt$",
+    "$O({a}\\log{{{b}}})$",
+    "$\\alpha_{{{i}}}\\neq\\beta_{{{j}}}$",
+]
+
+MATH_LETTERS = "abcdfghkmnpqrstuvwxyz"
+
+
+def build_markov_chain(source_paragraphs):
+    """
+    Строит цепь Маркова первого порядка по словам исходных абзацев.
+
+    Args:
+        source_paragraphs: список абзацев (концевые % игнорируются)
+
+    Returns:
+        tuple: (список слов, с которых начинаются предложения; словарь слово -> список следующих слов)
+    """
+    starts = []
+    chain = {}
+    for paragraph in source_paragraphs:
+        # Концевой % может быть отделен пробелом или приписан к слову
+        words = [w.rstrip("%") for w in re.split(r"\s+", paragraph)]
+        words = [w for w in words if w]
+        for k, word in enumerate(words):
+            if k == 0 or words[k - 1].endswith("."):
+                starts.append(word)
+            if k + 1 < len(words):
+                chain.setdefault(word, []).append(words[k + 1])
+    return starts, chain
+
+
+class SyntheticCorpus:
+    """
+    Бесконечный воспроизводимый корпус уникальных абзацев.
+
+    Абзац с номером (или любым хешируемым ключом) key генерируется заново при каждом
+    обращении из генератора случайных чисел, инициализированного строкой seed:mode:key,
+    поэтому корпус не хранит абзацы в памяти и одинаков при каждом запуске.
+    Поддерживает тот же интерфейс, что и список paragraphs из lipsum.py: len() и [].
+    """
+
+    def __init__(self, seed=0, mode="text", min_words=40, max_words=90):
+        if mode not in CORPUS_MODES:
+            raise ValueError(f"Неизвестный режим корпуса: {mode}")
+        self.seed = seed
+        self.mode = mode
+        self.min_words = min_words
+        self.max_words = max_words
+        self.starts, self.chain = build_markov_chain(lipsum_paragraphs)
+        self.words = list(self.chain)
+
+    def __len__(self):
+        return SYNTHETIC_SIZE
+
+    def __getitem__(self, key):
+        return self.paragraph(key)
+
+    def latin_sentence(self, rng, length):
+        """Предложение из цепи Маркова по словам lipsum."""
+        words = [rng.choice(self.starts)]
+        while len(words) < length:
+            followers = self.chain.get(words[-1])
+            # Обрыв цепи или случайный перезапуск, чтобы абзацы не повторяли исходник
+            if not followers or rng.random() < 0.15:
+                words.append(rng.choice(self.words))
+            else:
+                words.append(rng.choice(followers))
+        words = [w.rstrip(".,") for w in words]
+        words[0] = words[0].capitalize()
+        return " ".join(words) + "."
+
+    def cyrillic_sentence(self, rng, length):
+        """Предложение из словаря русских слов."""
+        words = [rng.choice(CYRILLIC_WORDS) for _ in range(length)]
+        for k in range(2, length - 1, rng.randint(5, 9)):
+            words[k] += ","
+        words[0] = words[0].capitalize()
+        return " ".join(words) + "."
+
+    def formula(self, rng):
+        """Короткая формула в $...$ без пробелов."""
+        a, b, c = rng.sample(MATH_LETTERS, 3)
+        return rng.choice(MATH_TEMPLATES).format(
+            a=a, b=b, c=c, i=rng.randint(1, 9), j=rng.randint(1, 9), n=rng.randint(2, 20)
+        )
+
+    def paragraph(self, key):
+        """
+        Генерирует абзац по ключу.
+
+        Args:
+            key: номер абзаца или другой хешируемый ключ
+
+        Returns:
+            str: абзац, разбитый на строки по WORDS_PER_LINE слов
+        """
+        rng = random.Random(f"{self.seed}:{self.mode}:{key}")
+        target = rng.randint(self.min_words, self.max_words)
+
+        words = []
+        while len(words) < target:
+            length = rng.randint(6, 16)
+            if self.mode == "cyrillic" or (self.mode == "mixed" and rng.random() < 0.5):
+                sentence = self.cyrillic_sentence(rng, length)
+            else:
+                sentence = self.latin_sentence(rng, length)
+            sentence_words = sentence.split()
+
+            # Формулы вставляются внутрь предложения
+            if self.mode == "math" or (self.mode == "mixed" and rng.random() < 0.5):
+                for _ in range(rng.randint(1, 3)):
+                    pos = rng.randint(1, len(sentence_words) - 1)
+                    sentence_words.insert(pos, self.formula(rng))
+            words.extend(sentence_words)
+
+        lines = [
+            " ".join(words[k : k + WORDS_PER_LINE])
+            for k in range(0, len(words), WORDS_PER_LINE)
+        ]
+        return "\n".join(lines)
+
+
+def load_corpus(name="lipsum", seed=0, mode="text"):
+    """
+    Возвращает источник абзацев для генераторов.
+
+    Args:
+        name: 'lipsum' (пять абзацев из lipsum.py по кругу) или 'synthetic'
+        seed: зерно синтетического корпуса
+        mode: режим синтетического корпуса (см. CORPUS_MODES)
+
+    Returns:
+        list или SyntheticCorpus: объект с len() и доступом по индексу
+    """
+    if name == "lipsum":
+        return lipsum_paragraphs
+    if name == "synthetic":
+        return SyntheticCorpus(seed=seed, mode=mode)
+    raise ValueError(f"Неизвестный корпус: {name}")
+
+
+def content_corpus(corpus="lipsum", seed=0, content="text"):
+    """
+    Возвращает источник абзацев с учетом режима содержимого.
+
+    Любой режим, кроме 'text', доступен только в синтетическом корпусе,
+    поэтому он выбирается автоматически.
+
+    Args:
+        corpus: 'lipsum' или 'synthetic'
+        seed: зерно синтетического корпуса
+        content: режим содержимого (см. CORPUS_MODES)
+
+    Returns:
+        list или SyntheticCorpus: объект с len() и доступом по индексу
+    """
+    if content not in CORPUS_MODES:
+        raise ValueError(f"Неизвестный режим содержимого: {content}")
+    if content != "text":
+        corpus = "synthetic"
+    return load_corpus(corpus, seed, content)
+
+
+def fragment_paragraph(paragraphs, i, shift=0, part=0):
+    """
+    Возвращает абзац для фрагмента с номером i.
+
+    Для lipsum сохраняется прежняя схема (i + shift) % 5, поэтому документы
+    с корпусом lipsum не меняются. В синтетическом корпусе каждая тройка
+    (i, shift, part) дает свой уникальный абзац.
+
+    Args:
+        paragraphs: источник абзацев (результат load_corpus)
+        i: номер фрагмента или блока
+        shift: 0 для описания (des), 1 для данных (data)
+        part: номер абзаца внутри многоабзацного фрагмента
+
+    Returns:
+        str: текст абзаца
+    """
+    if isinstance(paragraphs, SyntheticCorpus):
+        return paragraphs[(i, shift, part)]
+    return paragraphs[(i + shift + part) % len(paragraphs)]
@@ -0,0 +1,320 @@
+# generate_files_version.py
+import os
+import argparse
+import sys
+from corpus import CORPUS_NAMES, load_corpus, fragment_paragraph
+from ablation import ABLATIONS, parse_ablations, package_preamble, fig_command, merge_command
+from generate_macro_version import copy_required_images
+
+# Определения \des и \data для каждого способа подключения файлов-фрагментов
+INCLUDE_MODES = {
+    "input": r"""\newcommand{\des}[1]{\input{des/#1}}
+\newcommand{\data}[1]{\input{data/#1}}
+""",
+    "inputifexists": r"""\newcommand{\des}[1]{\InputIfFileExists{des/#1.tex}{}{}}
+\newcommand{\data}[1]{\InputIfFileExists{data/#1.tex}{}{}}
+""",
+    # \include начинает новую страницу и пишет отдельный .aux для каждого файла
+    "include": r"""\newcommand{\des}[1]{\include{des/#1}}
+\newcommand{\data}[1]{\include{data/#1}}
+""",
+    "subfiles": r"""\usepackage{subfiles}
+\newcommand{\des}[1]{\subfile{des/#1}}
+\newcommand{\data}[1]{\subfile{data/#1}}
+""",
+}
+
+
+def write_fragment(path, text, include_mode):
+    """
+    Записывает один фрагмент в отдельный файл.
+
+    Args:
+        path: путь к файлу фрагмента
+        text: текст фрагмента
+        include_mode: способ подключения ('input', 'inputifexists', 'include', 'subfiles')
+    """
+    if include_mode == "subfiles":
+        # Фрагмент для subfiles -- самостоятельный документ
+        content = f"""\\documentclass[../main.tex]{{subfiles}}
+\\begin{{document}}
+{text}
+\\end{{document}}
+"""
+    else:
+        content = f"{text}\n"
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def generate_files_tex(
+    images_dir,
+    output_dir,
+    num_blocks,
+    output_tex,
+    include_mode,
+    corpus="lipsum",
+    corpus_seed=0,
+    ablations=(),
+    cross_refs=False,
+):
+    """
+    Генерирует версию LaTeX-документа, в которой каждый фрагмент лежит в отдельном файле.
+
+    Args:
+        images_dir: путь к папке с изображениями
+        output_dir: выходная директория
+        num_blocks: количество блоков (и изображений)
+        output_tex: путь к выходному .tex файлу
+        include_mode: способ подключения ('input', 'inputifexists', 'include', 'subfiles')
+        corpus: источник текста фрагментов ('lipsum' или 'synthetic')
+        corpus_seed: зерно синтетического корпуса
+        ablations: отключаемые компоненты блока (см. ABLATIONS в ablation.py)
+        cross_refs: добавить оглавление и перекрестные ссылки между блоками
+            (документу нужно несколько проходов)
+
+    Returns:
+        tuple: Возвращаем пути: output_tex, des_dir, data_dir
+    """
+    if include_mode not in INCLUDE_MODES:
+        raise ValueError(f"Неизвестный способ подключения файлов: {include_mode}")
+
+    # Определяем путь к выходному .tex файлу
+    if output_tex is None:
+        output_tex = os.path.join(output_dir, "main.tex")
+
+    # Проверяем и создаем структуру папок
+    os.makedirs(output_dir, exist_ok=True)
+    des_dir = os.path.join(output_dir, "des")
+    data_dir = os.path.join(output_dir, "data")
+    os.makedirs(des_dir, exist_ok=True)
+    os.makedirs(data_dir, exist_ok=True)
+
+    # Создаем подпапку для изображений в выходной директории
+    images_dest = os.path.join(output_dir, "images")
+
+    # Копируем только необходимое количество изображений
+    if not copy_required_images(images_dir, images_dest, num_blocks):
+        print("Не удалось скопировать изображения. Завершение работы.")
+        sys.exit(1)
+
+    paragraphs = load_corpus(corpus, corpus_seed)
+
+    # Генерируем des/DesK.tex и data/DataK.tex (те же абзацы, что и в macrodef)
+    for i in range(1, num_blocks + 1):
+        write_fragment(
+            os.path.join(des_dir, f"Des{i}.tex"),
+            fragment_paragraph(paragraphs, i, 0),
+            include_mode,
+        )
+        write_fragment(
+            os.path.join(data_dir, f"Data{i}.tex"),
+            fragment_paragraph(paragraphs, i, 1),
+            include_mode,
+        )
+
+    # Генерируем основной LaTeX файл
+    tex_content = r"""\documentclass[a4paper]{report}
+"""
+    tex_content += package_preamble(ablations) + "\n"
+    tex_content += INCLUDE_MODES[include_mode]
+    tex_content += "\n" + fig_command(ablations) + merge_command(
+        r"\newcommand{\merge}[4]{\par\textbf{#1}\par\fig{#2}\des{#3}\par\data{#4}\par}", ablations, cross_refs
+    )
+    tex_content += r"""
+% See
+% https://tex.stackexchange.com/questions/505770/how-to-measure-the-compilation-time-of-a-document
+\ExplSyntaxOn
+\AfterEndDocument { \benchmark_toc: }
+\use:n
+  {
+    \benchmark_tic:
+  }
+\ExplSyntaxOff
+\begin{document}
+
+"""
+
+    # Добавляем блоки
+    for i in range(1, num_blocks + 1):
+        block_num = f"Block {i}"
+        image_name = f"test-image-{i}.png"
+        image_path = f"images/{image_name}"
+
+        tex_content += f"\n\\merge{{{block_num}}}{{{image_path}}}{{Des{i}}}{{Data{i}}}\n"
+
+    tex_content += r"""
+\end{document}
+"""
+
+    # Сохраняем основной файл
+    try:
+        with open(output_tex, "w", encoding="utf-8") as f:
+            f.write(tex_content)
+    except Exception as e:
+        print(f"Ошибка при сохранении файла {output_tex}: {e}")
+        sys.exit(1)
+
+    return output_tex, des_dir, data_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Генерация версии LaTeX-документа с отдельным файлом на каждый фрагмент",
+        epilog="""
+Примеры использования:
+  %(prog)s --images-dir images --num-blocks 50
+  %(prog)s -i images -n 100 -o files_version --include-mode inputifexists
+  %(prog)s -i images -n 30 --include-mode include
+  %(prog)s -i images -n 30 --include-mode subfiles
+  %(prog)s -i images -n 2000 --corpus synthetic
+  %(prog)s -i images -n 100 --ablate noimage,nofloat,nolipsum,noheader
+        """,
+    )
+
+    parser.add_argument(
+        "-i",
+        "--images-dir",
+        type=str,
+        default="images",
+        help="путь к папке с сгенерированными изображениями (по умолчанию: images)",
+    )
+
+    parser.add_argument(
+        "-n",
+        "--num-blocks",
+        type=int,
+        default=50,
+        help="количество блоков/изображений для использования (по умолчанию: 50)",
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=str,
+        default="files",
+        help="выходная директория (по умолчанию: files)",
+    )
+
+    parser.add_argument(
+        "-t",
+        "--output-tex",
+        type=str,
+        default=None,
+        help="путь к выходному .tex файлу (по умолчанию: <output_dir>/main.tex)",
+    )
+
+    parser.add_argument(
+        "-y",
+        "--yes",
+        action="store_true",
+        help="автоматически подтверждать все запросы",
+    )
+
+    parser.add_argument(
+        "-m",
+        "--include-mode",
+        type=str,
+        choices=list(INCLUDE_MODES),
+        default="input",
+        help="способ подключения файлов-фрагментов (input, inputifexists, include, subfiles) (по умолчанию: input)",
+    )
+
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        choices=CORPUS_NAMES,
+        default="lipsum",
+        help="источник текста фрагментов: пять абзацев lipsum по кругу или синтетический "
+        "корпус уникальных абзацев (по умолчанию: lipsum)",
+    )
+
+    parser.add_argument(
+        "--corpus-seed",
+        type=int,
+        default=0,
+        help="зерно синтетического корпуса (по умолчанию: 0)",
+    )
+
+    parser.add_argument(
+        "--ablate",
+        type=str,
+        default="",
+        help="отключаемые компоненты блока через запятую: "
+        + ", ".join(ABLATIONS)
+        + " (по умолчанию: ничего не отключать)",
+    )
+
+    parser.add_argument(
+        "--cross-refs",
+        action="store_true",
+        help="добавить \\tableofcontents, \\label и \\ref на предыдущий блок "
+        "(для многопроходной сборки)",
+    )
+
+    args = parser.parse_args()
+
+    try:
+        args.ablate = parse_ablations(args.ablate)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+
+    # Проверяем корректность количества блоков
+    if args.num_blocks <= 0:
+        print("Ошибка: Количество блоков должно быть положительным числом")
+        sys.exit(1)
+
+    # Проверяем существование директории с изображениями
+    if not os.path.exists(args.images_dir):
+        print(f"Ошибка: Директория с изображениями '{args.images_dir}' не существует")
+        sys.exit(1)
+
+    # Проверяем, существует ли выходная директория и не пуста ли она
+    if os.path.exists(args.output_dir) and os.listdir(args.output_dir):
+        # Если флаг -y установлен, автоматически подтверждаем
+        if args.yes:
+            response = "y"
+        else:
+            response = input(
+                f"Директория '{args.output_dir}' не пуста. Перезаписать? [y/N]: "
+            )
+        if response.lower() != "y":
+            print("Отменено пользователем.")
+            sys.exit(0)
+
+    print(f"Генерация версии документа с файлом на каждый фрагмент:")
+    print(f"  Папка с изображениями: {args.images_dir}")
+    print(f"  Выходная директория: {args.output_dir}")
+    print(f"  Способ подключения: {args.include_mode}")
+    if args.corpus != "lipsum":
+        print(f"  Корпус: {args.corpus} (seed: {args.corpus_seed})")
+    if args.ablate:
+        print(f"  Отключенные компоненты: {', '.join(args.ablate)}")
+    if args.cross_refs:
+        print(f"  Перекрестные ссылки: оглавление, \\label и \\ref")
+
+    # Генерируем документ
+    main_tex_path, des_dir, data_dir = generate_files_tex(
+        images_dir=args.images_dir,
+        output_dir=args.output_dir,
+        num_blocks=args.num_blocks,
+        output_tex=args.output_tex,
+        include_mode=args.include_mode,
+        corpus=args.corpus,
+        corpus_seed=args.corpus_seed,
+        ablations=args.ablate,
+        cross_refs=args.cross_refs,
+    )
+
+    print(f"\nВерсия с файлами-фрагментами успешно сгенерирована!")
+    print(f"  Основной файл: {main_tex_path}")
+    print(f"  Папка описаний: {des_dir}")
+    print(f"  Папка данных: {data_dir}")
+    print(f"  Изображения скопированы в: {os.path.join(args.output_dir, 'images')}")
+    print(f"  Всего блоков: {args.num_blocks}")
+
+
+if __name__ == "__main__":
+    main()
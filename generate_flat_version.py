@@ -3,6 +3,8 @@ import os
 import argparse
 import shutil
 import sys
+from corpus import CORPUS_NAMES, CORPUS_MODES, CONTENT_PREAMBLES, content_corpus, fragment_paragraph
+from ablation import ABLATIONS, parse_ablations, package_preamble, fig_command, merge_command
 
 
 def copy_required_images(src_dir, dst_dir, num_images):
@@ -46,7 +48,18 @@ def copy_required_images(src_dir, dst_dir, num_images):
     return True
 
 
-def generate_flat_tex(images_dir, output_dir, num_blocks, output_tex, inner):
+def generate_flat_tex(
+    images_dir,
+    output_dir,
+    num_blocks,
+    output_tex,
+    inner,
+    corpus="lipsum",
+    corpus_seed=0,
+    content="text",
+    ablations=(),
+    cross_refs=False,
+):
     """
     Генерирует плоскую версию LaTeX-документа.
 
@@ -56,6 +69,13 @@ def generate_flat_tex(images_dir, output_dir, num_blocks, output_tex, inner):
         num_blocks: количество блоков (и изображений)
         output_tex: путь к выходному .tex файлу
         inner: если True, вставляет непосредственно текст вместо команды \\lipsum
+        corpus: источник текста для режима inner ('lipsum' или 'synthetic')
+        corpus_seed: зерно синтетического корпуса
+        content: режим содержимого ('text', 'math', 'cyrillic', 'mixed');
+            режимы, кроме 'text', используют синтетический корпус и добавляют пакеты в преамбулу
+        ablations: отключаемые компоненты блока (см. ABLATIONS в ablation.py)
+        cross_refs: добавить оглавление и перекрестные ссылки между блоками
+            (документу нужно несколько проходов)
     """
     # Определяем путь к выходному .tex файлу
     if output_tex is None:
@@ -74,15 +94,12 @@ def generate_flat_tex(images_dir, output_dir, num_blocks, output_tex, inner):
 
     # Генерируем основной LaTeX файл
     tex_content = r"""\documentclass[a4paper]{report}
-\usepackage{graphicx}
-\usepackage{geometry}
-\usepackage{float}
-\usepackage[language=english]{lipsum}
-\usepackage{etoolbox}
-\usepackage{l3benchmark}
-
-\newcommand{\fig}[1]{\begin{figure}[H]\includegraphics{#1}\end{figure}}
-\newcommand{\merge}[4]{\par\textbf{#1}\par\fig{#2}#3\par#4\par}
+"""
+    tex_content += package_preamble(ablations) + CONTENT_PREAMBLES[content]
+    tex_content += "\n" + fig_command(ablations) + merge_command(
+        r"\newcommand{\merge}[4]{\par\textbf{#1}\par\fig{#2}#3\par#4\par}", ablations, cross_refs
+    )
+    tex_content += r"""
 % See
 % https://tex.stackexchange.com/questions/505770/how-to-measure-the-compilation-time-of-a-document
 \ExplSyntaxOn
@@ -95,9 +112,9 @@ def generate_flat_tex(images_dir, output_dir, num_blocks, output_tex, inner):
 \begin{document}
 
 """
-    # Импортируем paragraphs для режима inner
+    # Загружаем источник абзацев для режима inner
     if inner:
-        from lipsum import paragraphs
+        paragraphs = content_corpus(corpus, corpus_seed, content)
 
     # Добавляем блоки
     for i in range(1, num_blocks + 1):
@@ -109,11 +126,8 @@ def generate_flat_tex(images_dir, output_dir, num_blocks, output_tex, inner):
 
         if inner:
             # Вставляем непосредственно текст
-            des_idx = (lipsum_idx - 1) % len(paragraphs)
-            data_idx = (lipsum_idx) % len(paragraphs)
-
-            des_text = paragraphs[des_idx]
-            data_text = paragraphs[data_idx]
+            des_text = fragment_paragraph(paragraphs, i, 0)
+            data_text = fragment_paragraph(paragraphs, i, 1)
 
             tex_content += f"""
 \\merge{{{block_num}}}{{{image_path}}}{{%
@@ -152,6 +166,9 @@ def main():
   %(prog)s -i images -n 100 -o flat_version
   %(prog)s -i images -n 30 -t my_document.tex
   %(prog)s -i images -n 50 --inner
+  %(prog)s -i images -n 2000 --inner --corpus synthetic --corpus-seed 7
+  %(prog)s -i images -n 500 --inner --content mixed
+  %(prog)s -i images -n 500 --inner --ablate noimage,nolipsum
         """,
     )
 
@@ -200,8 +217,65 @@ def main():
         help="использовать непосредственно текст вместо команды \\lipsum",
     )
 
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        choices=CORPUS_NAMES,
+        default="lipsum",
+        help="источник текста: пять абзацев lipsum по кругу или синтетический "
+        "корпус уникальных абзацев (только с --inner) (по умолчанию: lipsum)",
+    )
+
+    parser.add_argument(
+        "--corpus-seed",
+        type=int,
+        default=0,
+        help="зерно синтетического корпуса (по умолчанию: 0)",
+    )
+
+    parser.add_argument(
+        "--content",
+        type=str,
+        choices=CORPUS_MODES,
+        default="text",
+        help="содержимое фрагментов: text, math (формулы в тексте), cyrillic (русский текст), "
+        "mixed; все режимы, кроме text, используют синтетический корпус (только с --inner) (по умолчанию: text)",
+    )
+
+    parser.add_argument(
+        "--ablate",
+        type=str,
+        default="",
+        help="отключаемые компоненты блока через запятую: "
+        + ", ".join(ABLATIONS)
+        + " (nolipsum только с --inner) (по умолчанию: ничего не отключать)",
+    )
+
+    parser.add_argument(
+        "--cross-refs",
+        action="store_true",
+        help="добавить \\tableofcontents, \\label и \\ref на предыдущий блок "
+        "(для многопроходной сборки)",
+    )
+
     args = parser.parse_args()
 
+    try:
+        args.ablate = parse_ablations(args.ablate)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+    if "nolipsum" in args.ablate and not args.inner:
+        print("Ошибка: --ablate nolipsum требует --inner")
+        sys.exit(1)
+
+    if args.corpus != "lipsum" and not args.inner:
+        print("Ошибка: --corpus synthetic требует --inner")
+        sys.exit(1)
+    if args.content != "text" and not args.inner:
+        print("Ошибка: --content требует --inner")
+        sys.exit(1)
+
     # Проверяем существование директории с изображениями
     if not os.path.exists(args.images_dir):
         print(f"Ошибка: Директория с изображениями '{args.images_dir}' не существует")
@@ -228,6 +302,14 @@ def main():
         print(f"  Режим: inner (непосредственный текст вместо \\lipsum)")
     else:
         print(f"  Режим: обычный (команда \\lipsum)")
+    if args.corpus != "lipsum":
+        print(f"  Корпус: {args.corpus} (seed: {args.corpus_seed})")
+    if args.content != "text":
+        print(f"  Содержимое: {args.content}")
+    if args.ablate:
+        print(f"  Отключенные компоненты: {', '.join(args.ablate)}")
+    if args.cross_refs:
+        print(f"  Перекрестные ссылки: оглавление, \\label и \\ref")
 
     # Генерируем документ
     generate_flat_tex(
@@ -236,6 +318,11 @@ def main():
         num_blocks=args.num_blocks,
         output_tex=args.output_tex,
         inner=args.inner,
+        corpus=args.corpus,
+        corpus_seed=args.corpus_seed,
+        content=args.content,
+        ablations=args.ablate,
+        cross_refs=args.cross_refs,
     )
 
 
@@ -3,7 +3,22 @@ import os
 import argparse
 import shutil
 import sys
-from lipsum import paragraphs
+from corpus import (
+    CORPUS_NAMES,
+    CORPUS_MODES,
+    CONTENT_PREAMBLES,
+    content_corpus,
+    fragment_paragraph,
+)
+from generate_modular_version import (
+    shard_number,
+    shard_file_names,
+    parse_fragment_size,
+    fragment_sizes,
+    fragment_text,
+    SIZE_DISTRIBUTIONS,
+)
+from ablation import ABLATIONS, parse_ablations, package_preamble, fig_command, merge_command
 
 
 def copy_required_images(src_dir, dst_dir, num_images):
@@ -45,7 +60,23 @@ def copy_required_images(src_dir, dst_dir, num_images):
     return True
 
 
-def generate_macro_tex(images_dir, output_dir, num_blocks, output_tex):
+def generate_macro_tex(
+    images_dir,
+    output_dir,
+    num_blocks,
+    output_tex,
+    shards=None,
+    fragment_size="1p",
+    size_distribution="fixed",
+    seed=0,
+    fragments_per_block=1,
+    corpus="lipsum",
+    corpus_seed=0,
+    content="text",
+    nesting_depth=0,
+    ablations=(),
+    cross_refs=False,
+):
     """
     Генерирует версию LaTeX-документа с макросами \\def вместо catchfilebetweentags.
 
@@ -54,9 +85,27 @@ def generate_macro_tex(images_dir, output_dir, num_blocks, output_tex):
         output_dir: выходная директория
         num_blocks: количество блоков (и изображений)
         output_tex: путь к выходному .tex файлу
+        shards: если задано, макросы разбиваются по номеру тега на shards файлов
+            des_1.tex ... des_K.tex (и так же data), и каждый шард подключается
+            через \\input лениво, при первом обращении к его фрагменту
+        fragment_size: средний размер фрагмента: '<число>p' абзацев или '<число>b' байт
+        size_distribution: распределение размеров фрагментов ('fixed', 'uniform', 'exp')
+        seed: зерно для случайных размеров фрагментов
+        fragments_per_block: сколько пар des/data выводит каждый блок;
+            макросов в файлах будет num_blocks * fragments_per_block
+        corpus: источник текста фрагментов ('lipsum' или 'synthetic')
+        corpus_seed: зерно синтетического корпуса
+        content: режим содержимого фрагментов ('text', 'math', 'cyrillic', 'mixed');
+            режимы, кроме 'text', используют синтетический корпус и добавляют пакеты в преамбулу
+        nesting_depth: глубина вложенности; макрос фрагмента i вызывает \\@nameuse{subSub1x<i>}
+            из shared.tex, тот -- subSub2x<i> и так далее до глубины D
+        ablations: отключаемые компоненты блока (см. ABLATIONS в ablation.py)
+        cross_refs: добавить оглавление и перекрестные ссылки между блоками
+            (документу нужно несколько проходов)
 
     Returns:
         tuple: Возвращаем пути до файлов: output_tex, des_path, data_path
+            (при shards — списки путей к шардам)
     """
     # Определяем путь к выходному .tex файлу
     if output_tex is None:
@@ -73,49 +122,96 @@ def generate_macro_tex(images_dir, output_dir, num_blocks, output_tex):
         print("Не удалось скопировать изображения. Завершение работы.")
         sys.exit(1)
 
-    # Генерируем des.tex с макросами
-    des_content = ""
-    for i in range(1, num_blocks + 1):
-        lipsum_idx = (i % 5) + 1
-        paragraph_idx = (lipsum_idx - 1) % len(paragraphs)
-        des_content += f"""\\@namedef{{desDes{i}}}{{%
-{paragraphs[paragraph_idx]}%
-}}
+    if fragments_per_block < 1:
+        raise ValueError(
+            f"Количество фрагментов на блок должно быть >= 1, получено: {fragments_per_block}"
+        )
+
+    # Количество макросов в каждом из файлов des и data
+    num_tags = num_blocks * fragments_per_block
+
+    if shards is not None and not 1 <= shards <= num_tags:
+        raise ValueError(
+            f"Количество шардов должно быть от 1 до {num_tags}, получено: {shards}"
+        )
+
+    size, unit = parse_fragment_size(fragment_size)
+    sizes = fragment_sizes(num_tags, size, size_distribution, seed)
+    paragraphs = content_corpus(corpus, corpus_seed, content)
+
+    if nesting_depth < 0:
+        raise ValueError(f"Глубина вложенности должна быть >= 0, получено: {nesting_depth}")
+
+    def nested_ref(level, i):
+        # Вызов подфрагмента следующего уровня (пусто, если глубина исчерпана)
+        if level > nesting_depth:
+            return ""
+        return f"\\@nameuse{{subSub{level}x{i}}}%\n"
+
+    des_names = shard_file_names("des", shards)
+    data_names = shard_file_names("data", shards)
+
+    # Генерируем des.tex с макросами (или шарды des_1.tex ... des_K.tex)
+    des_contents = [""] * len(des_names)
+    for i in range(1, num_tags + 1):
+        shard_idx = 0 if shards is None else shard_number(i, num_tags, shards) - 1
+        des_contents[shard_idx] += f"""\\@namedef{{desDes{i}}}{{%
+{fragment_text(paragraphs, i, 0, sizes[i - 1], unit)}%
+{nested_ref(1, i)}}}
 
 """
 
-    des_path = os.path.join(output_dir, "des.tex")
-    with open(des_path, "w", encoding="utf-8") as f:
-        f.write(des_content)
+    des_paths = [os.path.join(output_dir, name) for name in des_names]
+    for des_path, des_content in zip(des_paths, des_contents):
+        with open(des_path, "w", encoding="utf-8") as f:
+            f.write(des_content)
 
-    # Генерируем data.tex с макросами
-    data_content = ""
-    for i in range(1, num_blocks + 1):
-        lipsum_idx = (i % 5) + 2  # Используем следующий параграф
-        paragraph_idx = (lipsum_idx - 1) % len(paragraphs)
-        data_content += f"""\\@namedef{{dataData{i}}}{{%
-{paragraphs[paragraph_idx]}%
-}}
+    # Генерируем data.tex с макросами (или шарды data_1.tex ... data_K.tex)
+    data_contents = [""] * len(data_names)
+    for i in range(1, num_tags + 1):
+        shard_idx = 0 if shards is None else shard_number(i, num_tags, shards) - 1
+        data_contents[shard_idx] += f"""\\@namedef{{dataData{i}}}{{%
+{fragment_text(paragraphs, i, 1, sizes[i - 1], unit)}%
+{nested_ref(1, i)}}}
 
 """
 
-    data_path = os.path.join(output_dir, "data.tex")
-    with open(data_path, "w", encoding="utf-8") as f:
-        f.write(data_content)
+    data_paths = [os.path.join(output_dir, name) for name in data_names]
+    for data_path, data_content in zip(data_paths, data_contents):
+        with open(data_path, "w", encoding="utf-8") as f:
+            f.write(data_content)
+
+    # Генерируем shared.tex с подфрагментами: subSub<L>x<i> вызывает subSub<L+1>x<i>
+    if nesting_depth:
+        shared_content = ""
+        for level in range(1, nesting_depth + 1):
+            for i in range(1, num_tags + 1):
+                shared_content += f"""\\@namedef{{subSub{level}x{i}}}{{%
+{fragment_paragraph(paragraphs, i, 1 + level)}%
+{nested_ref(level + 1, i)}}}
+
+"""
+        with open(os.path.join(output_dir, "shared.tex"), "w", encoding="utf-8") as f:
+            f.write(shared_content)
 
     # Генерируем основной LaTeX файл
     tex_content = r"""\documentclass[a4paper]{report}
-\usepackage{graphicx}
-\usepackage{geometry}
-\usepackage{float}
-\usepackage[language=english]{lipsum}
-\usepackage{etoolbox}
-\usepackage{l3benchmark}
-
-\makeatletter
-\newcommand{\fig}[1]{\begin{figure}[H]\includegraphics{#1}\end{figure}}
-\newcommand{\merge}[4]{\par\textbf{#1}\par\fig{#2}\@nameuse{#3}\par\@nameuse{#4}\par}
-\makeatother
+"""
+    tex_content += package_preamble(ablations)
+    tex_content += CONTENT_PREAMBLES[content]
+    tex_content += "\n\\makeatletter\n" + fig_command(ablations)
+    if shards is None:
+        tex_content += merge_command(
+            r"\newcommand{\merge}[4]{\par\textbf{#1}\par\fig{#2}\@nameuse{#3}\par\@nameuse{#4}\par}", ablations, cross_refs
+        ) + "\n"
+    else:
+        # Шард подключается при первом обращении к любому из его фрагментов
+        tex_content += r"""\newcommand{\fragload}[1]{\@ifundefined{fragshard@#1}{\global\@namedef{fragshard@#1}{}\makeatletter\input{#1}\makeatother}{}}
+"""
+        tex_content += merge_command(
+            r"\newcommand{\merge}[5]{\par\textbf{#1}\par\fig{#2}\fragload{des_#3.tex}\@nameuse{#4}\par\fragload{data_#3.tex}\@nameuse{#5}\par}", ablations, cross_refs
+        ) + "\n"
+    tex_content += r"""\makeatother
 % See
 % https://tex.stackexchange.com/questions/505770/how-to-measure-the-compilation-time-of-a-document
 \ExplSyntaxOn
@@ -126,11 +222,21 @@ def generate_macro_tex(images_dir, output_dir, num_blocks, output_tex):
   }
 \ExplSyntaxOff
 \begin{document}
-\makeatletter
+"""
+    if shards is None:
+        tex_content += r"""\makeatletter
 % Загружаем все макросы из внешних файлов
 \input{des.tex}
 \input{data.tex}
 \makeatother
+"""
+    if nesting_depth:
+        if shards is None:
+            tex_content += "\\makeatletter\n% Загружаем подфрагменты\n"
+        else:
+            tex_content += "\\makeatletter\n% Подфрагменты нужны всем шардам, загружаем их целиком\n"
+        tex_content += r"""\input{shared.tex}
+\makeatother
 """
 
     # Добавляем блоки
@@ -138,10 +244,25 @@ def generate_macro_tex(images_dir, output_dir, num_blocks, output_tex):
         block_num = f"Block {i}"
         image_name = f"test-image-{i}.png"
         image_path = f"images/{image_name}"
-        tag_num = f"{i}"
+        refs = range((i - 1) * fragments_per_block + 1, i * fragments_per_block + 1)
+        tag_num = f"{refs[0]}"
 
         # Используем прямые вызовы макросов
-        tex_content += f"\n\\merge{{{block_num}}}{{{image_path}}}{{desDes{tag_num}}}{{dataData{tag_num}}}\n"
+        if shards is None:
+            tex_content += f"\n\\merge{{{block_num}}}{{{image_path}}}{{desDes{tag_num}}}{{dataData{tag_num}}}\n"
+        else:
+            shard = shard_number(refs[0], num_tags, shards)
+            tex_content += f"\n\\merge{{{block_num}}}{{{image_path}}}{{{shard}}}{{desDes{tag_num}}}{{dataData{tag_num}}}\n"
+
+        # Остальные фрагменты блока выводятся после \merge
+        for tag in refs[1:]:
+            if shards is not None:
+                shard = shard_number(tag, num_tags, shards)
+                tex_content += f"\\fragload{{des_{shard}.tex}}"
+            tex_content += f"\\csname desDes{tag}\\endcsname\\par"
+            if shards is not None:
+                tex_content += f"\\fragload{{data_{shard}.tex}}"
+            tex_content += f"\\csname dataData{tag}\\endcsname\\par\n"
 
     tex_content += r"""
 \end{document}
@@ -155,7 +276,9 @@ def generate_macro_tex(images_dir, output_dir, num_blocks, output_tex):
         print(f"Ошибка при сохранении файла {output_tex}: {e}")
         sys.exit(1)
 
-    return output_tex, des_path, data_path
+    if shards is None:
+        return output_tex, des_paths[0], data_paths[0]
+    return output_tex, des_paths, data_paths
 
 
 def main():
@@ -166,6 +289,13 @@ def main():
   %(prog)s --images-dir images --num-blocks 50
   %(prog)s -i images -n 100 -o macro_version
   %(prog)s -i images -n 30 -t my_macro_document.tex
+  %(prog)s -i images -n 1000 --shards 10
+  %(prog)s -i images -n 100 --fragment-size 4000b --size-distribution exp
+  %(prog)s -i images -n 100 --fragment-size 3p --fragments-per-block 5
+  %(prog)s -i images -n 2000 --corpus synthetic --corpus-seed 7
+  %(prog)s -i images -n 500 --content mixed
+  %(prog)s -i images -n 200 --nesting-depth 3
+  %(prog)s -i images -n 200 --ablate draft,noheader
         """,
     )
 
@@ -208,13 +338,124 @@ def main():
         help="автоматически подтверждать все запросы",
     )
 
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=None,
+        help="разбить макросы по номеру тега на K файлов с ленивым \\input (по умолчанию: один файл, загружаемый целиком)",
+    )
+
+    parser.add_argument(
+        "--fragment-size",
+        type=str,
+        default="1p",
+        help="средний размер фрагмента: <число>p абзацев или <число>b байт (по умолчанию: 1p)",
+    )
+
+    parser.add_argument(
+        "--size-distribution",
+        type=str,
+        choices=SIZE_DISTRIBUTIONS,
+        default="fixed",
+        help="распределение размеров фрагментов (fixed, uniform, exp) (по умолчанию: fixed)",
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="зерно генератора для случайных размеров фрагментов (по умолчанию: 0)",
+    )
+
+    parser.add_argument(
+        "--fragments-per-block",
+        type=int,
+        default=1,
+        help="сколько пар des/data выводит каждый блок; макросов будет N * F (по умолчанию: 1)",
+    )
+
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        choices=CORPUS_NAMES,
+        default="lipsum",
+        help="источник текста фрагментов: пять абзацев lipsum по кругу или синтетический "
+        "корпус уникальных абзацев (по умолчанию: lipsum)",
+    )
+
+    parser.add_argument(
+        "--corpus-seed",
+        type=int,
+        default=0,
+        help="зерно синтетического корпуса (по умолчанию: 0)",
+    )
+
+    parser.add_argument(
+        "--content",
+        type=str,
+        choices=CORPUS_MODES,
+        default="text",
+        help="содержимое фрагментов: text, math (формулы в тексте), cyrillic (русский текст), "
+        "mixed; все режимы, кроме text, используют синтетический корпус (по умолчанию: text)",
+    )
+
+    parser.add_argument(
+        "--nesting-depth",
+        type=int,
+        default=0,
+        help="глубина вложенных вызовов: каждый макрос фрагмента вызывает цепочку "
+        "из D макросов-подфрагментов в shared.tex (по умолчанию: 0)",
+    )
+
+    parser.add_argument(
+        "--ablate",
+        type=str,
+        default="",
+        help="отключаемые компоненты блока через запятую: "
+        + ", ".join(ABLATIONS)
+        + " (по умолчанию: ничего не отключать)",
+    )
+
+    parser.add_argument(
+        "--cross-refs",
+        action="store_true",
+        help="добавить \\tableofcontents, \\label и \\ref на предыдущий блок "
+        "(для многопроходной сборки)",
+    )
+
     args = parser.parse_args()
 
+    try:
+        args.ablate = parse_ablations(args.ablate)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+
     # Проверяем корректность количества блоков
     if args.num_blocks <= 0:
         print("Ошибка: Количество блоков должно быть положительным числом")
         sys.exit(1)
 
+    if args.fragments_per_block < 1:
+        print("Ошибка: Количество фрагментов на блок должно быть >= 1")
+        sys.exit(1)
+
+    if args.nesting_depth < 0:
+        print("Ошибка: Глубина вложенности должна быть >= 0")
+        sys.exit(1)
+
+    try:
+        parse_fragment_size(args.fragment_size)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+
+    # Проверяем корректность количества шардов
+    num_tags = args.num_blocks * args.fragments_per_block
+    if args.shards is not None and not 1 <= args.shards <= num_tags:
+        print("Ошибка: Количество шардов должно быть от 1 до количества макросов")
+        sys.exit(1)
+
     # Проверяем существование директории с изображениями
     if not os.path.exists(args.images_dir):
         print(f"Ошибка: Директория с изображениями '{args.images_dir}' не существует")
@@ -237,6 +478,22 @@ def main():
     print(f"  Папка с изображениями: {args.images_dir}")
     print(f"  Выходная директория: {args.output_dir}")
     print(f"  Используются макросы \\def вместо catchfilebetweentags")
+    if args.shards is not None:
+        print(f"  Шардов (ленивый \\input): {args.shards}")
+    if args.fragment_size != "1p" or args.size_distribution != "fixed":
+        print(f"  Размер фрагментов: {args.fragment_size} ({args.size_distribution})")
+    if args.fragments_per_block > 1:
+        print(f"  Фрагментов на блок: {args.fragments_per_block} (макросов: {num_tags})")
+    if args.corpus != "lipsum":
+        print(f"  Корпус: {args.corpus} (seed: {args.corpus_seed})")
+    if args.content != "text":
+        print(f"  Содержимое фрагментов: {args.content}")
+    if args.nesting_depth:
+        print(f"  Глубина вложенности фрагментов: {args.nesting_depth}")
+    if args.ablate:
+        print(f"  Отключенные компоненты: {', '.join(args.ablate)}")
+    if args.cross_refs:
+        print(f"  Перекрестные ссылки: оглавление, \\label и \\ref")
 
     # Генерируем документ
     main_tex_path, des_tex_path, data_tex_path = generate_macro_tex(
@@ -244,8 +501,23 @@ def main():
         output_dir=args.output_dir,
         num_blocks=args.num_blocks,
         output_tex=args.output_tex,
+        shards=args.shards,
+        fragment_size=args.fragment_size,
+        size_distribution=args.size_distribution,
+        seed=args.seed,
+        fragments_per_block=args.fragments_per_block,
+        corpus=args.corpus,
+        corpus_seed=args.corpus_seed,
+        content=args.content,
+        nesting_depth=args.nesting_depth,
+        ablations=args.ablate,
+        cross_refs=args.cross_refs,
     )
 
+    if args.shards is not None:
+        des_tex_path = ", ".join(des_tex_path)
+        data_tex_path = ", ".join(data_tex_path)
+
     print(f"\nВерсия с макросами успешно сгенерирована!")
     print(f"  Основной файл: {main_tex_path}")
     print(f"  Файл описаний: {des_tex_path}")
@@ -1,9 +1,390 @@
 # generate_modular_version.py
 import os
 import argparse
+import random
 import shutil
 import sys
-from lipsum import paragraphs
+from corpus import CORPUS_NAMES, CORPUS_MODES, CONTENT_PREAMBLES, content_corpus, fragment_paragraph
+from ablation import ABLATIONS, parse_ablations, package_preamble, fig_command, merge_command
+
+# Порядок обращения к фрагментам в теле документа
+ACCESS_PATTERNS = ["sequential", "reverse", "random", "zipf", "first", "middle", "last"]
+
+# Показатель распределения Ципфа: вес тега ранга k равен 1 / k^s
+ZIPF_EXPONENT = 1.0
+
+# Распределения размера фрагментов вокруг заданного среднего
+SIZE_DISTRIBUTIONS = ["fixed", "uniform", "exp"]
+
+# Слов в строке фрагмента, собранного до заданного числа байт
+WORDS_PER_LINE = 12
+
+# Выходных файлов, которые docstrip держит открытыми одновременно: у TeX всего
+# 16 потоков \write, поэтому \file одного \generate обрабатываются пакетами
+DOCSTRIP_MAX_OUTFILES = 15
+
+# Индекс фрагментов: каждый файл с тегами читается построчно ровно один раз,
+# тело каждого тега сохраняется в отдельный макрос g_frag_<файл>/<тег>_tl,
+# поэтому \des и \data выполняются за O(1) вместо сканирования файла.
+INDEX_PREAMBLE = r"""
+\ExplSyntaxOn
+\ior_new:N \g_frag_index_ior
+\str_new:N \l_frag_head_str
+\str_new:N \l_frag_tag_str
+\str_new:N \l_frag_body_str
+\tl_new:N \l_frag_body_tl
+\bool_new:N \l_frag_in_tag_bool
+\str_const:Nx \c_frag_open_str { \c_percent_str < * }
+\str_const:Nx \c_frag_close_str { \c_percent_str < / }
+\cs_generate_variant:Nn \tl_set_rescan:Nnn { NnV }
+\cs_new_protected:Npn \frag_index_file:nn #1#2
+  {
+    \ior_open:Nn \g_frag_index_ior {#2}
+    \ior_str_map_inline:Nn \g_frag_index_ior
+      { \frag_index_line:nn {#1} {##1} }
+    \ior_close:N \g_frag_index_ior
+  }
+\cs_new_protected:Npn \frag_index_line:nn #1#2
+  {
+    \str_set:Nx \l_frag_head_str { \str_range:nnn {#2} { 1 } { 3 } }
+    \str_if_eq:NNTF \l_frag_head_str \c_frag_open_str
+      {
+        \str_set:Nx \l_frag_tag_str { \str_range:nnn {#2} { 4 } { -2 } }
+        \str_clear:N \l_frag_body_str
+        \bool_set_true:N \l_frag_in_tag_bool
+      }
+      {
+        \str_if_eq:NNTF \l_frag_head_str \c_frag_close_str
+          {
+            \bool_set_false:N \l_frag_in_tag_bool
+            \tl_set_rescan:NnV \l_frag_body_tl
+              { \int_set:Nn \tex_newlinechar:D { 13 } }
+              \l_frag_body_str
+            \tl_gset_eq:cN { g_frag_ #1 / \l_frag_tag_str _tl } \l_frag_body_tl
+          }
+          {
+            \bool_if:NT \l_frag_in_tag_bool
+              { \str_put_right:Nx \l_frag_body_str { #2 \iow_char:N \^^M } }
+          }
+      }
+  }
+\cs_new_protected:Npn \des #1 { \use:c { g_frag_des / #1 _tl } }
+\cs_new_protected:Npn \data #1 { \use:c { g_frag_data / #1 _tl } }
+\ExplSyntaxOff
+"""
+
+# Хранилища фрагментов на стороне Lua (только для lualatex).
+# table: файлы с тегами читаются один раз в таблицу Lua, \des и \data вызывают tex.print.
+# seek: смещения фрагментов заранее вычислены в Python (fragments_index.lua),
+#       Lua переходит к фрагменту через seek без сканирования файла.
+# Путь к файлам берется из status.filename, так как lualatex запускается
+# не из директории документа.
+LUA_PREAMBLES = {
+    "table": r"""\usepackage{luacode}
+\begin{luacode*}
+fragstore = {}
+local base = status.filename:match("^(.*[/\\])") or ""
+function fragload(prefix, name)
+  local store, lines = {}, nil
+  for line in io.lines(base .. name) do
+    local open = line:match("^%%<%*(.-)>%s*$")
+    if open then
+      lines = {}
+      store[open] = lines
+    elseif line:match("^%%</(.-)>%s*$") then
+      lines = nil
+    elseif lines then
+      lines[#lines + 1] = line
+    end
+  end
+  fragstore[prefix] = store
+end
+function fragprint(prefix, tag)
+  tex.print(fragstore[prefix][tag])
+end
+\end{luacode*}
+\AtBeginDocument{\directlua{fragload("des", "des.tex") fragload("data", "data.tex")}}
+""",
+    "seek": r"""\usepackage{luacode}
+\begin{luacode*}
+local base = status.filename:match("^(.*[/\\])") or ""
+local index, handles = nil, {}
+function fragload()
+  index = dofile(base .. "fragments_index.lua")
+  for prefix, entry in pairs(index) do
+    handles[prefix] = io.open(base .. entry.file, "rb")
+  end
+end
+function fragprint(prefix, tag)
+  local pos = index[prefix].tags[tag]
+  local handle = handles[prefix]
+  handle:seek("set", pos[1])
+  local lines = {}
+  for line in (handle:read(pos[2]) .. "\n"):gmatch("(.-)\r?\n") do
+    lines[#lines + 1] = line
+  end
+  tex.print(lines)
+end
+\end{luacode*}
+\AtBeginDocument{\directlua{fragload()}}
+""",
+}
+
+LUA_COMMANDS = r"""\newcommand{\des}[1]{\directlua{fragprint("des", "#1")}}
+\newcommand{\data}[1]{\directlua{fragprint("data", "#1")}}
+"""
+
+
+def build_offset_index(content):
+    """
+    Вычисляет байтовые смещения тел фрагментов в файле с тегами.
+
+    Args:
+        content: содержимое файла с тегами %<*Tag>/%</Tag>
+
+    Returns:
+        dict: тег -> (смещение начала тела, длина тела в байтах без последнего перевода строки)
+    """
+    offsets = {}
+    starts = {}
+    pos = 0
+    for line in content.encode("utf-8").splitlines(keepends=True):
+        stripped = line.rstrip(b"\r\n")
+        if stripped.startswith(b"%<*") and stripped.endswith(b">"):
+            starts[stripped[3:-1].decode("utf-8")] = pos + len(line)
+        elif stripped.startswith(b"%</") and stripped.endswith(b">"):
+            tag = stripped[3:-1].decode("utf-8")
+            if tag in starts:
+                start = starts.pop(tag)
+                offsets[tag] = (start, max(pos - 1 - start, 0))
+        pos += len(line)
+    return offsets
+
+
+def write_offset_index(path, files):
+    """
+    Записывает индекс смещений фрагментов в виде Lua-модуля.
+
+    Args:
+        path: путь к fragments_index.lua
+        files: список (префикс, имя файла, содержимое файла)
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("return {\n")
+        for prefix, name, content in files:
+            f.write(f'  {prefix} = {{\n    file = "{name}",\n    tags = {{\n')
+            for tag, (start, length) in build_offset_index(content).items():
+                f.write(f'      ["{tag}"] = {{{start}, {length}}},\n')
+            f.write("    },\n  },\n")
+        f.write("}\n")
+
+
+def write_docstrip_driver(path, tags_by_file):
+    """
+    Записывает .ins драйвер docstrip, извлекающий каждый тег в отдельный файл.
+
+    Все \\file собраны в один \\generate, но docstrip открывает не больше
+    DOCSTRIP_MAX_OUTFILES выходных файлов сразу и заново читает все исходные
+    файлы для каждого пакета. При 2N извлекаемых файлах исходники читаются
+    ceil(2N / DOCSTRIP_MAX_OUTFILES) раз, то есть время извлечения растет
+    квадратично по N.
+
+    Args:
+        path: путь к .ins файлу
+        tags_by_file: список (имя файла с тегами, префикс, список тегов)
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\\input docstrip\n")
+        f.write(f"\\maxoutfiles{{{DOCSTRIP_MAX_OUTFILES}}}\n")
+        f.write("\\keepsilent\n")
+        f.write("\\askforoverwritefalse\n")
+        f.write("\\nopreamble\n")
+        f.write("\\nopostamble\n")
+        f.write("\\generate{\n")
+        for name, prefix, tags in tags_by_file:
+            for tag in tags:
+                f.write(f"  \\file{{{prefix}-{tag}.tex}}{{\\from{{{name}}}{{{tag}}}}}\n")
+        f.write("}\n")
+        f.write("\\endbatchfile\n")
+
+
+def access_sequence(pattern, num_blocks, num_refs, seed=0):
+    """
+    Возвращает номера тегов, к которым по порядку обращаются блоки документа.
+
+    Для random и zipf последовательность определяется seed. В zipf популярность
+    тегов не связана с их позицией в файле: ранги раздаются тегам случайной
+    перестановкой, чтобы отделить влияние позиции от влияния распределения.
+
+    Args:
+        pattern: порядок обращения (один из ACCESS_PATTERNS)
+        num_blocks: количество тегов (1..num_blocks)
+        num_refs: количество обращений (блоков в документе)
+        seed: зерно генератора случайных чисел
+
+    Returns:
+        list: номера тегов длины num_refs
+    """
+    if pattern == "sequential":
+        return [(ref % num_blocks) + 1 for ref in range(num_refs)]
+    if pattern == "reverse":
+        return [num_blocks - (ref % num_blocks) for ref in range(num_refs)]
+    if pattern == "first":
+        return [1] * num_refs
+    if pattern == "middle":
+        return [(num_blocks + 1) // 2] * num_refs
+    if pattern == "last":
+        return [num_blocks] * num_refs
+
+    rng = random.Random(seed)
+    if pattern == "random":
+        return [rng.randint(1, num_blocks) for _ in range(num_refs)]
+    if pattern == "zipf":
+        tags = list(range(1, num_blocks + 1))
+        rng.shuffle(tags)
+        weights = [1 / rank**ZIPF_EXPONENT for rank in range(1, num_blocks + 1)]
+        return rng.choices(tags, weights=weights, k=num_refs)
+
+    raise ValueError(f"Неизвестный порядок обращения к фрагментам: {pattern}")
+
+
+def parse_fragment_size(spec):
+    """
+    Разбирает размер фрагмента: '<число>p' -- абзацы, '<число>b' -- байты.
+
+    Args:
+        spec: строка размера, например '3p' или '2000b'
+
+    Returns:
+        tuple: (количество, единица 'p' или 'b')
+    """
+    spec = spec.strip().lower()
+    if len(spec) < 2 or spec[-1] not in "pb" or not spec[:-1].isdigit():
+        raise ValueError(
+            f"Размер фрагмента должен иметь вид <число>p или <число>b, получено: {spec}"
+        )
+    size = int(spec[:-1])
+    if size <= 0:
+        raise ValueError(f"Размер фрагмента должен быть положительным, получено: {spec}")
+    return size, spec[-1]
+
+
+def fragment_sizes(num_tags, mean_size, distribution="fixed", seed=0):
+    """
+    Возвращает размеры фрагментов (в абзацах или байтах) для каждого тега.
+
+    Args:
+        num_tags: количество тегов
+        mean_size: средний размер фрагмента
+        distribution: 'fixed', 'uniform' (от 0.5 до 1.5 среднего) или 'exp' (экспоненциальное)
+        seed: зерно генератора случайных чисел
+
+    Returns:
+        list: размеры фрагментов (не меньше 1)
+    """
+    if distribution == "fixed":
+        return [mean_size] * num_tags
+
+    # Отдельный поток случайных чисел, чтобы размеры не зависели от access_pattern
+    rng = random.Random(f"{seed}:size")
+    if distribution == "uniform":
+        low, high = max(1, mean_size // 2), max(1, mean_size * 3 // 2)
+        return [rng.randint(low, high) for _ in range(num_tags)]
+    if distribution == "exp":
+        return [max(1, round(rng.expovariate(1 / mean_size))) for _ in range(num_tags)]
+
+    raise ValueError(f"Неизвестное распределение размера фрагментов: {distribution}")
+
+
+def fragment_text(paragraphs, i, shift=0, size=1, unit="p"):
+    """
+    Собирает текст фрагмента i из абзацев корпуса.
+
+    Args:
+        paragraphs: источник абзацев (результат load_corpus)
+        i: номер фрагмента
+        shift: 0 для описания (des), 1 для данных (data)
+        size: размер фрагмента
+        unit: 'p' -- size абзацев, 'b' -- не меньше size байт (обрезается по слову)
+
+    Returns:
+        str: текст фрагмента
+    """
+    if unit == "p":
+        return "\n\n".join(
+            fragment_paragraph(paragraphs, i, shift, part) for part in range(size)
+        )
+
+    # Абзацы lipsum размечены концевыми % (иногда приписанными к слову),
+    # при сборке по словам они не нужны
+    words = []
+    length = 0
+    part = 0
+    while length < size:
+        for word in fragment_paragraph(paragraphs, i, shift, part).split():
+            word = word.rstrip("%")
+            if not word:
+                continue
+            words.append(word)
+            length += len(word.encode("utf-8")) + 1
+            if length >= size:
+                break
+        part += 1
+    lines = [
+        " ".join(words[k : k + WORDS_PER_LINE])
+        for k in range(0, len(words), WORDS_PER_LINE)
+    ]
+    return "\n".join(lines)
+
+
+def lipsum_range(first, count):
+    """
+    Возвращает аргумент \\lipsum для count абзацев, начиная с first: '3' или '3-5'.
+
+    Args:
+        first: номер первого абзаца lipsum
+        count: количество абзацев
+
+    Returns:
+        str: аргумент команды \\lipsum
+    """
+    if count == 1:
+        return f"{first}"
+    return f"{first}-{first + count - 1}"
+
+
+def shard_number(i, num_blocks, shards):
+    """
+    Возвращает номер файла-шарда (1..shards) для тега с номером i.
+
+    Теги распределяются по шардам непрерывными диапазонами, поэтому
+    каждый шард содержит не более ceil(num_blocks / shards) тегов.
+
+    Args:
+        i: номер тега (1..num_blocks)
+        num_blocks: общее количество тегов
+        shards: количество шардов
+
+    Returns:
+        int: номер шарда
+    """
+    return (i - 1) * shards // num_blocks + 1
+
+
+def shard_file_names(prefix, shards):
+    """
+    Возвращает имена файлов с фрагментами: des.tex или des_1.tex ... des_K.tex.
+
+    Args:
+        prefix: префикс имени ('des' или 'data')
+        shards: количество шардов или None
+
+    Returns:
+        list: имена файлов
+    """
+    if shards is None:
+        return [f"{prefix}.tex"]
+    return [f"{prefix}_{j}.tex" for j in range(1, shards + 1)]
 
 
 def copy_required_images(src_dir, dst_dir, num_images):
@@ -48,7 +429,29 @@ def copy_required_images(src_dir, dst_dir, num_images):
 
 
 def generate_modular_tex(
-    images_dir, output_dir, num_blocks, output_tex, inner, last_tag
+    images_dir,
+    output_dir,
+    num_blocks,
+    output_tex,
+    inner,
+    last_tag,
+    index=False,
+    shards=None,
+    lua=None,
+    precatch=False,
+    reuse=1,
+    docstrip=False,
+    access_pattern="sequential",
+    seed=0,
+    fragment_size="1p",
+    size_distribution="fixed",
+    fragments_per_block=1,
+    corpus="lipsum",
+    corpus_seed=0,
+    content="text",
+    nesting_depth=0,
+    ablations=(),
+    cross_refs=False,
 ):
     """
     Генерирует модульную версию LaTeX-документа с catchfilebetweentags.
@@ -60,9 +463,37 @@ def generate_modular_tex(
         output_tex: путь к выходному .tex файлу
         inner: если True, вставляет непосредственно текст вместо команды \\lipsum
         last_tag: если True, все блоки используют последний тег (худший случай для catchfilebetweentags)
+        index: если True, файлы с тегами читаются один раз в \\begin{document} в индекс,
+            а \\des и \\data становятся поиском по имени макроса вместо \\ExecuteMetaData
+        shards: если задано, фрагменты разбиваются по номеру тега на shards файлов
+            des_1.tex ... des_K.tex (и так же data), и каждый поиск сканирует только один шард
+        lua: хранилище фрагментов на стороне Lua ('table' или 'seek'), только для lualatex
+        precatch: если True, каждый используемый тег один раз ловится \\CatchFileBetweenTags
+            в макрос сразу после \\begin{document}, а \\des и \\data используют эти макросы
+        reuse: сколько раз каждый фрагмент используется в документе (блоков будет num_blocks * reuse)
+        docstrip: если True, рядом пишется драйвер extract.ins, который до компиляции
+            извлекает каждый тег в файл des-<тег>.tex/data-<тег>.tex, а \\des и \\data их \\input-ят
+        access_pattern: порядок обращения блоков к тегам (см. ACCESS_PATTERNS);
+            last_tag равносилен 'last'
+        seed: зерно для порядков random и zipf (и для случайных размеров фрагментов)
+        fragment_size: средний размер фрагмента: '<число>p' абзацев или '<число>b' байт
+            (байты только вместе с inner)
+        size_distribution: распределение размеров фрагментов (см. SIZE_DISTRIBUTIONS)
+        fragments_per_block: сколько пар des/data выводит каждый блок;
+            тегов в файлах будет num_blocks * fragments_per_block
+        corpus: источник текста фрагментов ('lipsum' или 'synthetic', только вместе с inner)
+        corpus_seed: зерно синтетического корпуса
+        content: режим содержимого фрагментов ('text', 'math', 'cyrillic', 'mixed');
+            режимы, кроме 'text', используют синтетический корпус и добавляют пакеты в преамбулу
+        nesting_depth: глубина вложенности; каждый фрагмент i вызывает \\ExecuteMetaData
+            для подфрагмента Sub1x<i> из shared.tex, тот -- для Sub2x<i> и так далее до глубины D
+        ablations: отключаемые компоненты блока (см. ABLATIONS в ablation.py)
+        cross_refs: добавить оглавление и перекрестные ссылки между блоками
+            (документу нужно несколько проходов)
 
     Returns:
         tuple: Возвращаем пути до файлов: output_tex, des_path, data_path
+            (при shards — списки путей к шардам)
     """
     # Определяем путь к выходному .tex файлу
     if output_tex is None:
@@ -79,68 +510,191 @@ def generate_modular_tex(
         print("Не удалось скопировать изображения. Завершение работы.")
         sys.exit(1)
 
-    # Генерируем des.tex
-    des_content = ""
-    for i in range(1, num_blocks + 1):
+    if fragments_per_block < 1:
+        raise ValueError(
+            f"Количество фрагментов на блок должно быть >= 1, получено: {fragments_per_block}"
+        )
+
+    # Количество тегов в каждом из файлов des и data
+    num_tags = num_blocks * fragments_per_block
+
+    size, unit = parse_fragment_size(fragment_size)
+    if unit == "b" and not inner:
+        raise ValueError("Размер фрагмента в байтах поддерживается только вместе с inner")
+    sizes = fragment_sizes(num_tags, size, size_distribution, seed)
+
+    if (corpus != "lipsum" or content != "text") and not inner:
+        raise ValueError("Синтетический корпус поддерживается только вместе с inner")
+    paragraphs = content_corpus(corpus, corpus_seed, content)
+
+    if shards is not None and not 1 <= shards <= num_tags:
+        raise ValueError(
+            f"Количество шардов должно быть от 1 до {num_tags}, получено: {shards}"
+        )
+
+    if lua is not None and (index or shards is not None):
+        raise ValueError("Хранилище Lua несовместимо с index и shards")
+
+    if precatch and (index or shards is not None or lua is not None):
+        raise ValueError("precatch несовместимо с index, shards и lua")
+
+    if docstrip and (index or shards is not None or lua is not None or precatch):
+        raise ValueError("docstrip несовместимо с index, shards, lua и precatch")
+
+    if reuse < 1:
+        raise ValueError(f"Коэффициент повторного использования должен быть >= 1, получено: {reuse}")
+
+    if nesting_depth < 0:
+        raise ValueError(f"Глубина вложенности должна быть >= 0, получено: {nesting_depth}")
+
+    if nesting_depth and (index or lua is not None or precatch or docstrip):
+        raise ValueError("Вложенные фрагменты несовместимы с index, lua, precatch и docstrip")
+
+    if last_tag:
+        if access_pattern not in ("sequential", "last"):
+            raise ValueError("last_tag несовместимо с access_pattern, отличным от 'last'")
+        access_pattern = "last"
+
+    # Номера тегов для каждого блока и множество реально используемых тегов
+    block_tags = access_sequence(access_pattern, num_tags, num_tags * reuse, seed)
+    used_tags = sorted(set(block_tags))
+
+    des_names = shard_file_names("des", shards)
+    data_names = shard_file_names("data", shards)
+
+    def nested_ref(level, i):
+        # Вызов подфрагмента следующего уровня (пусто, если глубина исчерпана)
+        if level > nesting_depth:
+            return ""
+        return f"\\ExecuteMetaData[shared.tex]{{Sub{level}x{i}}}\n"
+
+    # Генерируем des.tex (или шарды des_1.tex ... des_K.tex)
+    des_contents = [""] * len(des_names)
+    for i in range(1, num_tags + 1):
         lipsum_idx = (i % 5) + 1
+        shard_idx = 0 if shards is None else shard_number(i, num_tags, shards) - 1
         if inner:
-            # Вставляем непосредственно текст абзаца
-            paragraph_idx = (lipsum_idx - 1) % len(paragraphs)
-            des_content += f"""%<*Des{i}>
-{paragraphs[paragraph_idx]}
-%</Des{i}>
+            # Вставляем непосредственно текст абзаца (или нескольких)
+            des_contents[shard_idx] += f"""%<*Des{i}>
+{fragment_text(paragraphs, i, 0, sizes[i - 1], unit)}
+{nested_ref(1, i)}%</Des{i}>
 
 """
         else:
             # Используем команду \lipsum
-            des_content += f"""%<*Des{i}>
-\\lipsum[{lipsum_idx}]
-%</Des{i}>
+            des_contents[shard_idx] += f"""%<*Des{i}>
+\\lipsum[{lipsum_range(lipsum_idx, sizes[i - 1])}]
+{nested_ref(1, i)}%</Des{i}>
 
 """
 
-    des_path = os.path.join(output_dir, "des.tex")
-    with open(des_path, "w", encoding="utf-8") as f:
-        f.write(des_content)
+    des_paths = [os.path.join(output_dir, name) for name in des_names]
+    for des_path, des_content in zip(des_paths, des_contents):
+        with open(des_path, "w", encoding="utf-8") as f:
+            f.write(des_content)
 
-    # Генерируем data.tex
-    data_content = ""
-    for i in range(1, num_blocks + 1):
+    # Генерируем data.tex (или шарды data_1.tex ... data_K.tex)
+    data_contents = [""] * len(data_names)
+    for i in range(1, num_tags + 1):
         lipsum_idx = (i % 5) + 2  # Используем следующий параграф
+        shard_idx = 0 if shards is None else shard_number(i, num_tags, shards) - 1
         if inner:
-            # Вставляем непосредственно текст следующего абзаца
-            paragraph_idx = (lipsum_idx - 1) % len(paragraphs)
-            data_content += f"""%<*Data{i}>
-{paragraphs[paragraph_idx]}
-%</Data{i}>
+            # Вставляем непосредственно текст следующего абзаца (или нескольких)
+            data_contents[shard_idx] += f"""%<*Data{i}>
+{fragment_text(paragraphs, i, 1, sizes[i - 1], unit)}
+{nested_ref(1, i)}%</Data{i}>
 
 """
         else:
             # Используем команду \lipsum
-            data_content += f"""%<*Data{i}>
-\\lipsum[{lipsum_idx}]
-%</Data{i}>
+            data_contents[shard_idx] += f"""%<*Data{i}>
+\\lipsum[{lipsum_range(lipsum_idx, sizes[i - 1])}]
+{nested_ref(1, i)}%</Data{i}>
 
 """
 
-    data_path = os.path.join(output_dir, "data.tex")
-    with open(data_path, "w", encoding="utf-8") as f:
-        f.write(data_content)
+    data_paths = [os.path.join(output_dir, name) for name in data_names]
+    for data_path, data_content in zip(data_paths, data_contents):
+        with open(data_path, "w", encoding="utf-8") as f:
+            f.write(data_content)
+
+    # Генерируем shared.tex с подфрагментами: Sub<L>x<i> вызывает Sub<L+1>x<i>
+    if nesting_depth:
+        shared_content = ""
+        for level in range(1, nesting_depth + 1):
+            for i in range(1, num_tags + 1):
+                if inner:
+                    text = fragment_paragraph(paragraphs, i, 1 + level)
+                else:
+                    text = f"\\lipsum[{(i + level) % 5 + 1}]"
+                shared_content += f"""%<*Sub{level}x{i}>
+{text}
+{nested_ref(level + 1, i)}%</Sub{level}x{i}>
+
+"""
+        with open(os.path.join(output_dir, "shared.tex"), "w", encoding="utf-8") as f:
+            f.write(shared_content)
 
     # Генерируем основной LaTeX файл
     tex_content = r"""\documentclass[a4paper]{report}
-\usepackage{graphicx}
-\usepackage{geometry}
-\usepackage{float}
-\usepackage[language=english]{lipsum}
-\usepackage{etoolbox}
-\usepackage{l3benchmark}
-\usepackage{catchfilebetweentags}
-
-\newcommand{\fig}[1]{\begin{figure}[H]\includegraphics{#1}\end{figure}}
+"""
+    tex_content += package_preamble(ablations)
+    tex_content += CONTENT_PREAMBLES[content]
+    if lua is not None:
+        tex_content += LUA_PREAMBLES[lua] + "\n" + LUA_COMMANDS
+        if lua == "seek":
+            write_offset_index(
+                os.path.join(output_dir, "fragments_index.lua"),
+                [("des", des_names[0], des_contents[0]), ("data", data_names[0], data_contents[0])],
+            )
+    elif index:
+        # Однократное чтение файлов с тегами %<*Tag>/%</Tag> в индекс
+        tex_content += INDEX_PREAMBLE
+        tex_content += "\\ExplSyntaxOn\n\\AtBeginDocument\n  {\n"
+        for name in des_names:
+            tex_content += f"    \\frag_index_file:nn {{ des }} {{ {name} }}\n"
+        for name in data_names:
+            tex_content += f"    \\frag_index_file:nn {{ data }} {{ {name} }}\n"
+        tex_content += "  }\n\\ExplSyntaxOff\n"
+    elif docstrip:
+        # Файлы des-<тег>.tex и data-<тег>.tex создаются драйвером extract.ins
+        write_docstrip_driver(
+            os.path.join(output_dir, "extract.ins"),
+            [
+                (des_names[0], "des", [f"Des{tag}" for tag in used_tags]),
+                (data_names[0], "data", [f"Data{tag}" for tag in used_tags]),
+            ],
+        )
+        tex_content += r"""
+\newcommand{\des}[1]{\input{des-#1}}
+\newcommand{\data}[1]{\input{data-#1}}
+"""
+    elif precatch:
+        # Фрагменты ловятся в макросы des@<тег> и data@<тег> один раз
+        tex_content += r"""\usepackage{catchfilebetweentags}
+
+\newcommand{\precatch}[2]{\expandafter\CatchFileBetweenTags\csname #1@#2\endcsname{#1.tex}{#2}}
+\newcommand{\des}[1]{\csname des@#1\endcsname}
+\newcommand{\data}[1]{\csname data@#1\endcsname}
+"""
+    elif shards is not None:
+        # Первый аргумент \des и \data -- номер шарда
+        tex_content += r"""\usepackage{catchfilebetweentags}
+
+\newcommand{\des}[2]{\ExecuteMetaData[des_#1.tex]{#2}}
+\newcommand{\data}[2]{\ExecuteMetaData[data_#1.tex]{#2}}
+"""
+    else:
+        tex_content += r"""\usepackage{catchfilebetweentags}
+
 \newcommand{\des}[1]{\ExecuteMetaData[des.tex]{#1}}
 \newcommand{\data}[1]{\ExecuteMetaData[data.tex]{#1}}
-\newcommand{\merge}[4]{\par\textbf{#1}\par\fig{#2}\des{#3}\par\data{#4}\par}
+"""
+    if shards is not None and not index:
+        merge_def = r"\newcommand{\merge}[5]{\par\textbf{#1}\par\fig{#2}\des{#3}{#4}\par\data{#3}{#5}\par}"
+    else:
+        merge_def = r"\newcommand{\merge}[4]{\par\textbf{#1}\par\fig{#2}\des{#3}\par\data{#4}\par}"
+    tex_content += "\n" + fig_command(ablations) + merge_command(merge_def, ablations, cross_refs) + r"""
 % See
 % https://tex.stackexchange.com/questions/505770/how-to-measure-the-compilation-time-of-a-document
 \ExplSyntaxOn
@@ -154,19 +708,36 @@ def generate_modular_tex(
 
 """
 
-    # Добавляем блоки
-    for i in range(1, num_blocks + 1):
-        block_num = f"Block {i}"
+    if precatch:
+        # Ловим каждый используемый тег ровно один раз
+        for tag in used_tags:
+            tex_content += f"\\precatch{{des}}{{Des{tag}}}\\precatch{{data}}{{Data{tag}}}\n"
+
+    # Добавляем блоки (при reuse > 1 изображения используются по кругу,
+    # номер тега задается порядком обращения access_pattern)
+    sharded = shards is not None and not index
+    for block in range(1, num_blocks * reuse + 1):
+        i = (block - 1) % num_blocks + 1
+        block_num = f"Block {block}"
         image_name = f"test-image-{i}.png"
         image_path = f"images/{image_name}"
-        # Определяем номер тега в зависимости от режима
-        if last_tag:
-            # Используем последний тег для всех блоков (худший случай)
-            tag_num = f"{num_blocks}"
+        refs = block_tags[(block - 1) * fragments_per_block : block * fragments_per_block]
+        tag_num = f"{refs[0]}"
+
+        if sharded:
+            # Направляем поиск в шард, содержащий тег
+            shard = shard_number(int(tag_num), num_tags, shards)
+            tex_content += f"\n\\merge{{{block_num}}}{{{image_path}}}{{{shard}}}{{Des{tag_num}}}{{Data{tag_num}}}\n"
         else:
-            tag_num = f"{i}"
+            tex_content += f"\n\\merge{{{block_num}}}{{{image_path}}}{{Des{tag_num}}}{{Data{tag_num}}}\n"
 
-        tex_content += f"\n\\merge{{{block_num}}}{{{image_path}}}{{Des{tag_num}}}{{Data{tag_num}}}\n"
+        # Остальные фрагменты блока выводятся после \merge
+        for tag in refs[1:]:
+            if sharded:
+                shard = shard_number(tag, num_tags, shards)
+                tex_content += f"\\des{{{shard}}}{{Des{tag}}}\\par\\data{{{shard}}}{{Data{tag}}}\\par\n"
+            else:
+                tex_content += f"\\des{{Des{tag}}}\\par\\data{{Data{tag}}}\\par\n"
 
     tex_content += r"""
 \end{document}
@@ -180,7 +751,9 @@ def generate_modular_tex(
         print(f"Ошибка при сохранении файла {output_tex}: {e}")
         sys.exit(1)
 
-    return output_tex, des_path, data_path
+    if shards is None:
+        return output_tex, des_paths[0], data_paths[0]
+    return output_tex, des_paths, data_paths
 
 
 def main():
@@ -193,6 +766,19 @@ def main():
   %(prog)s -i images -n 30 -t my_document.tex
   %(prog)s -i images -n 50 --inner
   %(prog)s -i images -n 50 --inner --last-tag
+  %(prog)s -i images -n 50 --inner --index
+  %(prog)s -i images -n 1000 --inner --shards 10
+  %(prog)s -i images -n 1000 --inner --lua table
+  %(prog)s -i images -n 1000 --inner --lua seek
+  %(prog)s -i images -n 200 --inner --precatch --reuse 5
+  %(prog)s -i images -n 200 --inner --docstrip
+  %(prog)s -i images -n 500 --inner --access-pattern zipf --seed 42
+  %(prog)s -i images -n 100 --inner --fragment-size 4000b --size-distribution exp
+  %(prog)s -i images -n 100 --inner --fragment-size 3p --fragments-per-block 5
+  %(prog)s -i images -n 2000 --inner --corpus synthetic --corpus-seed 7
+  %(prog)s -i images -n 500 --inner --content mixed
+  %(prog)s -i images -n 200 --inner --nesting-depth 3
+  %(prog)s -i images -n 500 --inner --ablate noimage,nofloat,nolipsum,noheader
         """,
     )
 
@@ -247,13 +833,208 @@ def main():
         help="использовать последний тег для всех блоков (худший случай для catchfilebetweentags)",
     )
 
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=None,
+        help="разбить фрагменты по номеру тега на K файлов des_1.tex ... des_K.tex (и data) (по умолчанию: один файл)",
+    )
+
+    parser.add_argument(
+        "--lua",
+        type=str,
+        choices=["table", "seek"],
+        default=None,
+        help="хранить фрагменты на стороне Lua: таблица или seek по индексу смещений (только lualatex)",
+    )
+
+    parser.add_argument(
+        "--precatch",
+        action="store_true",
+        help="ловить каждый тег один раз через \\CatchFileBetweenTags в макрос вместо \\ExecuteMetaData при каждом использовании",
+    )
+
+    parser.add_argument(
+        "-r",
+        "--reuse",
+        type=int,
+        default=1,
+        help="сколько раз используется каждый фрагмент (блоков будет N * R) (по умолчанию: 1)",
+    )
+
+    parser.add_argument(
+        "--docstrip",
+        action="store_true",
+        help="создать драйвер extract.ins для извлечения тегов docstrip-ом в отдельные файлы до компиляции",
+    )
+
+    parser.add_argument(
+        "--access-pattern",
+        type=str,
+        choices=ACCESS_PATTERNS,
+        default="sequential",
+        help="порядок обращения блоков к тегам (sequential, reverse, random, zipf, first, middle, last) "
+        "(по умолчанию: sequential)",
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="зерно генератора для порядков random и zipf (по умолчанию: 0)",
+    )
+
+    parser.add_argument(
+        "--fragment-size",
+        type=str,
+        default="1p",
+        help="средний размер фрагмента: <число>p абзацев или <число>b байт (байты только с --inner) "
+        "(по умолчанию: 1p)",
+    )
+
+    parser.add_argument(
+        "--size-distribution",
+        type=str,
+        choices=SIZE_DISTRIBUTIONS,
+        default="fixed",
+        help="распределение размеров фрагментов (fixed, uniform, exp) (по умолчанию: fixed)",
+    )
+
+    parser.add_argument(
+        "--fragments-per-block",
+        type=int,
+        default=1,
+        help="сколько пар des/data выводит каждый блок; тегов будет N * F (по умолчанию: 1)",
+    )
+
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        choices=CORPUS_NAMES,
+        default="lipsum",
+        help="источник текста фрагментов: пять абзацев lipsum по кругу или синтетический "
+        "корпус уникальных абзацев (только с --inner) (по умолчанию: lipsum)",
+    )
+
+    parser.add_argument(
+        "--corpus-seed",
+        type=int,
+        default=0,
+        help="зерно синтетического корпуса (по умолчанию: 0)",
+    )
+
+    parser.add_argument(
+        "--content",
+        type=str,
+        choices=CORPUS_MODES,
+        default="text",
+        help="содержимое фрагментов: text, math (формулы в тексте), cyrillic (русский текст), "
+        "mixed; все режимы, кроме text, используют синтетический корпус (только с --inner) (по умолчанию: text)",
+    )
+
+    parser.add_argument(
+        "--nesting-depth",
+        type=int,
+        default=0,
+        help="глубина вложенных вызовов \\ExecuteMetaData: каждый фрагмент вызывает цепочку "
+        "из D подфрагментов в shared.tex (по умолчанию: 0)",
+    )
+
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help="читать файлы с тегами один раз в \\begin{document} в индекс вместо \\ExecuteMetaData",
+    )
+
+    parser.add_argument(
+        "--ablate",
+        type=str,
+        default="",
+        help="отключаемые компоненты блока через запятую: "
+        + ", ".join(ABLATIONS)
+        + " (nolipsum только с --inner) (по умолчанию: ничего не отключать)",
+    )
+
+    parser.add_argument(
+        "--cross-refs",
+        action="store_true",
+        help="добавить \\tableofcontents, \\label и \\ref на предыдущий блок "
+        "(для многопроходной сборки)",
+    )
+
     args = parser.parse_args()
 
+    try:
+        args.ablate = parse_ablations(args.ablate)
+    except ValueError as e:
+        print(f"❌ Ошибка: {e}")
+        sys.exit(1)
+    if "nolipsum" in args.ablate and not args.inner:
+        print("❌ Ошибка: --ablate nolipsum требует --inner")
+        sys.exit(1)
+
     # Проверяем корректность количества блоков
     if args.num_blocks <= 0:
         print("❌ Ошибка: Количество блоков должно быть положительным числом")
         sys.exit(1)
 
+    if args.fragments_per_block < 1:
+        print("❌ Ошибка: Количество фрагментов на блок должно быть >= 1")
+        sys.exit(1)
+
+    try:
+        _, size_unit = parse_fragment_size(args.fragment_size)
+    except ValueError as e:
+        print(f"❌ Ошибка: {e}")
+        sys.exit(1)
+    if args.corpus != "lipsum" and not args.inner:
+        print("❌ Ошибка: --corpus synthetic требует --inner")
+        sys.exit(1)
+    if args.content != "text" and not args.inner:
+        print("❌ Ошибка: --content требует --inner")
+        sys.exit(1)
+    if size_unit == "b" and not args.inner:
+        print("❌ Ошибка: Размер фрагмента в байтах требует --inner")
+        sys.exit(1)
+
+    # Проверяем корректность количества шардов
+    num_tags = args.num_blocks * args.fragments_per_block
+    if args.shards is not None and not 1 <= args.shards <= num_tags:
+        print("❌ Ошибка: Количество шардов должно быть от 1 до количества тегов")
+        sys.exit(1)
+
+    if args.lua is not None and (args.index or args.shards is not None):
+        print("❌ Ошибка: --lua несовместимо с --index и --shards")
+        sys.exit(1)
+
+    if args.precatch and (args.index or args.shards is not None or args.lua is not None):
+        print("❌ Ошибка: --precatch несовместимо с --index, --shards и --lua")
+        sys.exit(1)
+
+    if args.docstrip and (
+        args.index or args.shards is not None or args.lua is not None or args.precatch
+    ):
+        print("❌ Ошибка: --docstrip несовместимо с --index, --shards, --lua и --precatch")
+        sys.exit(1)
+
+    if args.reuse < 1:
+        print("❌ Ошибка: Коэффициент повторного использования должен быть >= 1")
+        sys.exit(1)
+
+    if args.nesting_depth < 0:
+        print("❌ Ошибка: Глубина вложенности должна быть >= 0")
+        sys.exit(1)
+
+    if args.nesting_depth and (
+        args.index or args.lua is not None or args.precatch or args.docstrip
+    ):
+        print("❌ Ошибка: --nesting-depth несовместимо с --index, --lua, --precatch и --docstrip")
+        sys.exit(1)
+
+    if args.last_tag and args.access_pattern not in ("sequential", "last"):
+        print("❌ Ошибка: --last-tag несовместимо с --access-pattern, отличным от last")
+        sys.exit(1)
+
     # Проверяем существование директории с изображениями
     if not os.path.exists(args.images_dir):
         print(
@@ -283,6 +1064,37 @@ def main():
             print(f"  Оптимизация: все блоки используют последний тег (худший случай)")
     else:
         print(f"  Режим: обычный (команда \\lipsum)")
+    if args.index:
+        print(f"  Доступ к фрагментам: однократная индексация файлов с тегами")
+    if args.shards is not None:
+        print(f"  Шардов: {args.shards}")
+    if args.lua is not None:
+        print(f"  Доступ к фрагментам: Lua ({args.lua}), требуется lualatex")
+    if args.precatch:
+        print(f"  Доступ к фрагментам: \\CatchFileBetweenTags один раз на тег")
+    if args.docstrip:
+        print(
+            f"  Доступ к фрагментам: извлечение docstrip (extract.ins) и \\input "
+            f"(пакетами по {DOCSTRIP_MAX_OUTFILES} файлов, исходники читаются на каждый пакет)"
+        )
+    if args.reuse > 1:
+        print(f"  Повторное использование фрагментов: {args.reuse} раз(а)")
+    if args.access_pattern != "sequential":
+        print(f"  Порядок обращения к тегам: {args.access_pattern} (seed: {args.seed})")
+    if args.fragment_size != "1p" or args.size_distribution != "fixed":
+        print(f"  Размер фрагментов: {args.fragment_size} ({args.size_distribution})")
+    if args.corpus != "lipsum":
+        print(f"  Корпус: {args.corpus} (seed: {args.corpus_seed})")
+    if args.content != "text":
+        print(f"  Содержимое фрагментов: {args.content}")
+    if args.nesting_depth:
+        print(f"  Глубина вложенности фрагментов: {args.nesting_depth}")
+    if args.ablate:
+        print(f"  Отключенные компоненты: {', '.join(args.ablate)}")
+    if args.cross_refs:
+        print(f"  Перекрестные ссылки: оглавление, \\label и \\ref")
+    if args.fragments_per_block > 1:
+        print(f"  Фрагментов на блок: {args.fragments_per_block} (тегов: {num_tags})")
     # Генерируем документ
     main_tex_path, des_tex_path, data_tex_path = generate_modular_tex(
         images_dir=args.images_dir,
@@ -291,14 +1103,35 @@ def main():
         output_tex=args.output_tex,
         inner=args.inner,
         last_tag=args.last_tag,
+        index=args.index,
+        shards=args.shards,
+        lua=args.lua,
+        precatch=args.precatch,
+        reuse=args.reuse,
+        docstrip=args.docstrip,
+        access_pattern=args.access_pattern,
+        seed=args.seed,
+        fragment_size=args.fragment_size,
+        size_distribution=args.size_distribution,
+        fragments_per_block=args.fragments_per_block,
+        corpus=args.corpus,
+        corpus_seed=args.corpus_seed,
+        content=args.content,
+        nesting_depth=args.nesting_depth,
+        ablations=args.ablate,
+        cross_refs=args.cross_refs,
     )
 
+    if args.shards is not None:
+        des_tex_path = ", ".join(des_tex_path)
+        data_tex_path = ", ".join(data_tex_path)
+
     print(f"\nМодульная версия успешно сгенерирована!")
     print(f"  Основной файл: {main_tex_path}")
     print(f"  Файл описаний: {des_tex_path}")
     print(f"  Файл данных: {data_tex_path}")
     print(f"  Изображения скопированы в: {os.path.join(args.output_dir, 'images')}")
-    print(f"  Всего блоков: {args.num_blocks}")
+    print(f"  Всего блоков: {args.num_blocks * args.reuse}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,336 @@
+# generate_storage_version.py
+import os
+import argparse
+import sys
+from corpus import CORPUS_NAMES, load_corpus, fragment_paragraph
+from ablation import ABLATIONS, parse_ablations, package_preamble, fig_command, merge_command
+from generate_macro_version import copy_required_images
+
+# Определения \fragdef/\fraguse для каждого хранилища фрагментов.
+# Файлы des.tex и data.tex одинаковы для всех хранилищ, различается только преамбула.
+STORAGE_BACKENDS = {
+    "prop": r"""\ExplSyntaxOn
+\prop_new:N \g_frag_store_prop
+\cs_new_protected:Npn \fragdef #1#2 { \prop_gput:Nnn \g_frag_store_prop {#1} {#2} }
+\cs_new_protected:Npn \fraguse #1 { \prop_item:Nn \g_frag_store_prop {#1} }
+\ExplSyntaxOff
+""",
+    "tlconst": r"""\ExplSyntaxOn
+\cs_new_protected:Npn \fragdef #1#2 { \tl_const:cn { c_frag_ #1 _tl } {#2} }
+\cs_new_protected:Npn \fraguse #1 { \use:c { c_frag_ #1 _tl } }
+\ExplSyntaxOff
+""",
+    "pgfkeys": r"""\usepackage{pgfkeys}
+\newcommand{\fragdef}[2]{\pgfkeyssetvalue{/frag/#1}{#2}}
+\newcommand{\fraguse}[1]{\pgfkeysvalueof{/frag/#1}}
+""",
+    "prop_debug": r"""\ExplSyntaxOn
+\prop_new:N \g_frag_store_prop
+\prop_new:N \g_frag_unused_prop
+\msg_new:nnn { frag } { unused } { Fragment~'#1'~was~never~used. }
+\cs_new_protected:Npn \fragdef #1#2
+  {
+    \prop_gput:Nnn \g_frag_store_prop {#1} {#2}
+    \prop_gput:Nnn \g_frag_unused_prop {#1} { }
+  }
+\cs_new_protected:Npn \fraguse #1
+  {
+    \prop_gremove:Nn \g_frag_unused_prop {#1}
+    \prop_item:Nn \g_frag_store_prop {#1}
+  }
+\cs_new_protected:Npn \frag_check_unused:
+  {
+    \prop_map_inline:Nn \g_frag_unused_prop
+      { \msg_warning:nnn { frag } { unused } {##1} }
+  }
+\AtEndDocument { \frag_check_unused: }
+\ExplSyntaxOff
+""",
+}
+
+
+def generate_storage_tex(
+    images_dir,
+    output_dir,
+    num_blocks,
+    output_tex,
+    backend,
+    corpus="lipsum",
+    corpus_seed=0,
+    ablations=(),
+    cross_refs=False,
+):
+    """
+    Генерирует версию LaTeX-документа, в которой фрагменты хранятся в выбранном хранилище.
+
+    Args:
+        images_dir: путь к папке с изображениями
+        output_dir: выходная директория
+        num_blocks: количество блоков (и изображений)
+        output_tex: путь к выходному .tex файлу
+        backend: хранилище фрагментов ('prop', 'tlconst', 'pgfkeys', 'prop_debug')
+        corpus: источник текста фрагментов ('lipsum' или 'synthetic')
+        corpus_seed: зерно синтетического корпуса
+        ablations: отключаемые компоненты блока (см. ABLATIONS в ablation.py)
+        cross_refs: добавить оглавление и перекрестные ссылки между блоками
+            (документу нужно несколько проходов)
+
+    Returns:
+        tuple: Возвращаем пути до файлов: output_tex, des_path, data_path
+    """
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Неизвестное хранилище фрагментов: {backend}")
+
+    # Определяем путь к выходному .tex файлу
+    if output_tex is None:
+        output_tex = os.path.join(output_dir, "main.tex")
+
+    # Проверяем и создаем структуру папок
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Создаем подпапку для изображений в выходной директории
+    images_dest = os.path.join(output_dir, "images")
+
+    # Копируем только необходимое количество изображений
+    if not copy_required_images(images_dir, images_dest, num_blocks):
+        print("Не удалось скопировать изображения. Завершение работы.")
+        sys.exit(1)
+
+    paragraphs = load_corpus(corpus, corpus_seed)
+
+    # Генерируем des.tex (те же абзацы, что и в macrodef)
+    des_content = ""
+    for i in range(1, num_blocks + 1):
+        des_content += f"""\\fragdef{{desDes{i}}}{{%
+{fragment_paragraph(paragraphs, i, 0)}%
+}}
+
+"""
+
+    des_path = os.path.join(output_dir, "des.tex")
+    with open(des_path, "w", encoding="utf-8") as f:
+        f.write(des_content)
+
+    # Генерируем data.tex
+    data_content = ""
+    for i in range(1, num_blocks + 1):
+        data_content += f"""\\fragdef{{dataData{i}}}{{%
+{fragment_paragraph(paragraphs, i, 1)}%
+}}
+
+"""
+
+    data_path = os.path.join(output_dir, "data.tex")
+    with open(data_path, "w", encoding="utf-8") as f:
+        f.write(data_content)
+
+    # Генерируем основной LaTeX файл
+    tex_content = r"""\documentclass[a4paper]{report}
+"""
+    tex_content += package_preamble(ablations) + "\n"
+    tex_content += STORAGE_BACKENDS[backend]
+    tex_content += "\n" + fig_command(ablations) + merge_command(
+        r"\newcommand{\merge}[4]{\par\textbf{#1}\par\fig{#2}\fraguse{#3}\par\fraguse{#4}\par}", ablations, cross_refs
+    )
+    tex_content += r"""
+% See
+% https://tex.stackexchange.com/questions/505770/how-to-measure-the-compilation-time-of-a-document
+\ExplSyntaxOn
+\AfterEndDocument { \benchmark_toc: }
+\use:n
+  {
+    \benchmark_tic:
+  }
+\ExplSyntaxOff
+\begin{document}
+% Загружаем все фрагменты в хранилище
+\input{des.tex}
+\input{data.tex}
+"""
+
+    # Добавляем блоки
+    for i in range(1, num_blocks + 1):
+        block_num = f"Block {i}"
+        image_name = f"test-image-{i}.png"
+        image_path = f"images/{image_name}"
+        tag_num = f"{i}"
+
+        tex_content += f"\n\\merge{{{block_num}}}{{{image_path}}}{{desDes{tag_num}}}{{dataData{tag_num}}}\n"
+
+    tex_content += r"""
+\end{document}
+"""
+
+    # Сохраняем основной файл
+    try:
+        with open(output_tex, "w", encoding="utf-8") as f:
+            f.write(tex_content)
+    except Exception as e:
+        print(f"Ошибка при сохранении файла {output_tex}: {e}")
+        sys.exit(1)
+
+    return output_tex, des_path, data_path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Генерация версии LaTeX-документа с хранилищем фрагментов (expl3 prop, \\tl_const:cn, pgfkeys)",
+        epilog="""
+Примеры использования:
+  %(prog)s --images-dir images --num-blocks 50 --backend prop
+  %(prog)s -i images -n 100 -o tlconst_version --backend tlconst
+  %(prog)s -i images -n 30 --backend pgfkeys
+  %(prog)s -i images -n 50 --backend prop_debug
+  %(prog)s -i images -n 2000 --backend prop --corpus synthetic
+  %(prog)s -i images -n 500 --backend prop --ablate nofloat
+        """,
+    )
+
+    parser.add_argument(
+        "-i",
+        "--images-dir",
+        type=str,
+        default="images",
+        help="путь к папке с сгенерированными изображениями (по умолчанию: images)",
+    )
+
+    parser.add_argument(
+        "-n",
+        "--num-blocks",
+        type=int,
+        default=50,
+        help="количество блоков/изображений для использования (по умолчанию: 50)",
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=str,
+        default=None,
+        help="выходная директория (по умолчанию: имя хранилища)",
+    )
+
+    parser.add_argument(
+        "-t",
+        "--output-tex",
+        type=str,
+        default=None,
+        help="путь к выходному .tex файлу (по умолчанию: <output_dir>/main.tex)",
+    )
+
+    parser.add_argument(
+        "-y",
+        "--yes",
+        action="store_true",
+        help="автоматически подтверждать все запросы",
+    )
+
+    parser.add_argument(
+        "-b",
+        "--backend",
+        type=str,
+        choices=list(STORAGE_BACKENDS),
+        default="prop",
+        help="хранилище фрагментов (prop, tlconst, pgfkeys, prop_debug) (по умолчанию: prop)",
+    )
+
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        choices=CORPUS_NAMES,
+        default="lipsum",
+        help="источник текста фрагментов: пять абзацев lipsum по кругу или синтетический "
+        "корпус уникальных абзацев (по умолчанию: lipsum)",
+    )
+
+    parser.add_argument(
+        "--corpus-seed",
+        type=int,
+        default=0,
+        help="зерно синтетического корпуса (по умолчанию: 0)",
+    )
+
+    parser.add_argument(
+        "--ablate",
+        type=str,
+        default="",
+        help="отключаемые компоненты блока через запятую: "
+        + ", ".join(ABLATIONS)
+        + " (по умолчанию: ничего не отключать)",
+    )
+
+    parser.add_argument(
+        "--cross-refs",
+        action="store_true",
+        help="добавить \\tableofcontents, \\label и \\ref на предыдущий блок "
+        "(для многопроходной сборки)",
+    )
+
+    args = parser.parse_args()
+
+    try:
+        args.ablate = parse_ablations(args.ablate)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+
+    if args.output_dir is None:
+        args.output_dir = args.backend
+
+    # Проверяем корректность количества блоков
+    if args.num_blocks <= 0:
+        print("Ошибка: Количество блоков должно быть положительным числом")
+        sys.exit(1)
+
+    # Проверяем существование директории с изображениями
+    if not os.path.exists(args.images_dir):
+        print(f"Ошибка: Директория с изображениями '{args.images_dir}' не существует")
+        sys.exit(1)
+
+    # Проверяем, существует ли выходная директория и не пуста ли она
+    if os.path.exists(args.output_dir) and os.listdir(args.output_dir):
+        # Если флаг -y установлен, автоматически подтверждаем
+        if args.yes:
+            response = "y"
+        else:
+            response = input(
+                f"Директория '{args.output_dir}' не пуста. Перезаписать? [y/N]: "
+            )
+        if response.lower() != "y":
+            print("Отменено пользователем.")
+            sys.exit(0)
+
+    print(f"Генерация версии документа с хранилищем фрагментов:")
+    print(f"  Папка с изображениями: {args.images_dir}")
+    print(f"  Выходная директория: {args.output_dir}")
+    print(f"  Хранилище: {args.backend}")
+    if args.corpus != "lipsum":
+        print(f"  Корпус: {args.corpus} (seed: {args.corpus_seed})")
+    if args.ablate:
+        print(f"  Отключенные компоненты: {', '.join(args.ablate)}")
+    if args.cross_refs:
+        print(f"  Перекрестные ссылки: оглавление, \\label и \\ref")
+
+    # Генерируем документ
+    main_tex_path, des_tex_path, data_tex_path = generate_storage_tex(
+        images_dir=args.images_dir,
+        output_dir=args.output_dir,
+        num_blocks=args.num_blocks,
+        output_tex=args.output_tex,
+        backend=args.backend,
+        corpus=args.corpus,
+        corpus_seed=args.corpus_seed,
+        ablations=args.ablate,
+        cross_refs=args.cross_refs,
+    )
+
+    print(f"\nВерсия с хранилищем {args.backend} успешно сгенерирована!")
+    print(f"  Основной файл: {main_tex_path}")
+    print(f"  Файл описаний: {des_tex_path}")
+    print(f"  Файл данных: {data_tex_path}")
+    print(f"  Изображения скопированы в: {os.path.join(args.output_dir, 'images')}")
+    print(f"  Всего блоков: {args.num_blocks}")
+
+
+if __name__ == "__main__":
+    main()
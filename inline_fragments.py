@@ -0,0 +1,377 @@
+# inline_fragments.py
+import os
+import re
+import sys
+import time
+import hashlib
+import argparse
+from convert_tags import iter_lines, TAG_OPEN_RE, TAG_CLOSE_RE
+
+# \newcommand{\des}[1]{\ExecuteMetaData[des.tex]{#1}}
+FRAGMENT_COMMAND_RE = re.compile(
+    r"^\\newcommand\{\\(\w+)\}\[1\]\{\\ExecuteMetaData\[([^\]]+)\]\{#1\}\}\s*$"
+)
+
+# \newcommand{\merge}[4]{...}
+WRAPPER_COMMAND_RE = re.compile(r"^\\newcommand\{\\(\w+)\}\[(\d)\]\{(.*)\}\s*$")
+
+
+def read_tag_file(tag_file):
+    """
+    Читает файл с тегами %<*Tag>/%</Tag> в словарь.
+
+    Args:
+        tag_file: путь к файлу с тегами
+
+    Returns:
+        dict: тег -> тело фрагмента (строки с символами конца строки)
+    """
+    fragments = {}
+    open_tags = {}
+
+    for line in iter_lines(tag_file):
+        open_match = TAG_OPEN_RE.match(line)
+        if open_match:
+            open_tags[open_match.group(1).decode("utf-8")] = []
+            continue
+
+        close_match = TAG_CLOSE_RE.match(line)
+        if close_match:
+            tag = close_match.group(1).decode("utf-8")
+            body_lines = open_tags.pop(tag, None)
+            if body_lines is not None:
+                fragments[tag] = "".join(l + "\n" for l in body_lines)
+            continue
+
+        decoded = line.decode("utf-8")
+        for body_lines in open_tags.values():
+            body_lines.append(decoded)
+
+    return fragments
+
+
+def find_group_end(text, pos):
+    """
+    Находит конец группы {...}, начинающейся в позиции pos.
+
+    Args:
+        text: текст
+        pos: позиция открывающей фигурной скобки
+
+    Returns:
+        int: позиция после закрывающей скобки или -1, если группа не закрыта
+    """
+    depth = 0
+    i = pos
+    while i < len(text):
+        char = text[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return -1
+
+
+class FragmentInliner:
+    """
+    Подставляет тела фрагментов из файлов с тегами в основной файл до запуска TeX.
+
+    Основной файл разбирается на сегменты: обычный текст и ссылки (файл, тег).
+    При обновлении перечитываются только изменившиеся файлы, а заново
+    подставляются только фрагменты с изменившимся хешем.
+    """
+
+    def __init__(self, main_tex):
+        self.main_tex = main_tex
+        self.main_dir = os.path.dirname(os.path.abspath(main_tex))
+        self.segments = []
+        self.fragments = {}  # файл -> {тег: тело}
+        self.hashes = {}  # файл -> {тег: sha1 тела}
+        self.rendered = {}  # (файл, тег) -> подставляемый текст
+        self.mtimes = {}  # файл -> mtime при последнем чтении
+
+    def parse_main(self):
+        """Разбирает основной файл на сегменты текста и ссылок на фрагменты."""
+        with open(self.main_tex, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+
+        fragment_cmds = {}  # \des -> des.tex
+        wrappers = {}  # \merge -> (число аргументов, {номер аргумента: файл})
+        preamble = []
+        body_start = len(lines)
+
+        for idx, line in enumerate(lines):
+            if line.strip() == r"\begin{document}":
+                body_start = idx
+                break
+
+            if line.strip() == r"\usepackage{catchfilebetweentags}":
+                continue
+
+            cmd_match = FRAGMENT_COMMAND_RE.match(line)
+            if cmd_match:
+                name, tag_file = cmd_match.groups()
+                fragment_cmds[name] = os.path.join(self.main_dir, tag_file)
+                # Команда становится тождественной: тело подставлено заранее
+                preamble.append(f"\\newcommand{{\\{name}}}[1]{{#1}}\n")
+                continue
+
+            wrapper_match = WRAPPER_COMMAND_RE.match(line)
+            if wrapper_match:
+                name, nargs, definition = wrapper_match.groups()
+                routed = {}
+                for cmd, tag_file in fragment_cmds.items():
+                    for arg in re.findall(rf"\\{cmd}\{{#(\d)\}}", definition):
+                        routed[int(arg)] = tag_file
+                if routed:
+                    wrappers[name] = (int(nargs), routed)
+
+            preamble.append(line)
+
+        self.segments = ["".join(preamble)]
+        body = "".join(lines[body_start:])
+
+        names = ["ExecuteMetaData"] + list(fragment_cmds) + list(wrappers)
+        call_re = re.compile(r"\\(" + "|".join(map(re.escape, names)) + r")(?![A-Za-z@])")
+
+        pos = 0
+        for match in call_re.finditer(body):
+            if match.start() < pos:
+                continue
+            name = match.group(1)
+            cursor = match.end()
+
+            if name == "ExecuteMetaData":
+                file_match = re.match(r"\[([^\]]+)\]", body[cursor:])
+                if not file_match:
+                    continue
+                tag_file = os.path.join(self.main_dir, file_match.group(1))
+                nargs, routed = 1, {1: tag_file}
+                cursor += file_match.end()
+            elif name in fragment_cmds:
+                nargs, routed = 1, {1: fragment_cmds[name]}
+            else:
+                nargs, routed = wrappers[name]
+
+            # Разбираем аргументы вызова
+            args = []
+            for _ in range(nargs):
+                while cursor < len(body) and body[cursor] in " \t\n":
+                    cursor += 1
+                if cursor >= len(body) or body[cursor] != "{":
+                    break
+                end = find_group_end(body, cursor)
+                if end < 0:
+                    break
+                args.append((cursor, end))
+                cursor = end
+            if len(args) != nargs:
+                continue
+
+            self.segments.append(body[pos : match.start()])
+            if name == "ExecuteMetaData":
+                # Прямой вызов заменяется телом фрагмента целиком
+                start, end = args[0]
+                self.segments.append((routed[1], body[start + 1 : end - 1].strip()))
+            else:
+                self.segments.append(body[match.start() : match.end()])
+                prev = match.end()
+                for arg_num, (start, end) in enumerate(args, start=1):
+                    self.segments.append(body[prev:start])
+                    if arg_num in routed:
+                        tag = body[start + 1 : end - 1].strip()
+                        self.segments.append("{")
+                        self.segments.append((routed[arg_num], tag))
+                        self.segments.append("}")
+                    else:
+                        self.segments.append(body[start:end])
+                    prev = end
+            pos = cursor
+
+        self.segments.append(body[pos:])
+
+    def tag_files(self):
+        """Возвращает файлы с тегами, на которые есть ссылки в основном файле."""
+        files = []
+        for segment in self.segments:
+            if isinstance(segment, tuple) and segment[0] not in files:
+                files.append(segment[0])
+        return files
+
+    def load_tag_file(self, tag_file):
+        """
+        Перечитывает файл с тегами и обновляет только изменившиеся фрагменты.
+
+        Args:
+            tag_file: путь к файлу с тегами
+
+        Returns:
+            list: теги, тело которых изменилось
+        """
+        fragments = read_tag_file(tag_file)
+        old_hashes = self.hashes.get(tag_file, {})
+        new_hashes = {}
+        changed = []
+
+        for tag, body in fragments.items():
+            digest = hashlib.sha1(body.encode("utf-8")).hexdigest()
+            new_hashes[tag] = digest
+            if old_hashes.get(tag) != digest:
+                self.rendered[(tag_file, tag)] = "%\n" + body
+                changed.append(tag)
+
+        for tag in set(old_hashes) - set(new_hashes):
+            self.rendered.pop((tag_file, tag), None)
+            changed.append(tag)
+
+        self.fragments[tag_file] = fragments
+        self.hashes[tag_file] = new_hashes
+        return changed
+
+    def update(self):
+        """
+        Перечитывает изменившиеся с прошлого вызова файлы.
+
+        Returns:
+            list: пары (файл, тег) заново подставленных фрагментов;
+                  None, если основной файл разобран заново
+        """
+        main_mtime = os.stat(self.main_tex).st_mtime_ns
+        reparsed = self.mtimes.get(self.main_tex) != main_mtime
+        if reparsed:
+            self.parse_main()
+            self.mtimes[self.main_tex] = main_mtime
+
+        changed = []
+        for tag_file in self.tag_files():
+            mtime = os.stat(tag_file).st_mtime_ns
+            if self.mtimes.get(tag_file) == mtime:
+                continue
+            self.mtimes[tag_file] = mtime
+            changed.extend((tag_file, tag) for tag in self.load_tag_file(tag_file))
+
+        return None if reparsed else changed
+
+    def render(self):
+        """Собирает основной файл с подставленными фрагментами."""
+        parts = []
+        for segment in self.segments:
+            if isinstance(segment, tuple):
+                tag_file, tag = segment
+                if segment not in self.rendered:
+                    print(
+                        f"Предупреждение: тег {tag} не найден в {tag_file}",
+                        file=sys.stderr,
+                    )
+                    continue
+                parts.append(self.rendered[segment])
+            else:
+                parts.append(segment)
+        return "".join(parts)
+
+    def write(self, output_tex):
+        """Записывает собранный файл (через временный файл, чтобы TeX не увидел половину)."""
+        tmp_path = output_tex + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, output_tex)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Подстановка фрагментов catchfilebetweentags в основной файл до запуска TeX",
+        epilog="""
+Примеры использования:
+  %(prog)s modular/main.tex -o modular/main_inlined.tex
+  %(prog)s modular/main.tex -o modular/main_inlined.tex --watch
+  %(prog)s modular/main.tex -o modular/main_inlined.tex --watch --interval 0.2
+        """,
+    )
+
+    parser.add_argument(
+        "main_tex",
+        type=str,
+        help="основной файл модульного проекта",
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output-tex",
+        type=str,
+        default=None,
+        help="путь к собранному файлу (по умолчанию: <main>_inlined.tex)",
+    )
+
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="следить за изменениями файлов и пересобирать только изменившиеся фрагменты",
+    )
+
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.5,
+        help="интервал опроса файлов в режиме --watch, секунды (по умолчанию: 0.5)",
+    )
+
+    parser.add_argument(
+        "-q",
+        "--quiet",
+        action="store_true",
+        help="не выводить сообщения (для замеров времени)",
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.main_tex):
+        print(f"Ошибка: Файл '{args.main_tex}' не существует")
+        sys.exit(1)
+
+    output_tex = args.output_tex or os.path.splitext(args.main_tex)[0] + "_inlined.tex"
+    if os.path.abspath(output_tex) == os.path.abspath(args.main_tex):
+        print("Ошибка: Собранный файл не может совпадать с исходным")
+        sys.exit(1)
+
+    inliner = FragmentInliner(args.main_tex)
+    inliner.update()
+    inliner.write(output_tex)
+
+    if not args.quiet:
+        fragments = sum(len(f) for f in inliner.fragments.values())
+        print(f"Собран {output_tex} (фрагментов: {fragments})")
+
+    if not args.watch:
+        return
+
+    print(f"Слежение за изменениями (Ctrl+C для выхода)...")
+    try:
+        while True:
+            time.sleep(args.interval)
+            try:
+                changed = inliner.update()
+            except FileNotFoundError as e:
+                # Редактор может временно удалить файл при сохранении
+                print(f"Предупреждение: {e}")
+                continue
+
+            if changed is None:
+                inliner.write(output_tex)
+                print(f"Основной файл изменен, {output_tex} собран заново")
+            elif changed:
+                inliner.write(output_tex)
+                tags = ", ".join(tag for _, tag in changed)
+                print(f"Подставлены заново фрагменты: {tags}")
+    except KeyboardInterrupt:
+        print("\nСлежение остановлено.")
+
+
+if __name__ == "__main__":
+    main()
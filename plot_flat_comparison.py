@@ -6,16 +6,34 @@ import os
 import sys
 from pathlib import Path
 from matplotlib.lines import Line2D
+from plot_latex_benchmark import (
+    STAT_NAMES,
+    select_statistic,
+    split_variants,
+    subtract_calibration,
+)
 
 
-def load_data_with_min_max(flat_csv, flat_inner_csv):
-    """Загружает данные с min/max значениями."""
+def load_data_with_min_max(flat_csv, flat_inner_csv, subtract="none", stat="mean"):
+    """
+    Загружает данные с min/max значениями (subtract -- вычитаемая калибровка,
+    stat -- оценка времени вместо среднего).
+    """
     print("Загрузка данных...")
 
     # Загружаем данные
     df_flat = pd.read_csv(flat_csv)
     df_flat_inner = pd.read_csv(flat_inner_csv)
 
+    # Оценка времени вместо среднего
+    df_flat = select_statistic(df_flat, stat)
+    df_flat_inner = select_statistic(df_flat_inner, stat)
+
+    # Вычитаем время запуска движка, измеренное калибровкой
+    if subtract != "none":
+        df_flat = subtract_calibration(df_flat, subtract)
+        df_flat_inner = subtract_calibration(df_flat_inner, subtract)
+
     # Проверяем обязательные колонки
     required_cols = [
         "N",
@@ -35,6 +53,15 @@ def load_data_with_min_max(flat_csv, flat_inner_csv):
             print(f"   Найдены колонки: {list(df.columns)}")
             sys.exit(1)
 
+    # Сравнение строится для одной серии в файле: несколько вариантов
+    # (например, наборов опций движка) нужно строить plot_latex_benchmark.py
+    for df_name, df in [("flat", df_flat), ("flat_inner", df_flat_inner)]:
+        variants = split_variants(df)["doc_type"].unique()
+        if len(variants) > 1:
+            print(f"Ошибка: В файле {df_name} несколько серий: {', '.join(variants)}")
+            print("   Постройте их сравнение с помощью plot_latex_benchmark.py")
+            sys.exit(1)
+
     # Проверяем, что N совпадают
     common_n = sorted(set(df_flat["N"]).intersection(set(df_flat_inner["N"])))
     if not common_n:
@@ -536,6 +563,12 @@ def main():
   
   # Высокое разрешение
   python plot_flat_simple.py --flat-csv results_flat.csv --flat-inner-csv results_flat_inner.csv --dpi 300
+
+  # По медиане вместо среднего
+  python plot_flat_simple.py --flat-csv results_flat.csv --flat-inner-csv results_flat_inner.csv --stat median
+
+  # Без времени запуска движка (benchmark_latex.py --calibrate)
+  python plot_flat_simple.py --flat-csv results_flat.csv --flat-inner-csv results_flat_inner.csv --subtract startup
         """,
     )
 
@@ -584,6 +617,24 @@ def main():
         "--all-only", action="store_true", help="строить только полные графики (все N)"
     )
 
+    parser.add_argument(
+        "--stat",
+        type=str,
+        choices=list(STAT_NAMES),
+        default="mean",
+        help="оценка времени вместо среднего: mean, median, trimmed_mean, min, p95 "
+        "(по умолчанию: mean)",
+    )
+
+    parser.add_argument(
+        "--subtract",
+        type=str,
+        choices=["none", "startup", "preamble"],
+        default="none",
+        help="вычесть из time время пустого документа (startup) или документа из одной "
+        "преамбулы (preamble) по калибровке benchmark_latex.py --calibrate (по умолчанию: none)",
+    )
+
     parser.add_argument(
         "-E",
         "--english",
@@ -619,7 +670,9 @@ def main():
     print(f"Язык подписей: {'английский' if args.english else 'русский'}")
 
     # Загружаем данные
-    df_comparison = load_data_with_min_max(args.flat_csv, args.flat_inner_csv)
+    df_comparison = load_data_with_min_max(
+        args.flat_csv, args.flat_inner_csv, args.subtract, args.stat
+    )
 
     if len(df_comparison) == 0:
         print("Ошибка: Не удалось загрузить данные для сравнения")
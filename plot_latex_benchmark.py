@@ -43,6 +43,35 @@ markers = [
     "|",
 ]
 
+# Столбцы параметров, по которым benchmark_latex.py различает серии внутри
+# одного doc_type (сетка размеров фрагментов, перебор отключаемых компонентов,
+# несколько наборов опций движка)
+SPLIT_COLUMNS = ["fragment_size", "ablation", "engine_options"]
+
+
+def split_variants(df):
+    """
+    Разделяет серии, которые внутри одного doc_type различаются столбцами
+    SPLIT_COLUMNS: значение параметра дописывается к doc_type.
+
+    Args:
+        df: DataFrame с данными
+
+    Returns:
+        DataFrame: данные с уточненными doc_type
+    """
+    df = df.copy()
+    for column in SPLIT_COLUMNS:
+        if column not in df.columns:
+            continue
+        counts = df.groupby("doc_type")[column].nunique()
+        varied = counts[counts > 1].index
+        mask = df["doc_type"].isin(varied) & df[column].notna()
+        df.loc[mask, "doc_type"] = (
+            df.loc[mask, "doc_type"] + "_" + df.loc[mask, column].astype(str)
+        )
+    return df
+
 
 def load_and_validate_data(input_csvs):
     """
@@ -107,7 +136,7 @@ def load_and_validate_data(input_csvs):
         sys.exit(1)
 
     # Объединяем все данные
-    combined_df = pd.concat(all_data, ignore_index=True)
+    combined_df = split_variants(pd.concat(all_data, ignore_index=True))
 
     # Проверяем дубликаты (N, doc_type)
     duplicates = combined_df.duplicated(subset=["N", "doc_type"], keep=False)
@@ -126,7 +155,89 @@ def load_and_validate_data(input_csvs):
     return combined_df
 
 
-def plot_time_vs_n_for_each_type(df, output_dir, dpi=150, max_n=None, english=False):
+# Оценки времени, которые можно использовать вместо среднего (--stat):
+# имя -> (русская подпись, английская подпись)
+STAT_NAMES = {
+    "mean": ("среднее", "mean"),
+    "median": ("медиана", "median"),
+    "trimmed_mean": ("усеченное среднее", "trimmed mean"),
+    "min": ("минимум", "min"),
+    "p95": ("p95", "p95"),
+}
+
+
+def select_statistic(df, stat):
+    """
+    Подставляет выбранную оценку (колонки time_<stat> и benchmark_<stat>)
+    в колонки time_mean и benchmark_mean, по которым строятся все графики.
+
+    Для CSV без устойчивой статистики медиана вычисляется по отдельным запускам.
+
+    Args:
+        df: DataFrame с данными
+        stat: оценка из STAT_NAMES
+
+    Returns:
+        DataFrame: данные с замененными колонками *_mean
+    """
+    if stat == "mean":
+        return df
+
+    df = df.copy()
+    for metric in ["time", "benchmark"]:
+        column = f"{metric}_{stat}"
+        run_cols = [col for col in df.columns if col.startswith(f"{metric}_run_")]
+        if column in df.columns and not df[column].isna().all():
+            values = df[column]
+        elif stat == "median" and run_cols:
+            values = df[run_cols].median(axis=1)
+        else:
+            print(f" Ошибка: В данных нет колонки {column}")
+            sys.exit(1)
+        df[f"{metric}_mean"] = values
+    return df
+
+
+def stat_suffix(stat, english=False):
+    """Возвращает пометку для заголовка графика, если используется не среднее."""
+    if stat == "mean":
+        return ""
+    return f" [{STAT_NAMES[stat][1 if english else 0]}]"
+
+
+def subtract_calibration(df, subtract):
+    """
+    Вычитает из time время документа калибровки (benchmark_latex.py --calibrate),
+    чтобы сравнивать время без запуска движка.
+
+    Args:
+        df: DataFrame с данными
+        subtract: 'startup' (пустой документ) или 'preamble' (документ из одной преамбулы)
+
+    Returns:
+        DataFrame: данные с исправленными колонками time_*
+    """
+    column = f"{subtract}_time"
+    if column not in df.columns or df[column].isna().any():
+        print(
+            f" Ошибка: Не для всех строк есть колонка {column} "
+            f"(запустите benchmark_latex.py с --calibrate)"
+        )
+        sys.exit(1)
+
+    df = df.copy()
+    time_cols = [
+        col
+        for col in df.columns
+        if col in ["time_mean", "time_min", "time_max"] or col.startswith("time_run_")
+    ]
+    df[time_cols] = df[time_cols].sub(df[column], axis=0)
+    return df
+
+
+def plot_time_vs_n_for_each_type(
+    df, output_dir, dpi=150, max_n=None, english=False, stat="mean"
+):
     """
     График 1: Для каждого типа - время компиляции (time и l3benchmark) в зависимости от N.
 
@@ -136,6 +247,7 @@ def plot_time_vs_n_for_each_type(df, output_dir, dpi=150, max_n=None, english=Fa
         dpi: разрешение
         max_n: максимальное значение N для отображения
         english: использовать английские подписи
+        stat: оценка, подставленная в *_mean (см. STAT_NAMES)
     """
     doc_types = df["doc_type"].unique()
 
@@ -157,22 +269,23 @@ def plot_time_vs_n_for_each_type(df, output_dir, dpi=150, max_n=None, english=Fa
             xlabel = "Number of blocks (N)"
             ylabel = "Compilation time (seconds)"
             title = f"Compilation time vs N ({doc_type})"
-            time_label = "time (mean)"
+            time_label = f"time ({STAT_NAMES[stat][1]})"
             time_minmax_label = "time (min-max)"
-            benchmark_label = "l3benchmark (mean)"
+            benchmark_label = f"l3benchmark ({STAT_NAMES[stat][1]})"
             benchmark_minmax_label = "l3benchmark (min-max)"
         else:
             file_prefix = "ru_"
             xlabel = "Количество блоков (N)"
             ylabel = "Время компиляции (секунды)"
             title = f"Время компиляции в зависимости от N ({doc_type})"
-            time_label = "time (среднее)"
+            time_label = f"time ({STAT_NAMES[stat][0]})"
             time_minmax_label = "time (min-max)"
-            benchmark_label = "l3benchmark (среднее)"
+            benchmark_label = f"l3benchmark ({STAT_NAMES[stat][0]})"
             benchmark_minmax_label = "l3benchmark (min-max)"
 
         if max_n is not None:
             title += f" (N ≤ {max_n})"
+        title += stat_suffix(stat, english)
 
         # TIME: среднее значение и область
         plt.plot(
@@ -224,7 +337,9 @@ def plot_time_vs_n_for_each_type(df, output_dir, dpi=150, max_n=None, english=Fa
         print(f"✓ Сохранен график: {filename}")
 
 
-def plot_mean_time_comparison(df, output_dir, dpi=150, max_n=None, english=False):
+def plot_mean_time_comparison(
+    df, output_dir, dpi=150, max_n=None, english=False, stat="mean"
+):
     """
     График 2: Линии со средним временем (time) для каждого типа.
 
@@ -234,6 +349,7 @@ def plot_mean_time_comparison(df, output_dir, dpi=150, max_n=None, english=False
         dpi: разрешение
         max_n: максимальное значение N для отображения
         english: использовать английские подписи
+        stat: оценка, подставленная в *_mean (см. STAT_NAMES)
     """
     plt.figure(figsize=(10, 6))
 
@@ -282,6 +398,7 @@ def plot_mean_time_comparison(df, output_dir, dpi=150, max_n=None, english=False
 
     if max_n is not None:
         title += f" (N ≤ {max_n})"
+    title += stat_suffix(stat, english)
 
     plt.xlabel(xlabel, fontsize=12)
     plt.ylabel(ylabel, fontsize=12)
@@ -302,7 +419,9 @@ def plot_mean_time_comparison(df, output_dir, dpi=150, max_n=None, english=False
     print(f"✓ Сохранен график: {filename}")
 
 
-def plot_mean_benchmark_comparison(df, output_dir, dpi=150, max_n=None, english=False):
+def plot_mean_benchmark_comparison(
+    df, output_dir, dpi=150, max_n=None, english=False, stat="mean"
+):
     """
     График 3: Линии со средним временем (l3benchmark) для каждого типа.
 
@@ -312,6 +431,7 @@ def plot_mean_benchmark_comparison(df, output_dir, dpi=150, max_n=None, english=
         dpi: разрешение
         max_n: максимальное значение N для отображения
         english: использовать английские подписи
+        stat: оценка, подставленная в *_mean (см. STAT_NAMES)
     """
     plt.figure(figsize=(10, 6))
 
@@ -362,6 +482,7 @@ def plot_mean_benchmark_comparison(df, output_dir, dpi=150, max_n=None, english=
 
     if max_n is not None:
         title += f" (N ≤ {max_n})"
+    title += stat_suffix(stat, english)
 
     plt.xlabel(xlabel, fontsize=12)
     plt.ylabel(ylabel, fontsize=12)
@@ -383,7 +504,7 @@ def plot_mean_benchmark_comparison(df, output_dir, dpi=150, max_n=None, english=
 
 
 def plot_difference_from_baseline(
-    df, output_dir, baseline_type, dpi=150, max_n=None, english=False
+    df, output_dir, baseline_type, dpi=150, max_n=None, english=False, stat="mean"
 ):
     """
     График 4: Разность времени между типами документа и базовой линией (2x2).
@@ -398,6 +519,7 @@ def plot_difference_from_baseline(
         dpi: разрешение
         max_n: максимальное значение N для отображения
         english: использовать английские подписи
+        stat: оценка, подставленная в *_mean (см. STAT_NAMES)
     """
     # Получаем данные для базовой линии
     df_baseline = df[df["doc_type"] == baseline_type].sort_values("N")
@@ -502,6 +624,10 @@ def plot_difference_from_baseline(
             title_benchmark_diff += suffix
             title_time_ratio += suffix
             title_benchmark_ratio += suffix
+        title_time_diff += stat_suffix(stat, english)
+        title_benchmark_diff += stat_suffix(stat, english)
+        title_time_ratio += stat_suffix(stat, english)
+        title_benchmark_ratio += stat_suffix(stat, english)
 
         # Создаем фигуру с четырьмя подграфиками (2x2)
         fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(14, 10))
@@ -693,6 +819,84 @@ def plot_difference_from_baseline(
         print(f"✓ Сохранен график: {filename}")
 
 
+def plot_memory_timeline(timeline_csvs, output_dir, dpi=150, max_n=None, english=False):
+    """
+    График 5: Хронология RSS движка (--sample-interval в benchmark_latex.py)
+    для каждого типа, одна линия на каждое N (первый запуск).
+
+    Args:
+        timeline_csvs: список путей к CSV файлам *_timeline.csv
+        output_dir: директория для сохранения
+        dpi: разрешение
+        max_n: максимальное значение N для отображения
+        english: использовать английские подписи
+    """
+    frames = []
+    for csv_file in timeline_csvs:
+        try:
+            frames.append(pd.read_csv(csv_file))
+            print(f"Загружен {csv_file} ({len(frames[-1])} отсчетов)")
+        except Exception as e:
+            print(f" Ошибка при загрузке {csv_file}: {e}")
+    if not frames:
+        return
+
+    df = pd.concat(frames, ignore_index=True)
+    df = df[df["run"] == 1]
+    if max_n is not None:
+        df = df[df["N"] <= max_n]
+
+    for doc_type in df["doc_type"].unique():
+        df_type = df[df["doc_type"] == doc_type]
+
+        plt.figure(figsize=(10, 6))
+
+        # Определяем язык подписей
+        if english:
+            file_prefix = "en_"
+            xlabel = "Time since start (seconds)"
+            ylabel = "RSS (MB)"
+            title = f"Engine memory vs time ({doc_type})"
+        else:
+            file_prefix = "ru_"
+            xlabel = "Время от запуска (секунды)"
+            ylabel = "RSS (МБ)"
+            title = f"Память движка в зависимости от времени ({doc_type})"
+
+        if max_n is not None:
+            title += f" (N ≤ {max_n})"
+
+        color_cycle = cycle(bright_colors)
+        for n in sorted(df_type["N"].unique()):
+            # Точки сетки с одинаковым N (размер фрагментов, опции) -- отдельные линии
+            df_n = df_type[df_type["N"] == n]
+            point_cols = [c for c in ["fragment_size", "ablation", "engine_options"] if c in df_n]
+            for point, df_point in df_n.groupby(point_cols, dropna=False, sort=False):
+                point = point if isinstance(point, tuple) else (point,)
+                extra = [str(v) for v in point if pd.notna(v)]
+                label = f"N={n}" + (f" ({', '.join(extra)})" if extra else "")
+                plt.plot(
+                    df_point["t"],
+                    df_point["rss_kb"] / 1024,
+                    color=next(color_cycle),
+                    label=label,
+                    linewidth=1.5,
+                )
+
+        plt.xlabel(xlabel, fontsize=12)
+        plt.ylabel(ylabel, fontsize=12)
+        plt.title(title, fontsize=14)
+        plt.grid(True, alpha=0.3)
+        plt.legend(fontsize=9)
+
+        plt.tight_layout()
+        filename = output_dir / f"{file_prefix}5_memory_timeline_{doc_type}.png"
+        plt.savefig(filename, dpi=dpi, bbox_inches="tight")
+        plt.close()
+
+        print(f"✓ Сохранен график: {filename}")
+
+
 def create_summary_csv(df, output_dir):
     """
     Создает сводный CSV файл с ключевой статистикой.
@@ -748,6 +952,15 @@ def main():
   
   # С высоким разрешением
   python plot_latex_benchmark.py --input-csv results_all.csv --output-dir high_res_plots --dpi 300
+
+  # По медиане вместо среднего (устойчиво к единичным выбросам)
+  python plot_latex_benchmark.py --input-csv results_all.csv --stat median --output-dir plots_median
+
+  # Без времени запуска движка (benchmark_latex.py --calibrate)
+  python plot_latex_benchmark.py --input-csv results_all.csv --subtract startup --output-dir plots_startup
+
+  # С хронологией памяти (benchmark_latex.py --sample-interval)
+  python plot_latex_benchmark.py --input-csv results_rss.csv --timeline-csv results_rss_timeline.csv --baseline macrodef
         """,
     )
 
@@ -787,6 +1000,33 @@ def main():
         help="разрешение графиков в DPI (по умолчанию: 150)",
     )
 
+    parser.add_argument(
+        "--stat",
+        type=str,
+        choices=list(STAT_NAMES),
+        default="mean",
+        help="оценка времени для графиков и сводок: mean, median, trimmed_mean, min, p95 "
+        "(по умолчанию: mean)",
+    )
+
+    parser.add_argument(
+        "--subtract",
+        type=str,
+        choices=["none", "startup", "preamble"],
+        default="none",
+        help="вычесть из time среднее время пустого документа (startup) или документа "
+        "из одной преамбулы (preamble), измеренное benchmark_latex.py --calibrate "
+        "(по умолчанию: none)",
+    )
+
+    parser.add_argument(
+        "--timeline-csv",
+        type=str,
+        action="append",
+        default=[],
+        help="путь к CSV файлу хронологии памяти *_timeline.csv (можно указать несколько раз)",
+    )
+
     parser.add_argument(
         "-E",
         "--english",
@@ -813,6 +1053,16 @@ def main():
     # Загружаем и валидируем данные
     df = load_and_validate_data(args.input_csv)
 
+    # Оценка времени, по которой строятся графики (по умолчанию -- среднее)
+    if args.stat != "mean":
+        df = select_statistic(df, args.stat)
+        print(f"\nВместо среднего используется: {STAT_NAMES[args.stat][0]}")
+
+    # Вычитаем время запуска движка, измеренное калибровкой
+    if args.subtract != "none":
+        df = subtract_calibration(df, args.subtract)
+        print(f"\nИз time вычтено {args.subtract}_time (калибровка)")
+
     # Фильтруем данные по max_n если задано
     if args.max_n is not None:
         df = df[df["N"] <= args.max_n]
@@ -841,19 +1091,31 @@ def main():
     print(f"{'='*60}")
 
     # 1. Графики для каждого типа (time и benchmark)
-    plot_time_vs_n_for_each_type(df, output_dir, args.dpi, args.max_n, args.english)
+    plot_time_vs_n_for_each_type(
+        df, output_dir, args.dpi, args.max_n, args.english, args.stat
+    )
 
     # 2. Сравнение среднего времени (time) для всех типов
-    plot_mean_time_comparison(df, output_dir, args.dpi, args.max_n, args.english)
+    plot_mean_time_comparison(
+        df, output_dir, args.dpi, args.max_n, args.english, args.stat
+    )
 
     # 3. Сравнение среднего времени (benchmark) для всех типов
-    plot_mean_benchmark_comparison(df, output_dir, args.dpi, args.max_n, args.english)
+    plot_mean_benchmark_comparison(
+        df, output_dir, args.dpi, args.max_n, args.english, args.stat
+    )
 
     # 4. Графики разности для небазовых типов (2x2: time и benchmark)
     plot_difference_from_baseline(
-        df, output_dir, args.baseline, args.dpi, args.max_n, args.english
+        df, output_dir, args.baseline, args.dpi, args.max_n, args.english, args.stat
     )
 
+    # 5. Хронология памяти движка для каждого типа
+    if args.timeline_csv:
+        plot_memory_timeline(
+            args.timeline_csv, output_dir, args.dpi, args.max_n, args.english
+        )
+
     # Дополнительно: сводная таблица с максимальными различиями
     if args.baseline in df["doc_type"].values and len(df["doc_type"].unique()) > 1:
         print(f"\n{'='*60}")